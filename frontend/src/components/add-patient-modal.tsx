@@ -16,7 +16,7 @@ import { DatePicker } from "@/components/ui/date-picker"
 import { Card, CardContent } from "@/components/ui/card"
 import { Plus, Trash2, Loader2 } from "lucide-react"
 import { useDepartments } from "@/hooks/use-reference-data"
-import { fetchPatients, Patient, addPatient } from "@/lib/api"
+import { fetchPatients, fetchPatient, Patient, addPatient } from "@/lib/api"
 import { PatientModal } from "@/components/patient-modal"
 import { useState, useEffect, useCallback } from "react"
 
@@ -355,7 +355,15 @@ export function AddPatientModal({ isOpen, onClose, onPatientCreated }: AddPatien
     }
   }
 
-  const handleSelectPatient = (patient: Patient) => {
+  const handleSelectPatient = async (searchResult: Patient) => {
+    // Search results leave out the medical history, which is carried over to the new referral
+    let patient = searchResult
+    try {
+      patient = await fetchPatient(searchResult.waitlist_id)
+    } catch (error) {
+      console.error('Failed to fetch patient details:', error)
+    }
+
     setSelectedPatient(patient)
     setMedicalNumber(patient.medical_number)
     setDateOfBirth(patient.date_of_birth)
@@ -371,7 +379,7 @@ export function AddPatientModal({ isOpen, onClose, onPatientCreated }: AddPatien
         date: patient.referral_date,
         entry: patient.referral_notes
       },
-      ...patient.medical_history.map((history, index) => ({
+      ...(patient.medical_history ?? []).map((history, index) => ({
         id: `existing-${index}`,
         date: history.date,
         entry: history.notes
@@ -1011,9 +1019,7 @@ export function AddPatientModal({ isOpen, onClose, onPatientCreated }: AddPatien
         isOpen={currentPage === 'patient-modal'}
         onClose={handlePatientModalClose}
         patient={currentPatient}
-        onPatientUpdate={(updatedPatient) => {
-          setCurrentPatient(updatedPatient)
-        }}
+        onPatientUpdate={setCurrentPatient}
       />
     </>
   )
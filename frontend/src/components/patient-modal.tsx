@@ -1,6 +1,6 @@
 "use client"
 
-import { useState } from "react"
+import { useEffect, useRef, useState } from "react"
 import {
   Dialog,
   DialogContent,
@@ -14,7 +14,7 @@ import { Input } from "@/components/ui/input"
 import { Select } from "@/components/ui/select"
 import { User, FileText, Activity, Calendar, Clock, Loader2, Calculator, Edit, Save, X, Moon } from "lucide-react"
 import { useDepartments } from "@/hooks/use-reference-data"
-import { Patient, gradePatient, overrideGrade } from "@/lib/api"
+import { Patient, fetchPatient, gradePatient, overrideGrade } from "@/lib/api"
 
 interface PatientModalProps {
   isOpen: boolean
@@ -84,6 +84,30 @@ export function PatientModal({ isOpen, onClose, patient, onPatientUpdate }: Pati
     comorbidities: null as number | null
   })
 
+  // Parents pass a new callback on every render, keep the latest in a ref so it doesn't re-run the fetch below
+  const onPatientUpdateRef = useRef(onPatientUpdate)
+  useEffect(() => {
+    onPatientUpdateRef.current = onPatientUpdate
+  }, [onPatientUpdate])
+
+  // Rows from the waitlist list leave out the medical history and justification, fetch them when the modal opens
+  useEffect(() => {
+    if (!isOpen || !patient?.waitlist_id || patient.medical_history !== undefined) return
+
+    let cancelled = false
+    fetchPatient(patient.waitlist_id)
+      .then(details => {
+        if (!cancelled && onPatientUpdateRef.current) {
+          onPatientUpdateRef.current(details)
+        }
+      })
+      .catch(error => console.error('Failed to fetch patient details:', error))
+
+    return () => {
+      cancelled = true
+    }
+  }, [isOpen, patient?.waitlist_id, patient?.medical_history])
+
   // Initialise edit values when entering edit mode
   const handleStartEdit = () => {
     if (!patient) return
@@ -99,14 +99,15 @@ export interface Patient {
   department_id: string
   referral_notes: string
   referral_date: string
-  medical_history: Array<{
+  // Only returned by fetchPatient, the waitlist list leaves them out
+  medical_history?: Array<{
     date: string
     notes: string
   }>
   clinical_urgency: 1 | 2 | 3 | null
   condition_severity: 1 | 2 | 3 | null
   comorbidities: number | null
-  agent_justification: string | null
+  agent_justification?: string | null
   edited_at: string | null
   is_seen: boolean | null
   is_assigned: boolean | null
@@ -307,6 +308,22 @@ export async function fetchPatients(filters?: {
   }
 }
 
+// Fetch every field of one patient, including the medical history and justification the list leaves out
+export async function fetchPatient(waitlistId: string): Promise<Patient> {
+  try {
+    const response = await authenticatedFetch(`${ENDPOINT_URL}/waitlist/${waitlistId}`)
+
+    if (!response.ok) {
+      throw new Error(`Failed to fetch patient: ${response.statusText}`)
+    }
+
+    return await response.json()
+  } catch (error) {
+    console.error('Error fetching patient:', error)
+    throw error
+  }
+}
+
 // Fetch dashboard data
 export async function fetchDashboardData(): Promise<DashboardData> {
   try {
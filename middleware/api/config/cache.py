@@ -0,0 +1,23 @@
+import os
+import tempfile
+
+# Where caches, version counters, leases and job leases are kept:
+#  "memory": in-process, only correct with a single worker process and instance (default)
+#  "sqlite": a local SQLite file shared by every worker process on the machine
+#  "redis": a Redis-protocol server shared by every worker and instance
+STATE_BACKEND = os.environ.get('STATE_BACKEND', 'memory')
+STATE_SQLITE_PATH = os.environ.get('STATE_SQLITE_PATH', os.path.join(tempfile.gettempdir(), 'mws-state.sqlite3'))
+STATE_REDIS_URL = os.environ.get('STATE_REDIS_URL', 'redis://localhost:6379/0')
+
+# How long a precomputed candidate shortlist stays usable, and how long to wait after a waitlist change
+# before rebuilding the shortlists it invalidated (changes within the delay are folded into one rebuild)
+SHORTLIST_TTL_SECONDS = int(os.environ.get('SHORTLIST_TTL_SECONDS', 6 * 60 * 60))
+SHORTLIST_REFRESH_DELAY_SECONDS = int(os.environ.get('SHORTLIST_REFRESH_DELAY_SECONDS', 30))
+
+# How long a preference ranking from the agent can be reused for an identical request
+RANKING_CACHE_TTL_SECONDS = int(os.environ.get('RANKING_CACHE_TTL_SECONDS', 12 * 60 * 60))
+
+# How long an ETag given out by the list and reference endpoints stays valid even if no write through the middleware
+# bumps its tables, so writes made directly to BigQuery show up within this window. 0 never expires them. ETags are
+# only given out with STATE_BACKEND sqlite or redis, see conditional_get
+ETAG_MAX_AGE_SECONDS = int(os.environ.get('ETAG_MAX_AGE_SECONDS', 5 * 60))
@@ -0,0 +1,13 @@
+import os
+
+# Referrals per batch of a bulk upload. Each batch costs one history lookup and one load job (BigQuery allows
+# 1,500 load jobs per table per day), and its per-row results are streamed back once it's written
+BULK_BATCH_SIZE = int(os.environ.get('BULK_BATCH_SIZE', 5000))
+
+# Patients graded at once after a bulk upload with auto_grade
+BULK_GRADING_CONCURRENCY = int(os.environ.get('BULK_GRADING_CONCURRENCY', 5))
+
+# Longest date range a recurring clinic template can be expanded over, and most slots it can create at once (each
+# slot is two parameters of a single MERGE, BigQuery allows 10,000 per query)
+TEMPLATE_MAX_DAYS = int(os.environ.get('TEMPLATE_MAX_DAYS', 366))
+TEMPLATE_MAX_SLOTS = int(os.environ.get('TEMPLATE_MAX_SLOTS', 2000))
@@ -0,0 +1,8 @@
+import os
+
+# Most slots one /match/get-candidates/batch request can ask for. Their candidate queries are one per tier for the
+# whole batch, but each slot can still cost a ranking call to the preferences agent
+CANDIDATE_BATCH_MAX_SLOTS = int(os.environ.get('CANDIDATE_BATCH_MAX_SLOTS', 200))
+
+# Slots of a batch ranked (and their routing calls made) at once
+CANDIDATE_BATCH_CONCURRENCY = int(os.environ.get('CANDIDATE_BATCH_CONCURRENCY', 5))
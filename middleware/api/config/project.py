@@ -10,4 +10,5 @@ APPOINTMENTS_FQTN: Final = f"`{BQ_PROJECT_ID}.{PROJECT_DATASET}.{os.environ['APP
 DEPARTMENTS_FQTN: Final = f"`{BQ_PROJECT_ID}.{PROJECT_DATASET}.{os.environ['DEPARTMENTS_TABLE']}`"
 HOSPITALS_FQTN: Final = f"`{BQ_PROJECT_ID}.{PROJECT_DATASET}.{os.environ['HOSPITALS_TABLE']}`"
 WAITLIST_FQTN: Final = f"`{BQ_PROJECT_ID}.{PROJECT_DATASET}.{os.environ['WAITLIST_TABLE']}`"
-REJECTED_APPOINTMENTS_FQTN: Final = f"`{BQ_PROJECT_ID}.{PROJECT_DATASET}.{os.environ['REJECTED_APPOINTMENTS_TABLE']}`"
\ No newline at end of file
+REJECTED_APPOINTMENTS_FQTN: Final = f"`{BQ_PROJECT_ID}.{PROJECT_DATASET}.{os.environ['REJECTED_APPOINTMENTS_TABLE']}`"
+JOB_STATE_FQTN: Final = f"`{BQ_PROJECT_ID}.{PROJECT_DATASET}.{os.environ.get('JOB_STATE_TABLE', 'job_state')}`"
\ No newline at end of file
@@ -0,0 +1,50 @@
+import json
+import os
+
+# Where repository queries run:
+#  "bigquery": the BigQuery dataset configured in project.py (default)
+#  "duckdb": an embedded DuckDB database created from bq-schema.txt, for tests and benchmarks without network
+QUERY_BACKEND = os.environ.get('QUERY_BACKEND', 'bigquery')
+
+# DuckDB database file, ":memory:" keeps everything in the process and starts empty on every run
+LOCAL_DATABASE_PATH = os.environ.get('LOCAL_DATABASE_PATH', ':memory:')
+LOCAL_SCHEMA_PATH = os.environ.get('LOCAL_SCHEMA_PATH', os.path.join(os.path.dirname(__file__), '..', '..', 'bq-schema.txt'))
+
+# Optional directory of <table>.parquet / <table>.csv / <table>.json files loaded into empty tables on startup
+LOCAL_DATA_DIR = os.environ.get('LOCAL_DATA_DIR')
+
+# Bytes a single BigQuery query may scan, per route template (e.g. '{"/waitlist/": 200000000}'), with
+# QUERY_BYTES_BUDGET for every other query, including scheduled jobs. 0 means no budget.
+QUERY_BYTES_BUDGETS = json.loads(os.environ.get('QUERY_BYTES_BUDGETS', '{}'))
+QUERY_BYTES_BUDGET = int(os.environ.get('QUERY_BYTES_BUDGET', 0))
+
+# What to do with a query over its budget:
+#  "warn": log it once it has run (default)
+#  "reject": estimate it with a dry run first and refuse to run it, the endpoint responds 400
+QUERY_BUDGET_ACTION = os.environ.get('QUERY_BUDGET_ACTION', 'warn')
+
+# Dry-run every budgeted query before running it, to log and export its estimated bytes (always on with "reject")
+QUERY_DRY_RUN = os.environ.get('QUERY_DRY_RUN', 'false').lower() == 'true'
+
+# Point updates to the same table within this window are coalesced into one MERGE (see WriteBuffer), BigQuery
+# throttles concurrent DML per table. 0 writes each update on its own
+WRITE_BUFFER_WINDOW_SECONDS = float(os.environ.get('WRITE_BUFFER_WINDOW_SECONDS', 0.1))
+# Rows after which a batch is written without waiting for the rest of the window
+WRITE_BUFFER_MAX_ROWS = int(os.environ.get('WRITE_BUFFER_MAX_ROWS', 500))
+
+# How BigQuery reads run:
+#  "optional": short query mode, BigQuery answers small reads without creating a job and creates one itself when it
+#    needs to (default). If BigQuery refuses the mode itself, that read and every later one create a job
+#  "required": every query creates a job and polls it for results
+QUERY_JOB_CREATION_MODE = os.environ.get('QUERY_JOB_CREATION_MODE', 'optional')
+
+# Seconds the current time bound to a query's @current_time is truncated to, per query, so the same query repeated
+# within a bucket has identical parameters and BigQuery can answer it from its free 24-hour result cache (which is
+# also invalidated whenever the table changes). Only queries where a bound up to one bucket off is harmless are
+# listed; e.g. '{"appointments": 30}'. 0 binds the exact time
+QUERY_TIME_BUCKETS = {
+    "appointments": 60,       # Upcoming appointment listings, may include slots that started under a minute ago
+    "dashboard": 300,         # Dashboard counts
+    "manual_assignment": 60,  # Rounded up, so a slot stops being manually assignable up to a minute early
+    **json.loads(os.environ.get('QUERY_TIME_BUCKETS', '{}'))
+}
@@ -0,0 +1,23 @@
+import os
+
+# "external": recurring jobs are only run when Cloud Scheduler calls their endpoints (default)
+# "local": the middleware also runs them itself on the cadences below, no external cron needed
+SCHEDULER_MODE = os.environ.get('SCHEDULER_MODE', 'external')
+
+SCHEDULER_JITTER_SECONDS = int(os.environ.get('SCHEDULER_JITTER_SECONDS', 30))
+SCHEDULER_HISTORY_SIZE = int(os.environ.get('SCHEDULER_HISTORY_SIZE', 20))
+
+# A job run holds a lease in the shared state backend so only one worker or instance runs it at a time,
+# the lease expires after this long in case the worker holding it dies mid-run
+JOB_LEASE_TTL_SECONDS = int(os.environ.get('JOB_LEASE_TTL_SECONDS', 60 * 60))
+
+# How long shutdown waits for background tasks (e.g. grading started by a request) before exiting
+SHUTDOWN_TIMEOUT_SECONDS = float(os.environ.get('SHUTDOWN_TIMEOUT_SECONDS', 10))
+
+# Cadence of each recurring job, in seconds
+JOB_INTERVALS = {
+    "automatic_assignment": int(os.environ.get('AUTOMATIC_ASSIGNMENT_INTERVAL_SECONDS', 60 * 60)),
+    "grade_all": int(os.environ.get('GRADE_ALL_INTERVAL_SECONDS', 60 * 60)),
+    "mark_seen": int(os.environ.get('MARK_SEEN_INTERVAL_SECONDS', 60 * 60)),
+    "refresh_shortlists": int(os.environ.get('REFRESH_SHORTLISTS_INTERVAL_SECONDS', 15 * 60)),
+}
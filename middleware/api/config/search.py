@@ -0,0 +1,13 @@
+import os
+
+# Keep medical numbers, postcodes and appointment and waitlist ids in memory, so searches on them query BigQuery
+# only for the rows that match instead of scanning the table with LIKE
+SEARCH_INDEX_ENABLED = os.environ.get('SEARCH_INDEX_ENABLED', 'true').lower() == 'true'
+
+# How old an index can get before it is rebuilt from the table in the background. Writes made through this process
+# are applied straight away, this bounds how long writes by other workers or instances go unseen
+SEARCH_INDEX_MAX_AGE_SECONDS = int(os.environ.get('SEARCH_INDEX_MAX_AGE_SECONDS', 5 * 60))
+
+# Searches matching more rows than this (e.g. a single digit) query with LIKE as before, as the id list would cost
+# more to send than the scan it saves
+SEARCH_INDEX_MAX_MATCHES = int(os.environ.get('SEARCH_INDEX_MAX_MATCHES', 1000))
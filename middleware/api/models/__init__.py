@@ -1,3 +1,3 @@
 from .assignment_model import Assignment
 from .waitlist_model import WaitlistFilterParams, Patient, GradeOverride, GradingScore, GradingResult
-from .appointments_model import AppointmentsFilterParams, AppointmentCreate
\ No newline at end of file
+from .appointments_model import AppointmentsFilterParams, AppointmentCreate, AppointmentTemplate, ClinicSession
\ No newline at end of file
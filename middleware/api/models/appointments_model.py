@@ -1,7 +1,8 @@
 from typing import Optional, List
 from pydantic import BaseModel, Field, model_validator
 from fastapi import HTTPException
-from datetime import datetime
+from datetime import date, datetime, time
+from api.config.ingestion import TEMPLATE_MAX_DAYS
 
 
 class AppointmentsFilterParams(BaseModel):
@@ -53,4 +54,47 @@ class AppointmentCreate(BaseModel):
     department_id: str
     hospital_id: str
     auto_assign: bool = False
-    properties: Optional[List[str]] = None
\ No newline at end of file
+    properties: Optional[List[str]] = None
+
+
+class ClinicSession(BaseModel):
+    weekday: int = Field(ge=0, le=6) # 0 is Monday
+    start_time: time
+    end_time: time
+
+    @model_validator(mode="after")
+    def check_start_time_before_end_time(self) -> "ClinicSession":
+        if self.end_time <= self.start_time:
+            raise HTTPException(
+                status_code=400,
+                detail="Session start_time must be earlier than end_time"
+            )
+
+        return self
+
+
+class AppointmentTemplate(BaseModel):
+    """A recurring clinic, e.g. every Tuesday 09:00-12:00 in 20 minute slots, between two dates (inclusive)"""
+    start_date: date
+    end_date: date
+    sessions: List[ClinicSession] = Field(min_length=1)
+    slot_minutes: int = Field(gt=0, le=24 * 60)
+    department_id: str
+    hospital_id: str
+    auto_assign: bool = False
+    properties: Optional[List[str]] = None
+
+    @model_validator(mode="after")
+    def check_date_range(self) -> "AppointmentTemplate":
+        if self.end_date < self.start_date:
+            raise HTTPException(
+                status_code=400,
+                detail="start_date must be earlier than or equal to end_date"
+            )
+        if (self.end_date - self.start_date).days >= TEMPLATE_MAX_DAYS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"A template can span at most {TEMPLATE_MAX_DAYS} days"
+            )
+
+        return self
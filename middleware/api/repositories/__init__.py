@@ -1,7 +1,8 @@
 from .appointments_repo import AppointmentsRepository
 from .waitlist_repo import WaitlistRepository
-from .match_repo import MatchRepository
+from .match_repo import MatchRepository, AssignmentConflictError
 from .hospitals_repo import HospitalsRepository
 from .departments_repo import DepartmentsRepository
 from .rejected_appointments_repo import RejectedAppointmentsRepository
-from .dashboard_repo import DashboardRepository
\ No newline at end of file
+from .dashboard_repo import DashboardRepository
+from .job_state_repo import JobStateRepository
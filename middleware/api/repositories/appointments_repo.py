@@ -1,19 +1,30 @@
-from api.utils import BigQueryClient
+from api.utils import get_query_client, SearchIndex, intersect_ids
 import uuid
 from api.models import AppointmentsFilterParams, AppointmentCreate
 import api.config.project
 from datetime import datetime
-from zoneinfo import ZoneInfo
-from api.utils.time_utils import LOCAL_TIMEZONE, datetime_add
+from api.utils.time_utils import datetime_add, query_current_time
+
+# What the appointments table and appointment modal render, see Appointment in frontend/src/lib/api.ts
+APPOINTMENT_LIST_COLUMNS = ["appointment_id", "appointment_time", "waitlist_id", "department_id", "hospital_id",
+                            "properties", "assign_at"]
+
+# What candidate matching, preference ranking, proximity and the cached shortlists read from a slot
+APPOINTMENT_MATCHING_COLUMNS = ["appointment_id", "appointment_time", "department_id", "hospital_id", "properties"]
+
+# Appointment and waitlist id searches of upcoming appointments, tried first on the appointments the index matches
+APPOINTMENT_SEARCH = SearchIndex(api.config.project.APPOINTMENTS_FQTN, "appointment_id", substring=("appointment_id", "waitlist_id"),
+                                 where="appointment_time >= @current_time",
+                                 where_params=lambda: {"current_time": ("DATETIME", query_current_time("appointments"))})
 
 class AppointmentsRepository:
     def __init__(self):
-        self.bq_client = BigQueryClient()
+        self.bq_client = get_query_client()
 
-    async def query_appointments(self, params: AppointmentsFilterParams):
+    async def query_appointments(self, params: AppointmentsFilterParams, columns: list[str] = None):
         filters = []
         parameters = {}
-        current_datetime = datetime.now(tz=ZoneInfo(LOCAL_TIMEZONE)).replace(tzinfo=None).isoformat() # Make sure time is London, but strip timezone info after (e.g. # 2025-08-15 14:30:00+01:00 -> # 2025-08-15 14:30:00)
+        current_datetime = query_current_time("appointments") # London time to the minute, so repeated listings can be served from BigQuery's cache
         parameters["current_time"] = ("DATETIME", current_datetime)
 
         if params.appointment_id:
@@ -37,7 +48,7 @@ class AppointmentsRepository:
             filters.append(f"assign_at <= @current_time OR (waitlist_id IS NULL AND assign_at IS NULL)")
 
         where_clause = " AND ".join(filters)
-        query = f"SELECT * FROM {api.config.project.APPOINTMENTS_FQTN}"
+        query = f"SELECT {', '.join(columns) if columns else '*'} FROM {api.config.project.APPOINTMENTS_FQTN}"
 
         if where_clause:
             query += f" WHERE {where_clause}"
@@ -49,12 +60,25 @@ class AppointmentsRepository:
         result = await self.bq_client.run_query(query=query, named_params=parameters)
         return result
 
-    async def query_paginated_appointments(self, params: AppointmentsFilterParams): #TODO Combine this into the above function using optional params (DRY principle)
+    async def query_paginated_appointments(self, params: AppointmentsFilterParams, columns: list[str] = None, use_search_index: bool = True): #TODO Combine this into the above function using optional params (DRY principle)
+        page = getattr(params, 'page', 1) or 1
+
+        # The index is only a hint, it misses appointments other workers wrote since it was built, so the LIKE filters
+        # still apply and a search it can't answer, or that matches nothing, queries without it
+        search_ids = None
+        if use_search_index and params.appointment_id:
+            search_ids = await APPOINTMENT_SEARCH.search("appointment_id", params.appointment_id)
+        if use_search_index and params.waitlist_id:
+            search_ids = intersect_ids(search_ids, await APPOINTMENT_SEARCH.search("waitlist_id", params.waitlist_id))
+
         filters = []
         parameters = {}
-        current_datetime = datetime.now(tz=ZoneInfo(LOCAL_TIMEZONE)).replace(tzinfo=None).isoformat() # Make sure time is London, but strip timezone info after (e.g. # 2025-08-15 14:30:00+01:00 -> # 2025-08-15 14:30:00)
+        current_datetime = query_current_time("appointments") # London time to the minute, so repeated listings can be served from BigQuery's cache
         parameters["current_time"] = ("DATETIME", current_datetime)
 
+        if search_ids:
+            filters.append(f"appointment_id IN UNNEST(@search_ids)")
+            parameters["search_ids"] = ("ARRAY<STRING>", search_ids)
         if params.appointment_id:
             filters.append(f"appointment_id LIKE @appointment_id")
             parameters["appointment_id"] = ("STRING", f"%{params.appointment_id}%")
@@ -86,11 +110,14 @@ class AppointmentsRepository:
         count_query = f"SELECT COUNT(*) as total FROM {api.config.project.APPOINTMENTS_FQTN} WHERE {full_where_clause}"
         total_result = await self.bq_client.run_query(query=count_query, named_params=parameters)
         total_count = total_result[0]['total'] if total_result else 0
+        if search_ids and not total_count:
+            # None of the hinted appointments still match, the table may have others the index doesn't know about yet
+            return await self.query_paginated_appointments(params, columns, use_search_index=False)
         
         # Get paginated results
         query = f"""
         SELECT 
-            *
+            {', '.join(columns) if columns else '*'}
         FROM 
             {api.config.project.APPOINTMENTS_FQTN} 
         WHERE {full_where_clause}
@@ -106,7 +133,6 @@ class AppointmentsRepository:
             query += " ORDER BY appointment_time ASC, appointment_id ASC"
         
         # Default pagination: page 1, 20 results per page
-        page = getattr(params, 'page', 1) or 1
         limit = 20
         offset = (page - 1) * limit
         
@@ -123,7 +149,25 @@ class AppointmentsRepository:
             'has_prev': page > 1
         }
 
+    @staticmethod
+    def build_appointment(appointment_id: str, appointment_time: datetime, department_id: str, hospital_id: str,
+                          properties: list[str] | None, assign_at: datetime | None) -> dict:
+        """The full row of a newly inserted, unassigned appointment, as a query would return it"""
+        return {
+            "appointment_id": appointment_id,
+            "appointment_time": appointment_time,
+            "waitlist_id": None,
+            "department_id": department_id,
+            "hospital_id": hospital_id,
+            "assigner_email": None,
+            "properties": properties,
+            "assign_at": assign_at,
+            "deleted_at": None,
+            "delete_reason": None
+        }
+
     async def add_appointment(self, appointment: AppointmentCreate):
+        """Insert an appointment and return its row, built from the values written rather than read back"""
         appointment_id = str(uuid.uuid4()) #REFACTOR to service, pass in as param
 
         parameters = {
@@ -146,10 +190,60 @@ class AppointmentsRepository:
         """        
         
         await self.bq_client.run_query(query=query, named_params=parameters)
+        APPOINTMENT_SEARCH.upsert(appointment_id, appointment_id=appointment_id)
 
-        filter_params = AppointmentsFilterParams(appointment_id=appointment_id)
-        result = await self.query_paginated_appointments(filter_params)
-        
-        if result['results']:
-            return result['results'][0]
-        return None
+        assign_at = parameters["assign_at"][1]
+        return self.build_appointment(appointment_id, appointment.appointment_time.replace(tzinfo=None),
+                                      appointment.department_id, appointment.hospital_id, appointment.properties,
+                                      datetime.fromisoformat(assign_at) if assign_at else None)
+
+
+    async def query_slot_window(self, hospital_id: str, department_id: str, start_time: datetime, end_time: datetime):
+        """Every appointment of a clinic (hospital and department) between two times, including deleted ones"""
+        query = f"""
+        SELECT appointment_id, appointment_time, deleted_at
+        FROM {api.config.project.APPOINTMENTS_FQTN}
+        WHERE hospital_id = @hospital_id AND department_id = @department_id
+            AND appointment_time >= @start_time AND appointment_time <= @end_time
+        ORDER BY appointment_time ASC
+        """
+        return await self.bq_client.run_query(query=query, named_params={
+            "hospital_id": ("STRING", hospital_id),
+            "department_id": ("STRING", department_id),
+            "start_time": ("DATETIME", start_time.isoformat()),
+            "end_time": ("DATETIME", end_time.isoformat())
+        })
+
+    async def add_appointments(self, appointments: list[dict]) -> int:
+        """
+        Insert many appointments of one clinic in a single statement and return how many were inserted.
+        The appointments share their department, hospital, properties and assign_at, and any whose appointment_id
+        already exists is left untouched, so re-submitting the same slots inserts nothing.
+        """
+        if not appointments:
+            return 0
+
+        first = appointments[0]
+        parameters = {
+            "slots": ("ARRAY<STRUCT<appointment_id STRING, appointment_time DATETIME>>",
+                      [{"appointment_id": appointment["appointment_id"], "appointment_time": appointment["appointment_time"].isoformat()}
+                       for appointment in appointments]),
+            "department_id": ("STRING", first["department_id"]),
+            "hospital_id": ("STRING", first["hospital_id"]),
+            "properties": ("JSON", first["properties"]),
+            "assign_at": ("DATETIME", first["assign_at"].isoformat() if first["assign_at"] else None)
+        }
+
+        query = f"""
+        MERGE {api.config.project.APPOINTMENTS_FQTN} a
+        USING (SELECT * FROM UNNEST(@slots)) AS s
+        ON a.appointment_id = s.appointment_id
+        WHEN NOT MATCHED THEN
+            INSERT (appointment_id, appointment_time, department_id, hospital_id, properties, assign_at)
+            VALUES (s.appointment_id, s.appointment_time, @department_id, @hospital_id, @properties, @assign_at)
+        """
+        inserted = await self.bq_client.run_dml(query=query, named_params=parameters)
+        # Only the id is given, so an existing appointment keeps the patient the index has for it
+        for appointment in appointments:
+            APPOINTMENT_SEARCH.upsert(appointment["appointment_id"], appointment_id=appointment["appointment_id"])
+        return inserted
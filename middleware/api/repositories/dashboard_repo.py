@@ -1,19 +1,16 @@
-from api.utils import BigQueryClient
-import os
+from api.utils import get_query_client
 import api.config.project
-from datetime import datetime
-from zoneinfo import ZoneInfo
-from api.utils.time_utils import LOCAL_TIMEZONE
+from api.utils.time_utils import query_current_time
 
 class DashboardRepository:
     def __init__(self):
-        self.bq_client = BigQueryClient()
+        self.bq_client = get_query_client()
 
     async def query_dashboard_stats(self):
         # Get total appointments count
         appt_parameters = {}
 
-        current_datetime = datetime.now(tz=ZoneInfo(LOCAL_TIMEZONE)).replace(tzinfo=None).isoformat() # Make sure time is London, but strip timezone info after (e.g. # 2025-08-15 14:30:00+01:00 -> # 2025-08-15 14:30:00)
+        current_datetime = query_current_time("dashboard") # London time to the bucket, so repeated loads can be served from BigQuery's cache
         appt_parameters["current_time"] = ("DATETIME", current_datetime)
 
         appointments_query = f"SELECT COUNT(*) as total_appointments FROM {api.config.project.APPOINTMENTS_FQTN} WHERE appointment_time > @current_time"
@@ -1,9 +1,9 @@
-from api.utils import BigQueryClient
+from api.utils import get_query_client
 import api.config.project
 
 class DepartmentsRepository:
     def __init__(self):
-        self.bq_client = BigQueryClient()
+        self.bq_client = get_query_client()
 
     async def query_departments(self):
         query = f"SELECT * FROM {api.config.project.DEPARTMENTS_FQTN}"
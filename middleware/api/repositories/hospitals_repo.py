@@ -1,10 +1,10 @@
-from api.utils import BigQueryClient
+from api.utils import get_query_client
 import api.config.project
 
 
 class HospitalsRepository:
     def __init__(self):
-        self.bq_client = BigQueryClient()
+        self.bq_client = get_query_client()
 
     async def query_hospitals(self):
         query = f"SELECT * FROM {api.config.project.HOSPITALS_FQTN}"
@@ -0,0 +1,38 @@
+from api.utils import get_query_client
+import api.config.project
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from api.utils.time_utils import LOCAL_TIMEZONE
+
+
+class JobStateRepository:
+    def __init__(self):
+        self.bq_client = get_query_client()
+
+    async def get_watermark(self, job_name: str) -> datetime | None:
+        """Return the time up to which a job has processed data, or None if it has never completed"""
+        query = f"""
+            SELECT watermark
+            FROM {api.config.project.JOB_STATE_FQTN}
+            WHERE job_name = @job_name
+        """
+        result = await self.bq_client.run_query(query=query, named_params={"job_name": ("STRING", job_name)})
+        return result[0]['watermark'] if result else None
+
+    async def set_watermark(self, job_name: str, watermark: datetime):
+        current_datetime = datetime.now(tz=ZoneInfo(LOCAL_TIMEZONE)).replace(tzinfo=None).isoformat() # Make sure time is London, but strip timezone info after (e.g. # 2025-08-15 14:30:00+01:00 -> # 2025-08-15 14:30:00)
+
+        query = f"""
+            MERGE {api.config.project.JOB_STATE_FQTN} s
+            USING (SELECT @job_name AS job_name) AS j
+            ON s.job_name = j.job_name
+            WHEN MATCHED THEN
+                UPDATE SET watermark = @watermark, updated_at = @current_time
+            WHEN NOT MATCHED THEN
+                INSERT (job_name, watermark, updated_at) VALUES (@job_name, @watermark, @current_time)
+        """
+        await self.bq_client.run_query(query=query, named_params={
+            "job_name": ("STRING", job_name),
+            "watermark": ("DATETIME", watermark.isoformat()),
+            "current_time": ("DATETIME", current_datetime)
+        })
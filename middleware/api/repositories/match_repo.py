@@ -1,20 +1,24 @@
-from api.utils import BigQueryClient
+from api.utils import get_query_client, WriteBuffer
 from fastapi import HTTPException
 from api.models import Assignment
-import os
 import api.config.project
-from datetime import datetime
-from zoneinfo import ZoneInfo
-from api.utils.time_utils import LOCAL_TIMEZONE
+from api.repositories.appointments_repo import APPOINTMENT_SEARCH
+from api.utils.time_utils import query_current_time
+
+class AssignmentConflictError(Exception):
+    """Raised when an appointment or patient changed between being read and being assigned"""
+
 
 class MatchRepository:
     def __init__(self):
-        self.bq_client = BigQueryClient()
+        self.bq_client = get_query_client()
+        self.write_buffer = WriteBuffer()
 
     async def can_manually_assign_appointment(self, appointment_id: str):
         """Check if appointment can be manually assigned (assign_at >= CURRENT_DATETIME)"""
 
-        current_datetime = datetime.now(tz=ZoneInfo(LOCAL_TIMEZONE)).replace(tzinfo=None).isoformat() # Make sure time is London, but strip timezone info after (e.g. # 2025-08-15 14:30:00+01:00 -> # 2025-08-15 14:30:00)
+        # Rounded up to the bucket so the check errs on refusing, and repeated checks can be served from BigQuery's cache
+        current_datetime = query_current_time("manual_assignment", round_up=True)
         
         query = f"""
             SELECT appointment_id 
@@ -30,81 +34,207 @@ class MatchRepository:
         except Exception:
             return False #HACK returns false but since this function is bool check we might want to throw an error
 
+    async def query_appointments_for_assignment(self, appointment_ids: list[str], columns: list[str] = None) -> list[dict]:
+        """
+        Every appointment among `appointment_ids` in one query, instead of a can_manually_assign_appointment check and
+        appointment fetch per appointment, for the batched get-candidates and assign-selected endpoints. Each row also
+        has `is_upcoming` (appointment_time hasn't passed) and `is_manually_assignable` (assign_at hasn't passed, as
+        checked by can_manually_assign_appointment), for callers to filter on and drop
+
+            :param list[str] columns: Columns to fetch, all by default
+        """
+        if not appointment_ids:
+            return []
+
+        query = f"""
+            SELECT
+                {', '.join(columns) if columns else '*'},
+                appointment_time >= @current_time AS is_upcoming,
+                (assign_at IS NULL OR assign_at >= @assign_time) AS is_manually_assignable
+            FROM {api.config.project.APPOINTMENTS_FQTN}
+            WHERE appointment_id IN UNNEST(@appointment_ids)
+        """
+        params = {"appointment_ids": ("ARRAY<STRING>", appointment_ids),
+                  "current_time": ("DATETIME", query_current_time("appointments")),
+                  "assign_time": ("DATETIME", query_current_time("manual_assignment", round_up=True))}
+
+        return await self.bq_client.run_query(query=query, named_params=params)
+
     #REFACTOR This should be handled by the service layer making calls to database layer, not here
     #REFACTOR this whole function to separate logic and database calls
     async def assign_patient( 
             self,
             assignment: Assignment
     ):
-        # Check for existing assignment
+        """
+        Assign a patient to an appointment using compare-and-set updates.
+
+        The appointment's current waitlist_id and the patient's is_assigned flag act as row versions: each UPDATE
+        only applies if the row still holds the value that was read, otherwise AssignmentConflictError is raised
+        and any partial change is rolled back. Returns the appointment's new assignment columns, so callers don't need
+        to read it back.
+        """
+        # Read the current assignment, this is the version the appointment update is conditional on
         check_existing_query = f"""
-            SELECT waitlist_id 
+            SELECT waitlist_id, assign_at, assigner_email
             FROM {api.config.project.APPOINTMENTS_FQTN}
-            WHERE appointment_id = @appointment_id AND waitlist_id IS NOT NULL
+            WHERE appointment_id = @appointment_id
         """
         check_params = {"appointment_id": ("STRING", assignment.appointment_id)}
         
         try:
             existing_result = await self.bq_client.run_query(query=check_existing_query, named_params=check_params)
-            existing_assignments = list(existing_result)
-            
-            # If there's an existing assignment, unassign the previous patient
-            if existing_assignments:
-                previous_waitlist_id = existing_assignments[0]["waitlist_id"]
-                unassign_previous_query = f"""
-                    UPDATE {api.config.project.WAITLIST_FQTN} 
-                    SET is_assigned = FALSE 
-                    WHERE waitlist_id = @previous_waitlist_id
-                """
-                unassign_params = {"previous_waitlist_id": ("STRING", previous_waitlist_id)}
-                await self.bq_client.run_query(query=unassign_previous_query, named_params=unassign_params)
-                
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to check existing assignment: {str(e)}")
 
-        # Update the new patient as assigned
-        patient_parameter = {"waitlist_id": ("STRING", assignment.waitlist_id)}
-        update_patient_query = f"UPDATE {api.config.project.WAITLIST_FQTN} SET is_assigned = TRUE WHERE waitlist_id = @waitlist_id"
+        if not existing_result:
+            raise AssignmentConflictError(f"Appointment {assignment.appointment_id} no longer exists")
 
-        # Update the appointment with new waitlist_id
+        previous_assignment = existing_result[0]
+        previous_waitlist_id = previous_assignment["waitlist_id"]
+        if previous_waitlist_id == assignment.waitlist_id:
+            return {"success": True, "waitlist_id": assignment.waitlist_id, "assign_at": previous_assignment["assign_at"],
+                    "assigner_email": previous_assignment["assigner_email"]}
+
+        # Update the appointment with new waitlist_id, only if nobody else has assigned it since it was read
         appointment_parameters = {"waitlist_id": ("STRING", assignment.waitlist_id),
-                                  "appointment_id": ("STRING", assignment.appointment_id)}
+                                  "appointment_id": ("STRING", assignment.appointment_id),
+                                  "expected_waitlist_id": ("STRING", previous_waitlist_id)}
         update_appointment_query = f"""
             UPDATE {api.config.project.APPOINTMENTS_FQTN}
             SET waitlist_id = @waitlist_id, assign_at = NULL
         """
 
-        if assignment.email is not None:
-            appointment_parameters["email"] = ("STRING", assignment.email)
-            update_appointment_query += ", assigner_email = @email"
-        else:
-            update_appointment_query += ", assigner_email = 'admin@medical.uk'"
+        assigner_email = assignment.email if assignment.email is not None else "admin@medical.uk"
+        appointment_parameters["email"] = ("STRING", assigner_email)
+        update_appointment_query += ", assigner_email = @email"
 
-        update_appointment_query += " WHERE appointment_id = @appointment_id"
+        update_appointment_query += " WHERE appointment_id = @appointment_id AND waitlist_id IS NOT DISTINCT FROM @expected_waitlist_id"
 
         try:
-            await self.bq_client.run_query(query=update_appointment_query, named_params=appointment_parameters)
+            updated_appointments = await self.bq_client.run_dml(query=update_appointment_query, named_params=appointment_parameters)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to update appointment: {str(e)}")
+
+        if updated_appointments == 0:
+            raise AssignmentConflictError(f"Appointment {assignment.appointment_id} was assigned by another request")
+        APPOINTMENT_SEARCH.upsert(assignment.appointment_id, waitlist_id=assignment.waitlist_id)
+
+        # Update the new patient as assigned, only if they are still free, hold no other appointment and this one hasn't
+        # since been reassigned, otherwise the reassignment's unassign could run first and leave them flagged without a slot
+        patient_parameter = {"waitlist_id": ("STRING", assignment.waitlist_id),
+                             "appointment_id": ("STRING", assignment.appointment_id)}
+        update_patient_query = f"""
+            UPDATE {api.config.project.WAITLIST_FQTN}
+            SET is_assigned = TRUE
+            WHERE waitlist_id = @waitlist_id AND is_assigned IS FALSE
+            AND EXISTS (
+                SELECT 1 FROM {api.config.project.APPOINTMENTS_FQTN}
+                WHERE appointment_id = @appointment_id AND waitlist_id = @waitlist_id
+            )
+            AND NOT EXISTS (
+                SELECT 1 FROM {api.config.project.APPOINTMENTS_FQTN}
+                WHERE appointment_id != @appointment_id AND waitlist_id = @waitlist_id
+            )
+        """
         
         try:
-            await self.bq_client.run_query(query=update_patient_query, named_params=patient_parameter)
+            updated_patients = await self.bq_client.run_dml(query=update_patient_query, named_params=patient_parameter)
         except Exception as e:
+            await self._restore_appointment_assignment(assignment, previous_assignment)
             raise HTTPException(status_code=500, detail=f"Failed to update waitlist entry: {str(e)}")
 
-        return {"success": True, "waitlist_id": assignment.waitlist_id}
+        if updated_patients == 0:
+            await self._restore_appointment_assignment(assignment, previous_assignment)
+            # Another request may have skipped unassigning this patient while this appointment briefly held them
+            await self._release_patient(assignment.waitlist_id)
+            raise AssignmentConflictError(f"Patient {assignment.waitlist_id} was assigned to another appointment, or appointment {assignment.appointment_id} was reassigned")
 
-    async def clear_appointment_assignment(self, appointment_id: str):
-        """Clear assign_at when no patient can be found for assignment"""
+        # If there was an existing assignment, unassign the previous patient
+        if previous_waitlist_id:
+            try:
+                await self._release_patient(previous_waitlist_id)
+            except HTTPException:
+                await self._restore_appointment_assignment(assignment, previous_assignment)
+                await self._release_patient(assignment.waitlist_id)
+                raise
+
+        return {"success": True, "waitlist_id": assignment.waitlist_id, "previous_waitlist_id": previous_waitlist_id,
+                "assign_at": None, "assigner_email": assigner_email}
+
+    async def _release_patient(self, waitlist_id: str):
+        """
+        Unassign a patient, only if they are still marked assigned and no appointment holds them, so it can't undo an
+        assignment made since. Run by every request after it lets go of a patient; no rows updated means the patient
+        is already free or holds an appointment.
+        """
+        query = f"""
+            UPDATE {api.config.project.WAITLIST_FQTN}
+            SET is_assigned = FALSE
+            WHERE waitlist_id = @waitlist_id AND is_assigned IS TRUE
+            AND NOT EXISTS (
+                SELECT 1 FROM {api.config.project.APPOINTMENTS_FQTN}
+                WHERE waitlist_id = @waitlist_id
+            )
+        """
+
+        try:
+            await self.bq_client.run_dml(query=query, named_params={"waitlist_id": ("STRING", waitlist_id)})
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to unassign patient {waitlist_id}: {str(e)}")
+
+    async def _restore_appointment_assignment(self, assignment: Assignment, previous_assignment: dict):
+        """
+        Undo an appointment update whose patient update lost a race. The previous patient is only put back if they are
+        still marked assigned and hold no other appointment, if they were released or moved meanwhile the slot is left
+        free instead, so the rollback can't double-book them.
+        """
         query = f"""
             UPDATE {api.config.project.APPOINTMENTS_FQTN}
-            SET assign_at = NULL
-            WHERE appointment_id = @appointment_id
+            SET waitlist_id = CASE WHEN
+                    EXISTS (
+                        SELECT 1 FROM {api.config.project.WAITLIST_FQTN}
+                        WHERE waitlist_id = @previous_waitlist_id AND is_assigned IS TRUE
+                    )
+                    AND NOT EXISTS (
+                        SELECT 1 FROM {api.config.project.APPOINTMENTS_FQTN}
+                        WHERE waitlist_id = @previous_waitlist_id
+                    )
+                THEN @previous_waitlist_id END,
+                assign_at = @previous_assign_at, assigner_email = @previous_assigner_email
+            WHERE appointment_id = @appointment_id AND waitlist_id = @waitlist_id
         """
-        params = {"appointment_id": ("STRING", appointment_id)}
-        
+        previous_assign_at = previous_assignment["assign_at"]
+        params = {"appointment_id": ("STRING", assignment.appointment_id),
+                  "waitlist_id": ("STRING", assignment.waitlist_id),
+                  "previous_waitlist_id": ("STRING", previous_assignment["waitlist_id"]),
+                  "previous_assign_at": ("DATETIME", previous_assign_at.isoformat() if previous_assign_at else None),
+                  "previous_assigner_email": ("STRING", previous_assignment["assigner_email"])}
+
+        try:
+            await self.bq_client.run_dml(query=query, named_params=params)
+            if previous_assignment["waitlist_id"]:
+                # A concurrent release may have read the slot while it held the new patient, flag the previous one
+                # again if the slot was given back to them
+                await self.bq_client.run_dml(query=f"""
+                    UPDATE {api.config.project.WAITLIST_FQTN}
+                    SET is_assigned = TRUE
+                    WHERE waitlist_id = @previous_waitlist_id AND is_assigned IS FALSE
+                    AND EXISTS (
+                        SELECT 1 FROM {api.config.project.APPOINTMENTS_FQTN}
+                        WHERE appointment_id = @appointment_id AND waitlist_id = @previous_waitlist_id
+                    )
+                """, named_params={"previous_waitlist_id": params["previous_waitlist_id"],
+                                   "appointment_id": params["appointment_id"]})
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to roll back appointment assignment: {str(e)}")
+        APPOINTMENT_SEARCH.upsert(assignment.appointment_id, waitlist_id=previous_assignment["waitlist_id"])
+
+    async def clear_appointment_assignment(self, appointment_id: str):
+        """Clear assign_at when no patient can be found for assignment, coalesced with the other slots of the run"""
         try:
-            await self.bq_client.run_query(query=query, named_params=params)
+            await self.write_buffer.update(api.config.project.APPOINTMENTS_FQTN, ("appointment_id", "STRING", appointment_id),
+                                           {"assign_at": ("DATETIME", None)})
             return {"success": True}
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to clear appointment assignment: {str(e)}")
@@ -1,13 +1,14 @@
-from api.utils import BigQueryClient
+from api.utils import get_query_client
 from fastapi import HTTPException
 from api.models import Assignment
 import os
 import api.config.project
+from api.repositories.appointments_repo import APPOINTMENT_SEARCH
 
 
 class RejectedAppointmentsRepository:
     def __init__(self):
-        self.bq_client = BigQueryClient()
+        self.bq_client = get_query_client()
 
     async def update_waitlist(
             self,
@@ -40,6 +41,7 @@ class RejectedAppointmentsRepository:
             await self.bq_client.run_query(query=query, named_params=params)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to update appointment: {str(e)}") #FIXME The repo should raise a general exception not http error
+        APPOINTMENT_SEARCH.upsert(assignment.appointment_id, waitlist_id=None)
 
     async def update_rejected_appointments(
             self,
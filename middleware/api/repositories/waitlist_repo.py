@@ -1,12 +1,10 @@
-from api.utils import BigQueryClient
+from api.utils import get_query_client, WriteBuffer, SearchIndex, intersect_ids
+from api.utils.instrumentation import instrumented
 import os
-import requests
 import uuid
 import json
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
-import vertexai
-from vertexai import agent_engines
 from api.models import WaitlistFilterParams, Patient, GradeOverride, GradingResult
 from datetime import datetime
 import api.config.project
@@ -15,16 +13,73 @@ from zoneinfo import ZoneInfo
 from api.utils.time_utils import LOCAL_TIMEZONE, datetime_sub
 
 
+_vertexai_initialized = False
+
+# What the waitlist table and search results render. The medical history and agent justification are only shown
+# for one patient at a time, see get_patient
+PATIENT_LIST_COLUMNS = ["waitlist_id", "medical_number", "date_of_birth", "postcode", "department_id", "referral_notes",
+                        "referral_date", "clinical_urgency", "condition_severity", "comorbidities", "edited_at",
+                        "is_seen", "grading_status", "graded_at", "is_assigned", "preferences", "prefers_evening"]
+
+# What candidate matching, preference ranking and the assignment modal use, leaving out the notes, history and
+# justification that make up most of each row's bytes
+CANDIDATE_COLUMNS = ["waitlist_id", "medical_number", "date_of_birth", "postcode", "department_id", "referral_date",
+                     "clinical_urgency", "condition_severity", "comorbidities", "grading_status", "is_assigned",
+                     "preferences", "prefers_evening"]
+
+# Medical number and postcode searches, tried first on the patients the index matches
+PATIENT_SEARCH = SearchIndex(api.config.project.WAITLIST_FQTN, "waitlist_id", substring=("medical_number",), prefix=("postcode",))
+
+def _agent_engines():
+    """Import and initialise the Vertex AI SDK on first use, so requests that never call an agent don't pay for it"""
+    global _vertexai_initialized
+    import vertexai
+    from vertexai import agent_engines
+
+    if not _vertexai_initialized:
+        vertexai.init(
+            project=os.environ.get('BQ_PROJECT_ID'),
+            location=os.environ.get('AGENT_LOCATION'),
+            staging_bucket=os.environ.get('AGENT_STAGING_BUCKET')
+        )
+        _vertexai_initialized = True
+
+    return agent_engines
+
+
 class WaitlistRepository:
     def __init__(self):
-        self.bq_client = BigQueryClient()
+        self.bq_client = get_query_client()
+        self.write_buffer = WriteBuffer()
+
+    async def query_patients(self, params: WaitlistFilterParams, columns: list[str] = None, use_search_index: bool = True):
+        """
+            Return a page of patients matching the filters
+
+            :param list[str] columns: Columns to fetch, all by default. Queries are billed on the columns they read, so
+                list views should leave out the large text and JSON columns they don't render
+            :param bool use_search_index: Try the medical number and postcode search on the patients PATIENT_SEARCH
+                matches first. False runs the LIKE filters alone
+        """
+        page = getattr(params, 'page', 1) or 1
+        limit = params.limit or 20
+
+        # The index is only a hint, it misses patients other workers wrote since it was built, so the LIKE filters
+        # still apply and a search it can't answer, or that matches nothing, queries without it
+        search_ids = None
+        if use_search_index and params.medical_number:
+            search_ids = await PATIENT_SEARCH.search("medical_number", params.medical_number)
+        if use_search_index and params.postcode:
+            search_ids = intersect_ids(search_ids, await PATIENT_SEARCH.search("postcode", params.postcode.upper()))
 
-    async def query_patients(self, params: WaitlistFilterParams):
         filters = []
         parameters = {}
         if params.waitlist_id:
             filters.append(f"waitlist_id = @waitlist_id")
             parameters["waitlist_id"] = ("STRING", params.waitlist_id)
+        if search_ids:
+            filters.append(f"waitlist_id IN UNNEST(@search_ids)")
+            parameters["search_ids"] = ("ARRAY<STRING>", search_ids)
         if params.medical_number:
             filters.append(f"medical_number LIKE @medical_number")
             parameters["medical_number"] = ("STRING", f"%{params.medical_number}%")
@@ -80,9 +135,12 @@ class WaitlistRepository:
         
         total_result = await self.bq_client.run_query(query=count_query, named_params=parameters)
         total_count = total_result[0]['total'] if total_result else 0
+        if search_ids and not total_count:
+            # None of the hinted patients still match, the table may have others the index doesn't know about yet
+            return await self.query_patients(params, columns, use_search_index=False)
         
         # Get paginated results
-        query = f"SELECT * FROM {api.config.project.WAITLIST_FQTN}"
+        query = f"SELECT {', '.join(columns) if columns else '*'} FROM {api.config.project.WAITLIST_FQTN}"
 
         if where_clause:
             query += f" WHERE {where_clause}"
@@ -98,8 +156,6 @@ class WaitlistRepository:
             query += " ORDER BY clinical_urgency DESC, condition_severity DESC, comorbidities DESC, referral_date ASC, date_of_birth ASC, waitlist_id ASC"
         
         # Default pagination: page 1, 20 results per page
-        page = getattr(params, 'page', 1) or 1
-        limit = params.limit or 20
         offset = (page - 1) * limit
         
         query += f" LIMIT {limit} OFFSET {offset}"
@@ -115,11 +171,24 @@ class WaitlistRepository:
             'has_prev': page > 1
         }
 
+    async def get_patient(self, waitlist_id: str):
+        """
+            Return every column of one patient, including the medical history and agent justification the list
+            projection leaves out, or None if there is no such patient
+        """
+        query = f"SELECT * FROM {api.config.project.WAITLIST_FQTN} WHERE waitlist_id = @waitlist_id"
+        result = await self.bq_client.run_query(query=query, named_params={"waitlist_id": ("STRING", waitlist_id)})
+        return result[0] if result else None
+
     #REFACTOR add to service not repo
     async def grade_patient(self, waitlist_id: str):
+        """
+            Grade a patient and return their updated row, fetched by id once the grades are saved (the agent call
+            takes long enough that the row read before it may be stale). None if there is no such unseen patient.
+        """
         patient_data = await self._get_patient_data(waitlist_id)
         if not patient_data:
-            return #? Do we want to handle this case
+            return None #? Do we want to handle this case
         
         await self._update_grading_status(waitlist_id, 'GRADING')
         
@@ -130,12 +199,28 @@ class WaitlistRepository:
             print(f"Unexpected error during clinical grading workflow: {str(e)}")
             await self._update_grading_status(waitlist_id, 'FAILED')
 
+        return await self.get_patient(waitlist_id)
+
 
-    async def mark_seen(self):
+    async def mark_seen(self, since: datetime = None, until: datetime = None):
+        """
+        Mark patients seen whose appointment time is before `until` (default now)
+
+        :param datetime since: Only consider appointments at or after this time, so on the appointments table
+            partitioned by appointment_time (see bq-schema.txt) the MERGE only reads the months since the last run
+            instead of the whole history
+        :param datetime until: Only consider appointments before this time
+        """
         parameters = {}
 
-        current_datetime = datetime.now(tz=ZoneInfo(LOCAL_TIMEZONE)).replace(tzinfo=None).isoformat() # Make sure time is London, but strip timezone info after (e.g. # 2025-08-15 14:30:00+01:00 -> # 2025-08-15 14:30:00)
-        parameters["current_time"] = ("DATETIME", current_datetime)
+        if until is None:
+            until = datetime.now(tz=ZoneInfo(LOCAL_TIMEZONE)).replace(tzinfo=None) # Make sure time is London, but strip timezone info after (e.g. # 2025-08-15 14:30:00+01:00 -> # 2025-08-15 14:30:00)
+        parameters["current_time"] = ("DATETIME", until.isoformat())
+
+        appointment_filter = "appointment_time < @current_time"
+        if since is not None:
+            appointment_filter += " AND appointment_time >= @since"
+            parameters["since"] = ("DATETIME", since.isoformat())
 
         try:
             query = f"""
@@ -143,7 +228,7 @@ class WaitlistRepository:
             USING (
                 SELECT DISTINCT waitlist_id
                 FROM {api.config.project.APPOINTMENTS_FQTN}
-                WHERE appointment_time < @current_time
+                WHERE {appointment_filter}
             ) AS a
             ON w.waitlist_id = a.waitlist_id
             WHEN MATCHED AND w.is_seen IS FALSE THEN
@@ -180,28 +265,16 @@ class WaitlistRepository:
     async def _update_grading_status(self, waitlist_id: str, status: str):
         current_datetime = datetime.now(tz=ZoneInfo(LOCAL_TIMEZONE)).replace(tzinfo=None).isoformat() # Make sure time is London, but strip timezone info after (e.g. # 2025-08-15 14:30:00+01:00 -> # 2025-08-15 14:30:00)
 
-        query = f"""
-        UPDATE 
-            {api.config.project.WAITLIST_FQTN}
-        SET 
-            grading_status = @status, 
-            graded_at = @current_time
-        WHERE 
-            waitlist_id = @waitlist_id
-        """
-        await self.bq_client.run_query(query=query, named_params={
-            "waitlist_id": ("STRING", waitlist_id),
-            "status": ("STRING", status),
-            "current_time": ("DATETIME", current_datetime)
+        # Coalesced with the status updates of patients graded at the same time
+        await self.write_buffer.update(api.config.project.WAITLIST_FQTN, ("waitlist_id", "STRING", waitlist_id), {
+            "grading_status": ("STRING", status),
+            "graded_at": ("DATETIME", current_datetime)
         })
     
     #REFACTOR add to service layer or new external service file
+    @instrumented("grading_agent")
     async def _process_agent_grading(self, waitlist_id: str, patient_data: dict) -> GradingResult:
-        vertexai.init(
-            project=os.environ.get('BQ_PROJECT_ID'),
-            location=os.environ.get('AGENT_LOCATION'),
-            staging_bucket=os.environ.get('AGENT_STAGING_BUCKET')
-        )
+        agent_engines = _agent_engines()
 
         username = f"u_{uuid.uuid4().hex[:8]}"
         resource_id = os.environ.get('AGENT_RESOURCE_ID')
@@ -264,48 +337,19 @@ class WaitlistRepository:
     async def _save_grading_results(self, waitlist_id: str, grading_result: GradingResult):
         current_datetime = datetime.now(tz=ZoneInfo(LOCAL_TIMEZONE)).replace(tzinfo=None).isoformat() # Make sure time is London, but strip timezone info after (e.g. # 2025-08-15 14:30:00+01:00 -> # 2025-08-15 14:30:00)
         
-        update_query = f"""
-        UPDATE 
-            {api.config.project.WAITLIST_FQTN}
-        SET 
-            clinical_urgency = @clinical_urgency,
-            condition_severity = @condition_severity,
-            comorbidities = @comorbidities,
-            agent_justification = @agent_justification,
-            grading_status = 'COMPLETED',
-            graded_at = @current_time,
-            edited_at = NULL
-        WHERE 
-            waitlist_id = @waitlist_id
-        """
-        parameters = {
-            "waitlist_id": ("STRING", waitlist_id),
+        await self.write_buffer.update(api.config.project.WAITLIST_FQTN, ("waitlist_id", "STRING", waitlist_id), {
             "clinical_urgency": ("INTEGER", grading_result.clinical_urgency),
             "condition_severity": ("INTEGER", grading_result.condition_severity),
             "comorbidities": ("FLOAT", grading_result.comorbidities),
             "agent_justification": ("STRING", grading_result.agent_justification),
-            "current_time": ("DATETIME", current_datetime)
-        }
-        await self.bq_client.run_query(query=update_query, named_params=parameters)
-
-    #REFACTOR add to service layer or new external service file
-    async def analyse_preferences(self, appointment_id: str, appointment_time: datetime, properties: str,
-                                  candidates: list[dict]):
-        vertexai.init(
-            project=os.environ.get('BQ_PROJECT_ID'),
-            location=os.environ.get('AGENT_LOCATION'),
-            staging_bucket=os.environ.get('AGENT_STAGING_BUCKET')
-        )
-
-        username = f"u_{uuid.uuid4().hex[:8]}"
-        resource_id = os.environ.get('PREF_RANKING_AGENT_RESOURCE_ID')
-
-        remote_agent = agent_engines.get(resource_id)
-        session = remote_agent.create_session(user_id=username)
-
-        print(
-            f"Started session to analyse patient preferences for user {username} with session {session['id']} for appointment ID {appointment_id}")
+            "grading_status": ("STRING", "COMPLETED"),
+            "graded_at": ("DATETIME", current_datetime),
+            "edited_at": ("DATETIME", None)
+        })
 
+    @staticmethod
+    def build_preferences_payload(appointment_time: datetime, properties: str, candidates: list[dict]) -> dict:
+        """The exact message sent to the preferences agent, the ranking depends on nothing else"""
         filtered_candidates = [
             {
                 "waitlist_id": candidate["waitlist_id"],
@@ -314,7 +358,7 @@ class WaitlistRepository:
             } for candidate in candidates
         ]
 
-        data = {
+        return {
             "appointment": {
                 "datetime": appointment_time,
                 "properties": properties
@@ -322,6 +366,23 @@ class WaitlistRepository:
             "candidates": filtered_candidates
         }
 
+    #REFACTOR add to service layer or new external service file
+    @instrumented("preferences_agent")
+    async def analyse_preferences(self, appointment_id: str, appointment_time: datetime, properties: str,
+                                  candidates: list[dict]):
+        agent_engines = _agent_engines()
+
+        username = f"u_{uuid.uuid4().hex[:8]}"
+        resource_id = os.environ.get('PREF_RANKING_AGENT_RESOURCE_ID')
+
+        remote_agent = agent_engines.get(resource_id)
+        session = remote_agent.create_session(user_id=username)
+
+        print(
+            f"Started session to analyse patient preferences for user {username} with session {session['id']} for appointment ID {appointment_id}")
+
+        data = self.build_preferences_payload(appointment_time, properties, candidates)
+
         try:
             loop = asyncio.get_event_loop()
             with ThreadPoolExecutor() as executor:
@@ -390,27 +451,18 @@ class WaitlistRepository:
         
         return [row['waitlist_id'] for row in result] if result else []
 
-    async def add_patient(self, patient: Patient):
-        
-        # Check for existing Medical number
-        query_medical = f"""
-        SELECT *
-        FROM {api.config.project.WAITLIST_FQTN}
-        WHERE medical_number = @medical_number
-        ORDER BY referral_date DESC
-        LIMIT 1
+    @staticmethod
+    def build_referral(patient: Patient, last_entry: dict = None) -> dict:
+        """
+            The waitlist row for a new referral. A returning patient (`last_entry` is their latest referral) carries
+            over their medical history with the previous referral added to the top, and their DOB and postcode
+            when not given
         """
-        
-        existing_result = await self.bq_client.run_query(query=query_medical, named_params={"medical_number": ("STRING", patient.medical_number)})
         new_waitlist_id = str(uuid.uuid4())
-        
-        #REFACTOR add to service, this function should just add, no check in this class, that is service's job
-        if existing_result:
-            # Patient exists - get the last entry
-            last_entry = existing_result[0]
-            
+
+        if last_entry:
             # Start with existing medical history
-            new_medical_history = last_entry.get('medical_history', [])
+            new_medical_history = list(last_entry.get('medical_history') or [])
             
             # Add the previous referral to the top
             if last_entry.get('referral_notes') and last_entry.get('referral_date'):
@@ -426,10 +478,7 @@ class WaitlistRepository:
                 }
                 
                 # Insert at the beginning
-                if isinstance(new_medical_history, list):
-                    new_medical_history.insert(0, previous_entry)
-                else:
-                    new_medical_history = [previous_entry]
+                new_medical_history.insert(0, previous_entry)
             
             # Create new record with updated medical history and patient data
             date_of_birth = patient.date_of_birth or last_entry.get('date_of_birth')
@@ -438,7 +487,7 @@ class WaitlistRepository:
             elif hasattr(date_of_birth, 'strftime'):
                 date_of_birth = date_of_birth.strftime('%Y-%m-%d')
             
-            insert_data = {
+            return {
                 "waitlist_id": new_waitlist_id,
                 "medical_number": patient.medical_number,
                 "referral_date": patient.referral_date.isoformat(),
@@ -459,40 +508,82 @@ class WaitlistRepository:
                 "preferences": patient.preferences if patient.preferences else None,
                 "prefers_evening": patient.prefers_evening if patient.prefers_evening else False
             }
-        else:
-            #  Insert new patient with provided data only
-            medical_history_dicts = []
-            if patient.medical_history:
-                for entry in patient.medical_history:
-                    if hasattr(entry, 'date') and hasattr(entry, 'notes'):
-                        medical_history_dicts.append({
-                            "date": entry.date,
-                            "notes": entry.notes
-                        })
-                    elif isinstance(entry, dict):
-                        medical_history_dicts.append(entry)
-            
-            insert_data = {
-                "waitlist_id": new_waitlist_id,
-                "medical_number": patient.medical_number,
-                "referral_date": patient.referral_date.isoformat(),
-                "date_of_birth": patient.date_of_birth,
-                "postcode": patient.postcode,
-                "department_id": patient.referral_department,
-                "referral_notes": patient.referral_notes,
-                "medical_history": medical_history_dicts if medical_history_dicts else None,
-                "clinical_urgency": None,
-                "condition_severity": None,
-                "comorbidities": None,
-                "agent_justification": None,
-                "edited_at": None,
-                "is_seen": False,
-                "grading_status": None,
-                "graded_at": None,
-                "is_assigned": False,
-                "preferences": patient.preferences if patient.preferences else None,
-                "prefers_evening": patient.prefers_evening if patient.prefers_evening else False
-            }
+
+        #  Insert new patient with provided data only
+        medical_history_dicts = []
+        if patient.medical_history:
+            for entry in patient.medical_history:
+                if hasattr(entry, 'date') and hasattr(entry, 'notes'):
+                    medical_history_dicts.append({
+                        "date": entry.date,
+                        "notes": entry.notes
+                    })
+                elif isinstance(entry, dict):
+                    medical_history_dicts.append(entry)
+        
+        return {
+            "waitlist_id": new_waitlist_id,
+            "medical_number": patient.medical_number,
+            "referral_date": patient.referral_date.isoformat(),
+            "date_of_birth": patient.date_of_birth,
+            "postcode": patient.postcode,
+            "department_id": patient.referral_department,
+            "referral_notes": patient.referral_notes,
+            "medical_history": medical_history_dicts if medical_history_dicts else None,
+            "clinical_urgency": None,
+            "condition_severity": None,
+            "comorbidities": None,
+            "agent_justification": None,
+            "edited_at": None,
+            "is_seen": False,
+            "grading_status": None,
+            "graded_at": None,
+            "is_assigned": False,
+            "preferences": patient.preferences if patient.preferences else None,
+            "prefers_evening": patient.prefers_evening if patient.prefers_evening else False
+        }
+
+    async def get_latest_referrals(self, medical_numbers: list[str]) -> dict[str, dict]:
+        """
+            Return the latest referral of each of the given patients that is already on the waitlist, keyed by medical
+            number, in a single query however many patients there are
+        """
+        if not medical_numbers:
+            return {}
+
+        query = f"""
+        SELECT medical_number, date_of_birth, postcode, referral_notes, referral_date, medical_history
+        FROM {api.config.project.WAITLIST_FQTN}
+        WHERE medical_number IN UNNEST(@medical_numbers)
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY medical_number ORDER BY referral_date DESC) = 1
+        """
+        result = await self.bq_client.run_query(query=query, named_params={"medical_numbers": ("ARRAY<STRING>", medical_numbers)})
+        return {row['medical_number']: row for row in result}
+
+    async def insert_patients(self, rows: list[dict]) -> int:
+        """
+            Append referrals built by build_referral with a single load job instead of one INSERT per row
+        """
+        loaded = await self.bq_client.load_rows(api.config.project.WAITLIST_FQTN, rows)
+        for row in rows:
+            PATIENT_SEARCH.upsert(row["waitlist_id"], medical_number=row["medical_number"], postcode=row["postcode"])
+        return loaded
+
+    async def add_patient(self, patient: Patient):
+        
+        # Check for existing Medical number
+        query_medical = f"""
+        SELECT *
+        FROM {api.config.project.WAITLIST_FQTN}
+        WHERE medical_number = @medical_number
+        ORDER BY referral_date DESC
+        LIMIT 1
+        """
+        
+        existing_result = await self.bq_client.run_query(query=query_medical, named_params={"medical_number": ("STRING", patient.medical_number)})
+        
+        #REFACTOR add to service, this function should just add, no check in this class, that is service's job
+        insert_data = self.build_referral(patient, existing_result[0] if existing_result else None)
         
         # Insert the new record
         insert_query = f"""
@@ -532,14 +623,16 @@ class WaitlistRepository:
         }
         
         await self.bq_client.run_query(query=insert_query, named_params=insert_params)
+        PATIENT_SEARCH.upsert(insert_data["waitlist_id"], medical_number=insert_data["medical_number"], postcode=insert_data["postcode"])
         return insert_data
 
-    async def query_candidates(self, appointment_id, department_id, limit, prefers_evening=False, max_referral_date=None):
+    async def query_candidates(self, appointment_id, department_id, limit, prefers_evening=False, max_referral_date=None,
+                               columns: list[str] = CANDIDATE_COLUMNS):
         params = {"appointment_id": ("STRING", appointment_id), "department_id": ("STRING", department_id), "limit": ("INTEGER", limit)}
         
         query = f"""
                 SELECT
-                    w.*
+                    {', '.join(f'w.{column}' for column in columns) if columns else 'w.*'}
                 FROM
                     {api.config.project.WAITLIST_FQTN} AS w
                 LEFT JOIN
@@ -570,7 +663,64 @@ class WaitlistRepository:
         
         return await self.bq_client.run_query(query=query, named_params=params)
 
-    async def override_grade(self, waitlist_id: str, grade_override: GradeOverride):        
+    async def query_batch_candidates(self, slots: list[tuple[str, str]], limit, prefers_evening=False, max_referral_date=None,
+                                     columns: list[str] = CANDIDATE_COLUMNS):
+        """
+            query_candidates for many slots in one query, so slots of the same department share a scan of the waitlist.
+            Returns up to `limit` candidates per slot, in order, each with the `appointment_id` of its slot
+
+            :param list[tuple[str, str]] slots: `(appointment_id, department_id)` of each slot
+        """
+        if not slots:
+            return []
+
+        params = {
+            "slots": ("ARRAY<STRUCT<appointment_id STRING, department_id STRING>>",
+                      [{"appointment_id": appointment_id, "department_id": department_id} for appointment_id, department_id in slots]),
+            "limit": ("INTEGER", limit)
+        }
+
+        query = f"""
+                SELECT
+                    s.appointment_id,
+                    {', '.join(f'w.{column}' for column in columns) if columns else 'w.*'},
+                    ROW_NUMBER() OVER (
+                        PARTITION BY s.appointment_id
+                        ORDER BY
+                            w.prefers_evening {'DESC' if prefers_evening else 'ASC'},
+                            w.clinical_urgency DESC,
+                            w.condition_severity DESC,
+                            w.comorbidities DESC,
+                            w.referral_date ASC,
+                            w.waitlist_id ASC
+                    ) AS candidate_rank
+                FROM
+                    (SELECT * FROM UNNEST(@slots)) AS s
+                JOIN
+                    {api.config.project.WAITLIST_FQTN} AS w
+                    ON w.department_id = s.department_id
+                LEFT JOIN
+                    {api.config.project.REJECTED_APPOINTMENTS_FQTN} AS r
+                    ON w.waitlist_id = r.waitlist_id AND r.appointment_id = s.appointment_id
+                WHERE
+                    w.is_assigned IS FALSE
+                    AND r.waitlist_id IS NULL
+                    AND NOT w.is_seen
+                    AND w.deleted_at IS NULL"""
+
+        if max_referral_date:
+            query += " AND w.referral_date <= @max_referral_date"
+            params["max_referral_date"] = ("DATETIME", max_referral_date.isoformat())
+
+        query += """
+                QUALIFY candidate_rank <= @limit
+                ORDER BY s.appointment_id, candidate_rank
+                """
+
+        return await self.bq_client.run_query(query=query, named_params=params)
+
+    async def override_grade(self, waitlist_id: str, grade_override: GradeOverride):
+        """Overwrite a patient's grades and return the columns written, to apply to the row the caller holds"""
         current_datetime = datetime.now(tz=ZoneInfo(LOCAL_TIMEZONE)).replace(tzinfo=None).isoformat() # Make sure time is London, but strip timezone info after (e.g. # 2025-08-15 14:30:00+01:00 -> # 2025-08-15 14:30:00)
 
         query = f"""
@@ -592,3 +742,9 @@ class WaitlistRepository:
         }
         
         await self.bq_client.run_query(query=query, named_params=parameters)
+        return {
+            "clinical_urgency": grade_override.clinical_urgency,
+            "condition_severity": grade_override.condition_severity,
+            "comorbidities": grade_override.comorbidities,
+            "edited_at": datetime.fromisoformat(current_datetime)
+        }
@@ -1 +1 @@
-from . import appointments, match, waitlist, departments, hospitals, match, rejected_appointments, dashboard
+from . import appointments, match, waitlist, departments, hospitals, match, rejected_appointments, dashboard, scheduler, metrics
@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends
-from api.services import AppointmentsService, AuthService, MatchService
-from api.models import AppointmentsFilterParams, AppointmentCreate
+from fastapi import APIRouter, Depends, HTTPException
+from api.services import AppointmentsService, AuthService, MatchService, WaitlistService, get_appointments_service, get_match_service, get_waitlist_service
+from api.models import AppointmentsFilterParams, AppointmentCreate, AppointmentTemplate
+from api.utils import conditional_get, LeaseUnavailableError
+import api.config.project
 
 router = APIRouter()
 
 @router.get("/")
-async def root(params: AppointmentsFilterParams = Depends(), current_user: dict = Depends(AuthService.get_current_user_or_service)):
+async def root(params: AppointmentsFilterParams = Depends(), service: AppointmentsService = Depends(get_appointments_service), current_user: dict = Depends(AuthService.get_current_user_or_service),
+               not_modified: None = Depends(conditional_get(api.config.project.APPOINTMENTS_FQTN, clock="appointments"))):
     """
         Return slots matching filter criteria
             
@@ -16,32 +19,68 @@ async def root(params: AppointmentsFilterParams = Depends(), current_user: dict
         :param str | None (optional) department_id: Department ID of the slot
     """
         
-    service = AppointmentsService()
     result = await service.get_paginated_appointments(params)
 
     return result
 
 
 @router.post("/add")
-async def add_appointment(appointment: AppointmentCreate, current_user: dict = Depends(AuthService.get_current_user_or_service)):
+async def add_appointment(appointment: AppointmentCreate,
+                          appointments_service: AppointmentsService = Depends(get_appointments_service),
+                          match_service: MatchService = Depends(get_match_service),
+                          waitlist_service: WaitlistService = Depends(get_waitlist_service),
+                          current_user: dict = Depends(AuthService.get_current_user_or_service)):
     """
         Add an appointment to the system. If auto_assign is true, automatically assigns it to the best patient.
         
         :param AppointmentCreate appointment: The appointment data including time, department, hospital, and auto_assign flag
     """
     
-    appointments_service = AppointmentsService()
     result = await appointments_service.add_appointment(appointment)
     
     #REFACTOR into the service, don't check this at API level
     if appointment.auto_assign:
-        match_service = MatchService()
         assignment_result = await match_service.assign_selected_appointments([result['appointment_id']])
         
-        if assignment_result.get('successful', False):
-            params = AppointmentsFilterParams(appointment_id=result['appointment_id'])
-            updated_appointments = await appointments_service.get_paginated_appointments(params)
-            if updated_appointments:
-                result = updated_appointments["results"][0]
+        # Apply what the assignment wrote instead of reading the appointment back
+        for assignment in assignment_result.get('assignments', []):
+            result = {**result, **assignment}
+    elif result:
+        # Rank candidates now so they are ready when staff open the slot or assign_at arrives
+        waitlist_service.schedule_shortlist(result)
     
-    return result if result else None
\ No newline at end of file
+    return result if result else None
+
+
+@router.post("/template")
+async def add_appointment_template(template: AppointmentTemplate,
+                                   appointments_service: AppointmentsService = Depends(get_appointments_service),
+                                   match_service: MatchService = Depends(get_match_service),
+                                   waitlist_service: WaitlistService = Depends(get_waitlist_service),
+                                   current_user: dict = Depends(AuthService.get_current_user_or_service)):
+    """
+        Create the slots of a recurring clinic, e.g. every Tuesday 09:00-12:00 in 20 minute slots, in one batch.
+        Safe to re-submit: slots that already exist are reported under `existing` rather than created again, and
+        slots overlapping another appointment of the clinic are reported under `overlapping`. A submission for a clinic
+        that another request is still adding slots to is refused with 409.
+        If auto_assign is true, the created slots are assigned to the best patients straight away.
+
+        :param AppointmentTemplate template: The date range, weekly sessions, slot length, department, hospital, properties and auto_assign flag
+    """
+
+    try:
+        result = await appointments_service.add_appointment_template(template)
+    except LeaseUnavailableError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    result["assignment"] = None
+    if template.auto_assign and result["created"]:
+        result["assignment"] = await match_service.assign_selected_appointments(
+            [appointment['appointment_id'] for appointment in result["created"]]
+        )
+    else:
+        # Rank candidates now so they are ready when staff open the slots or assign_at arrives, as for /add
+        for appointment in result["created"]:
+            waitlist_service.schedule_shortlist(appointment)
+
+    return result
@@ -1,15 +1,17 @@
 from fastapi import APIRouter, Depends
-from api.services import DashboardService, AuthService
+from api.services import DashboardService, AuthService, get_dashboard_service
+from api.utils import conditional_get
+import api.config.project
 
 router = APIRouter()
 
 @router.get("/")
-async def root(current_user: dict = Depends(AuthService.get_current_user_or_service)):
+async def root(service: DashboardService = Depends(get_dashboard_service), current_user: dict = Depends(AuthService.get_current_user_or_service),
+               not_modified: None = Depends(conditional_get(api.config.project.APPOINTMENTS_FQTN, api.config.project.WAITLIST_FQTN, clock="dashboard"))):
     """
         Return dashboard statistics for the frontend
     """
 
-    service = DashboardService()
     result = await service.get_dashboard_stats()
 
     return result
@@ -1,15 +1,17 @@
 from fastapi import APIRouter, Depends
-from api.services import DepartmentsService, AuthService
+from api.services import DepartmentsService, AuthService, get_departments_service
+from api.utils import conditional_get
+import api.config.project
 
 router = APIRouter()
 
 @router.get("/")
-async def root(current_user: dict = Depends(AuthService.get_current_user_or_service)):
+async def root(service: DepartmentsService = Depends(get_departments_service), current_user: dict = Depends(AuthService.get_current_user_or_service),
+               not_modified: None = Depends(conditional_get(api.config.project.DEPARTMENTS_FQTN))):
     """
         Return all departments
     """
 
-    service = DepartmentsService()
     result = await service.get_departments()
 
     return result
@@ -1,15 +1,17 @@
 from fastapi import APIRouter, Depends
-from api.services import HospitalsService, AuthService
+from api.services import HospitalsService, AuthService, get_hospitals_service
+from api.utils import conditional_get
+import api.config.project
 
 router = APIRouter()
 
 @router.get("/")
-async def root(current_user: dict = Depends(AuthService.get_current_user_or_service)):
+async def root(service: HospitalsService = Depends(get_hospitals_service), current_user: dict = Depends(AuthService.get_current_user_or_service),
+               not_modified: None = Depends(conditional_get(api.config.project.HOSPITALS_FQTN))):
     """
         Return all hospitals
     """
 
-    service = HospitalsService()
     result = await service.get_hospitals()
 
     return result
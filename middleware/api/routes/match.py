@@ -1,8 +1,14 @@
-from fastapi import APIRouter, Depends
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from api.models import Assignment
-from api.services import MatchService, AuthService, WaitlistService
+from api.services import MatchService, AuthService, WaitlistService, get_match_service, get_waitlist_service
+from api.repositories import AssignmentConflictError
+from api.utils import LeaseUnavailableError
+from api.utils.scheduler import Scheduler, JobAlreadyRunningError
+from api.config.matching import CANDIDATE_BATCH_MAX_SLOTS
 from typing import List
+import json
 
 router = APIRouter()
 
@@ -14,14 +20,16 @@ async def root(current_user: dict = Depends(AuthService.get_programmatic_access)
         to the highest priority patient.
     """
 
-    service = MatchService()
-    result = await service.automatic_assignment()
+    try:
+        result = await Scheduler().run_job("automatic_assignment")
+    except JobAlreadyRunningError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
     return result
 
 
 @router.get("/get-candidates")
-async def root(appointment_id: str, limit: int = 5, current_user: dict = Depends(AuthService.get_current_user_or_service)):
+async def root(appointment_id: str, limit: int = 5, service: WaitlistService = Depends(get_waitlist_service), current_user: dict = Depends(AuthService.get_current_user_or_service)):
     """
         Returns top 5 best fit patients for a given slot
             
@@ -29,36 +37,56 @@ async def root(appointment_id: str, limit: int = 5, current_user: dict = Depends
         :param int limit: number of patients to return
     """
 
-    service = WaitlistService()
     result = await service.get_candidates(appointment_id, limit)
 
     return result
 
 
+@router.post("/get-candidates/batch")
+async def get_candidates_batch(appointment_ids: List[str], limit: int = 5, service: WaitlistService = Depends(get_waitlist_service), current_user: dict = Depends(AuthService.get_current_user_or_service)):
+    """
+        Returns the best fit patients for many slots, as `/get-candidates` would for each. Streams back one NDJSON
+        `{appointment_id, candidates}` per slot as soon as its shortlist is ready, so not in the order given.
+
+        :param List[str] appointment_ids: The IDs of the appointments to match patients to
+        :param int limit: number of patients to return per slot
+    """
+
+    if len(appointment_ids) > CANDIDATE_BATCH_MAX_SLOTS:
+        raise HTTPException(status_code=400, detail=f"At most {CANDIDATE_BATCH_MAX_SLOTS} appointments per batch")
+
+    async def generate():
+        async for result in service.get_candidates_batch(appointment_ids, limit):
+            yield json.dumps(jsonable_encoder(result)) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
 @router.post("/assign-selected")
-async def assign_selected(appointment_ids: List[str], current_user: dict = Depends(AuthService.get_current_user_or_service)):
+async def assign_selected(appointment_ids: List[str], service: MatchService = Depends(get_match_service), current_user: dict = Depends(AuthService.get_current_user_or_service)):
     """
         Assigns specific appointment slots to the highest priority patients.
         
         :param List[str] appointment_ids: List of appointment IDs to assign
     """
 
-    service = MatchService()
     result = await service.assign_selected_appointments(appointment_ids)
 
     return result
 
 
 @router.post("/manual-assign")
-async def root(assignment: Assignment, current_user: dict = Depends(AuthService.get_current_user_or_service)):
+async def root(assignment: Assignment, service: MatchService = Depends(get_match_service), current_user: dict = Depends(AuthService.get_current_user_or_service)):
     """
         Manually assign a patient to an appointment slot
 
         :param Assignment assignment: The assignment of a patient to an appointment.
     """
 
-    service = MatchService()
-    result = await service.manual_assign_patient(assignment)
+    try:
+        result = await service.manual_assign_patient(assignment)
+    except (AssignmentConflictError, LeaseUnavailableError) as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
     if result is None:
         return JSONResponse(status_code=400, content={"message": "Unable to assign appointment"}) #FIXME inconsistent error type compared to other HTTP errors
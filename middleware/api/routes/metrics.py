@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from api.services import AuthService
+from api.utils.instrumentation import Metrics
+
+router = APIRouter()
+
+
+@router.get("/", response_class=PlainTextResponse)
+async def root(current_user: dict = Depends(AuthService.get_programmatic_access)):
+    """
+        Return request latency and per-request query, agent and routing call metrics in the Prometheus text format
+    """
+
+    return PlainTextResponse(Metrics().render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends, HTTPException
+from api.services import AuthService
+from api.utils.scheduler import Scheduler, JobAlreadyRunningError
+
+router = APIRouter()
+
+
+@router.get("/")
+async def root(current_user: dict = Depends(AuthService.get_programmatic_access)):
+    """
+        Return the registered recurring jobs, their cadence and recent run history
+    """
+
+    return await Scheduler().status()
+
+
+@router.post("/run/{job_name}")
+async def run_job(job_name: str, current_user: dict = Depends(AuthService.get_programmatic_access)):
+    """
+        Run a recurring job now, e.g. to benchmark it locally without waiting for its next scheduled run
+
+        :param str job_name: The name of the job, as listed by `/scheduler/`
+    """
+
+    scheduler = Scheduler()
+    if job_name not in scheduler.jobs:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_name}")
+
+    try:
+        return await scheduler.run_job(job_name)
+    except JobAlreadyRunningError as e:
+        raise HTTPException(status_code=409, detail=str(e))
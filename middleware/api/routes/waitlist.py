@@ -1,15 +1,21 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.encoders import jsonable_encoder
-from api.services import WaitlistService, AuthService
+from api.services import WaitlistService, AuthService, get_waitlist_service
 from api.models import WaitlistFilterParams, Patient, GradeOverride
+from api.utils import conditional_get
+import api.config.project
+from api.utils.scheduler import Scheduler, JobAlreadyRunningError
+from api.utils.record_stream import RECORD_FORMATS, read_records, DuplexStreamingResponse
+from datetime import datetime
 import json
 import asyncio
 
 router = APIRouter()
 
 @router.get("/")
-async def root(params: WaitlistFilterParams = Depends(), current_user: dict = Depends(AuthService.get_current_user_or_service)):
+async def root(params: WaitlistFilterParams = Depends(), service: WaitlistService = Depends(get_waitlist_service), current_user: dict = Depends(AuthService.get_current_user_or_service),
+               not_modified: None = Depends(conditional_get(api.config.project.WAITLIST_FQTN))):
     """
         Return patients matching filter criteria
         
@@ -30,21 +36,19 @@ async def root(params: WaitlistFilterParams = Depends(), current_user: dict = De
         :param int | None (optional) offset: Offset responses by n from the top
     """
 
-    service = WaitlistService()
     result = await service.get_patients(params)
 
     return result
 
 
 @router.get("/grade/{waitlist_id}")
-async def get_patient(waitlist_id: str, current_user: dict = Depends(AuthService.get_current_user_or_service)):
+async def get_patient(waitlist_id: str, service: WaitlistService = Depends(get_waitlist_service), current_user: dict = Depends(AuthService.get_current_user_or_service)):
     """
         Pass patient to clinical grading agent and return their new data
         
         :param str waitlist_id: The ID of the patient to grade
     """
     
-    service = WaitlistService()
     result = await service.grade_patient(waitlist_id)
     
     if result is None:
@@ -59,18 +63,19 @@ async def grade_all_patients(current_user: dict = Depends(AuthService.get_progra
         Grade all patients where grading_status is not complete or grading has been stuck for over 1 hour
     """
     
-    service = WaitlistService()
-    result = await service.grade_all_patients()
+    try:
+        result = await Scheduler().run_job("grade_all")
+    except JobAlreadyRunningError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     
     return result
 
 @router.post("/add")
-async def add_patient(patient: Patient, current_user: dict = Depends(AuthService.get_current_user_or_service)):
+async def add_patient(patient: Patient, service: WaitlistService = Depends(get_waitlist_service), current_user: dict = Depends(AuthService.get_current_user_or_service)):
     """
         Add a patient to the waitlist. If auto_grade is true, streams responses from the grading agent.
     """
     
-    service = WaitlistService()
     result = await service.add_patient(patient)
     
     #REFACTOR into the service, don't check this at API level
@@ -105,8 +110,34 @@ async def add_patient(patient: Patient, current_user: dict = Depends(AuthService
     return result
 
 
+@router.post("/bulk")
+async def add_patients_bulk(request: Request, auto_grade: bool = False, service: WaitlistService = Depends(get_waitlist_service), current_user: dict = Depends(AuthService.get_current_user_or_service)):
+    """
+        Add many patients from a streamed NDJSON (`application/x-ndjson`) or CSV (`text/csv`, with a header row) body,
+        one referral per line with the fields of `/add`. Streams back one NDJSON result per line, in order, then a summary.
+        A batch that can't be looked up or written is reported as failed row by row, and the stream ends with an error
+        line if the upload stops early.
+
+        :param bool auto_grade: Grade every added patient in the background, instead of waiting for the next grade-all run
+    """
+
+    record_format = RECORD_FORMATS.get(request.headers.get("content-type", "").split(";")[0].strip())
+    if record_format is None:
+        raise HTTPException(status_code=415, detail=f"Send one of: {', '.join(RECORD_FORMATS)}")
+
+    async def generate():
+        try:
+            async for result in service.add_patients(read_records(request.stream(), record_format), auto_grade):
+                yield json.dumps(jsonable_encoder(result)) + "\n"
+        except Exception as e:
+            # The rows already streamed back are applied, none after them were
+            yield json.dumps({"status": "error", "message": f"Bulk ingest stopped: {str(e)}"}) + "\n"
+
+    return DuplexStreamingResponse(generate(), media_type="application/x-ndjson")
+
+
 @router.post("/override-grade/{waitlist_id}")
-async def override_grade(waitlist_id: str, grade_override: GradeOverride, current_user: dict = Depends(AuthService.get_current_user_or_service)):
+async def override_grade(waitlist_id: str, grade_override: GradeOverride, service: WaitlistService = Depends(get_waitlist_service), current_user: dict = Depends(AuthService.get_current_user_or_service)):
     """
         Override the grading values for a patient and set edited_at to current time.
         
@@ -114,7 +145,6 @@ async def override_grade(waitlist_id: str, grade_override: GradeOverride, curren
         :param GradeOverride grade_override: The new grading values (clinical_urgency, condition_severity, comorbidities)
     """
     
-    service = WaitlistService()
     result = await service.override_grade(waitlist_id, grade_override)
     
     if result is None:
@@ -129,7 +159,43 @@ async def mark_seen(current_user: dict = Depends(AuthService.get_programmatic_ac
         Mark all patients seen if their appointment time has passed
     """
     
-    service = WaitlistService()
-    result = await service.mark_seen()
+    try:
+        result = await Scheduler().run_job("mark_seen")
+    except JobAlreadyRunningError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     
-    return result
\ No newline at end of file
+    return result
+
+
+@router.post("/mark-seen/backfill")
+async def backfill_mark_seen(start_time: datetime, end_time: datetime | None = None, service: WaitlistService = Depends(get_waitlist_service), current_user: dict = Depends(AuthService.get_programmatic_access)):
+    """
+        Mark patients seen for appointments in a time range, to fill a gap the incremental job missed
+
+        :param datetime start_time: Process appointments at or after this time (ISO 8601)
+        :param datetime | None (optional) end_time: Process appointments before this time, defaults to now (ISO 8601)
+    """
+
+    if end_time and end_time < start_time:
+        raise HTTPException(status_code=400, detail="start_time must be earlier than end_time")
+
+    result = await service.backfill_mark_seen(start_time, end_time)
+
+    return result
+
+
+# Registered last so the single-segment path doesn't shadow /grade-all and /mark-seen
+@router.get("/{waitlist_id}")
+async def get_patient_details(waitlist_id: str, service: WaitlistService = Depends(get_waitlist_service), current_user: dict = Depends(AuthService.get_current_user_or_service)):
+    """
+        Return every field of one patient, including the medical history and agent justification left out of the list
+
+        :param str waitlist_id: The ID of the patient
+    """
+
+    result = await service.get_patient(waitlist_id)
+
+    if result is None:
+        raise HTTPException(status_code=404, detail="Patient not found")
+
+    return result
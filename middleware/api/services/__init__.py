@@ -7,3 +7,7 @@ from .rejected_appointments_service import RejectedAppointmentsService
 from .dashboard_service import DashboardService
 from .auth_service import AuthService
 from .secrets import Secrets
+from .scheduled_jobs import register_jobs
+from .dependencies import (register_services, get_appointments_service, get_waitlist_service, get_match_service,
+                           get_hospitals_service, get_departments_service, get_rejected_appointments_service,
+                           get_dashboard_service, get_secrets)
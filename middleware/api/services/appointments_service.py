@@ -1,15 +1,127 @@
 from api.repositories import AppointmentsRepository
-from api.models import AppointmentsFilterParams, AppointmentCreate
+from api.repositories.appointments_repo import APPOINTMENT_LIST_COLUMNS
+from api.models import AppointmentsFilterParams, AppointmentCreate, AppointmentTemplate
+from api.config.ingestion import TEMPLATE_MAX_SLOTS
+from api.utils.time_utils import LOCAL_TIMEZONE, datetime_add
+from api.utils.leases import LeaseManager
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from zoneinfo import ZoneInfo
+import bisect
+import uuid
+
+# Namespace of template slot ids, so the same clinic slot always gets the same appointment_id
+TEMPLATE_SLOT_NAMESPACE = uuid.UUID("5c1e7d2a-3b8f-4e0a-9d6c-7a41f2b9e305")
+
+
+def template_slot_id(hospital_id: str, department_id: str, appointment_time: datetime) -> str:
+    return str(uuid.uuid5(TEMPLATE_SLOT_NAMESPACE, f"{hospital_id}|{department_id}|{appointment_time.isoformat()}"))
+
+
+def expand_template(template: AppointmentTemplate, after: datetime) -> list[datetime]:
+    """Start times of every slot the template describes after the given time, in order"""
+    slot_length = timedelta(minutes=template.slot_minutes)
+    times = []
+
+    day = template.start_date
+    while day <= template.end_date:
+        for session in template.sessions:
+            if session.weekday != day.weekday():
+                continue
+
+            slot_time = datetime.combine(day, session.start_time)
+            session_end = datetime.combine(day, session.end_time)
+            while slot_time + slot_length <= session_end:
+                if slot_time > after:
+                    times.append(slot_time)
+                slot_time += slot_length
+        day += timedelta(days=1)
+
+    return sorted(set(times))
+
 
 class AppointmentsService:
-    def __init__(self):
-        self.repo = AppointmentsRepository()
+    def __init__(self, repo: AppointmentsRepository = None):
+        self.repo = repo or AppointmentsRepository()
+        self.leases = LeaseManager()
 
-    async def get_appointments(self, params: AppointmentsFilterParams):
-        return await self.repo.query_appointments(params)
+    async def get_appointments(self, params: AppointmentsFilterParams, columns: list[str] = None):
+        return await self.repo.query_appointments(params, columns=columns)
 
     async def get_paginated_appointments(self, params: AppointmentsFilterParams):
-        return await self.repo.query_paginated_appointments(params)
+        return await self.repo.query_paginated_appointments(params, columns=APPOINTMENT_LIST_COLUMNS)
     
     async def add_appointment(self, appointment: AppointmentCreate):
-        return await self.repo.add_appointment(appointment)
\ No newline at end of file
+        return await self.repo.add_appointment(appointment)
+
+    async def add_appointment_template(self, template: AppointmentTemplate) -> dict:
+        """
+        Expand a recurring clinic template into slots and insert them in one batch.
+
+        Each slot's appointment_id is derived from its clinic and time, so re-submitting a template only creates the
+        slots that don't exist yet. Slots overlapping another slot of the template or an existing appointment of the
+        same clinic (assumed to last as long as the template's slots) are skipped and reported.
+
+        The clinic is leased from the read of its appointments until the insert, so two submissions for the same
+        clinic can't both count a slot as created; the second fails with LeaseUnavailableError.
+        """
+        now = datetime.now(tz=ZoneInfo(LOCAL_TIMEZONE)).replace(tzinfo=None)
+        slot_length = timedelta(minutes=template.slot_minutes)
+
+        times = expand_template(template, after=now)
+        if len(times) > TEMPLATE_MAX_SLOTS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"The template describes {len(times)} slots, at most {TEMPLATE_MAX_SLOTS} can be created at once"
+            )
+
+        result = {"created": [], "existing": [], "overlapping": []}
+        if not times:
+            return result
+
+        # Long enough for the read and a MERGE of TEMPLATE_MAX_SLOTS rows
+        async with self.leases.hold([f"clinic:{template.hospital_id}:{template.department_id}"], ttl_seconds=300):
+            # One read of the clinic's appointments around the template, overlaps are then found in memory
+            window = await self.repo.query_slot_window(template.hospital_id, template.department_id,
+                                                       times[0] - slot_length, times[-1] + slot_length)
+            existing_ids = {row['appointment_id'] for row in window}
+            booked = [(row['appointment_time'], row['appointment_id']) for row in window if row['deleted_at'] is None]
+            booked_times = [booked_time for booked_time, _ in booked]
+
+            # Give the user at least 1 hour to manually assign the appointments, as for single appointments
+            assign_at = None if template.auto_assign else datetime.fromisoformat(datetime_add(hours=2, truncate_to_hour=True))
+
+            previous = None
+            for slot_time in times:
+                appointment_id = template_slot_id(template.hospital_id, template.department_id, slot_time)
+                if appointment_id in existing_ids:
+                    result["existing"].append(appointment_id)
+                    previous = slot_time
+                    continue
+
+                # Neighbouring appointments of the clinic that start less than one slot away
+                i = bisect.bisect_right(booked_times, slot_time - slot_length)
+                conflict = booked[i][1] if i < len(booked) and booked_times[i] < slot_time + slot_length else None
+                if conflict is None and previous is not None and slot_time < previous + slot_length:
+                    conflict = template_slot_id(template.hospital_id, template.department_id, previous)
+
+                if conflict is not None:
+                    result["overlapping"].append({"appointment_time": slot_time, "conflicts_with": conflict})
+                    continue
+
+                previous = slot_time
+                result["created"].append(self.repo.build_appointment(appointment_id, slot_time, template.department_id,
+                                                                     template.hospital_id, template.properties, assign_at))
+
+            inserted = await self.repo.add_appointments(result["created"])
+
+        if inserted != len(result["created"]):
+            # Only a write bypassing the lease (made outside the middleware, or after the lease expired) gets here, and
+            # the count doesn't say which slots it took, so report the clash rather than a wrong split
+            raise HTTPException(
+                status_code=409,
+                detail=f"{inserted} of {len(result['created'])} new slots were created, the others were added by another "
+                       f"request meanwhile. Re-submit the template to see which slots exist"
+            )
+
+        return result
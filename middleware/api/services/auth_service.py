@@ -1,14 +1,26 @@
 from fastapi import Header, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from firebase_admin import auth
 from api.services.secrets import Secrets
+from api.utils.container import Container
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
+
+def _firebase_auth():
+    """Import Firebase and initialise the default app on first use, service-to-service calls never need it"""
+    import firebase_admin
+    from firebase_admin import auth
+
+    try:
+        firebase_admin.get_app()
+    except ValueError:
+        firebase_admin.initialize_app()
+    return auth
+
 class AuthService:
     @staticmethod
     def _validate_api_key(api_key: str) -> bool:
-        secret = Secrets()
+        secret = Container().resolve(Secrets)
         return api_key == secret.get_secret("SERVICE_API_KEY")
     
     @staticmethod
@@ -28,6 +40,7 @@ class AuthService:
 
         # If a token is provided, use it as the secondary auth method
         if token:
+            auth = _firebase_auth()
             try:
                 decoded_token = auth.verify_id_token(token)
                 email = decoded_token.get("email")
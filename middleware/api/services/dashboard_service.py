@@ -1,8 +1,8 @@
 from api.repositories import DashboardRepository
 
 class DashboardService:
-    def __init__(self):
-        self.repo = DashboardRepository()
+    def __init__(self, repo: DashboardRepository = None):
+        self.repo = repo or DashboardRepository()
 
     async def get_dashboard_stats(self):
         return await self.repo.query_dashboard_stats()
\ No newline at end of file
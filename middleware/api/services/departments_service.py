@@ -1,8 +1,8 @@
 from api.repositories import DepartmentsRepository
 
 class DepartmentsService:
-    def __init__(self):
-        self.repo = DepartmentsRepository()
+    def __init__(self, repo: DepartmentsRepository = None):
+        self.repo = repo or DepartmentsRepository()
 
     async def get_departments(self):
         return await self.repo.query_departments()
\ No newline at end of file
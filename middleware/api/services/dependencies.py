@@ -0,0 +1,54 @@
+from api.repositories import (AppointmentsRepository, WaitlistRepository, MatchRepository, HospitalsRepository,
+                              DepartmentsRepository, RejectedAppointmentsRepository, DashboardRepository,
+                              JobStateRepository)
+from api.services.appointments_service import AppointmentsService
+from api.services.waitlist_service import WaitlistService
+from api.services.match_service import MatchService
+from api.services.hospitals_service import HospitalsService
+from api.services.departments_service import DepartmentsService
+from api.services.rejected_appointments_service import RejectedAppointmentsService
+from api.services.dashboard_service import DashboardService
+from api.services.secrets import Secrets
+from api.utils.container import Container
+
+
+def register_services(container: Container):
+    """Register the middleware's services, repositories and clients as application-scoped singletons"""
+    for repository in [AppointmentsRepository, WaitlistRepository, MatchRepository, HospitalsRepository,
+                       DepartmentsRepository, RejectedAppointmentsRepository, DashboardRepository, JobStateRepository]:
+        container.register(repository, lambda c, repository=repository: repository())
+
+    container.register(Secrets, lambda c: Secrets())
+
+    container.register(AppointmentsService, lambda c: AppointmentsService(repo=c.resolve(AppointmentsRepository)))
+    container.register(HospitalsService, lambda c: HospitalsService(repo=c.resolve(HospitalsRepository)))
+    container.register(DepartmentsService, lambda c: DepartmentsService(repo=c.resolve(DepartmentsRepository)))
+    container.register(DashboardService, lambda c: DashboardService(repo=c.resolve(DashboardRepository)))
+    container.register(WaitlistService, lambda c: WaitlistService(
+        waitlist_repo=c.resolve(WaitlistRepository),
+        match_repo=c.resolve(MatchRepository),
+        job_state_repo=c.resolve(JobStateRepository),
+        hospitals_service=c.resolve(HospitalsService),
+        appointments_service=c.resolve(AppointmentsService),
+        secrets=c.resolve(Secrets)
+    ))
+    container.register(MatchService, lambda c: MatchService(
+        match_repo=c.resolve(MatchRepository),
+        appointment_service=c.resolve(AppointmentsService),
+        waitlist_service=c.resolve(WaitlistService)
+    ))
+    container.register(RejectedAppointmentsService, lambda c: RejectedAppointmentsService(
+        repo=c.resolve(RejectedAppointmentsRepository),
+        waitlist_service=c.resolve(WaitlistService)
+    ))
+
+
+# FastAPI dependencies, e.g. `service: WaitlistService = Depends(get_waitlist_service)`
+get_appointments_service = Container().dependency(AppointmentsService)
+get_waitlist_service = Container().dependency(WaitlistService)
+get_match_service = Container().dependency(MatchService)
+get_hospitals_service = Container().dependency(HospitalsService)
+get_departments_service = Container().dependency(DepartmentsService)
+get_rejected_appointments_service = Container().dependency(RejectedAppointmentsService)
+get_dashboard_service = Container().dependency(DashboardService)
+get_secrets = Container().dependency(Secrets)
@@ -1,8 +1,8 @@
 from api.repositories import HospitalsRepository
 
 class HospitalsService:
-    def __init__(self):
-        self.repo = HospitalsRepository()
+    def __init__(self, repo: HospitalsRepository = None):
+        self.repo = repo or HospitalsRepository()
 
     async def get_hospitals(self):
         return await self.repo.query_hospitals()
@@ -1,16 +1,28 @@
 from api.repositories import MatchRepository
+from api.repositories.appointments_repo import APPOINTMENT_MATCHING_COLUMNS
 from api.models import Assignment, AppointmentsFilterParams
 from api.services.appointments_service import AppointmentsService
 from api.services.waitlist_service import WaitlistService
 from api.utils.time_utils import is_evening_hours
+from api.utils.stage_timer import StageTimer
+from api.utils.leases import LeaseManager
+from collections import defaultdict
 from datetime import datetime
+import asyncio
+
+
+# Why a selected appointment wasn't assigned: listed twice, no such appointment, soft deleted, already happened,
+# already has a patient, or past its assign_at (left to automatic assignment)
+REJECTION_REASONS = ("duplicate", "not_found", "deleted", "past", "already_assigned", "assignment_window_closed")
 
 
 class MatchService:
-    def __init__(self):
-        self.match_repo = MatchRepository()
-        self.appointment_service = AppointmentsService()
-        self.waitlist_service = WaitlistService()
+    def __init__(self, match_repo: MatchRepository = None, appointment_service: AppointmentsService = None,
+                 waitlist_service: WaitlistService = None):
+        self.match_repo = match_repo or MatchRepository()
+        self.appointment_service = appointment_service or AppointmentsService()
+        self.waitlist_service = waitlist_service or WaitlistService()
+        self.leases = LeaseManager()
 
     async def automatic_assignment(self):
         try:
@@ -19,7 +31,7 @@ class MatchService:
                 status=1,  # waitlist_id is NULL
                 auto_assignable=True
             )
-            appointments = await self.appointment_service.get_appointments(params) #? await used on non async function (might be okay but check)
+            appointments = await self.appointment_service.get_appointments(params, columns=APPOINTMENT_MATCHING_COLUMNS) #? await used on non async function (might be okay but check)
             return await self._assign_appointments(appointments)
 
         except Exception as e:
@@ -30,25 +42,16 @@ class MatchService:
             }
 
     async def assign_selected_appointments(self, appointment_ids: list[str]):
+        """
+        Assign the selected appointments to their best patients. The appointments are checked and fetched in one
+        query, and those that can't be assigned are counted as failed and listed under `rejected` with the reason.
+        """
         try:
-            appointments = []
-            failed = 0
-            
-            for appointment_id in appointment_ids:
-                # Check if appointment can be assigned before proceeding
-                if not await self._is_appointment_assignable(appointment_id):
-                    failed += 1
-                    continue
-                    
-                params = AppointmentsFilterParams(appointment_id=appointment_id, status=1)
-                appointment_list = await self.appointment_service.get_appointments(params)
-                if appointment_list:
-                    appointments.extend(appointment_list) #? Why would more than 1 element be added
-                else:
-                    failed += 1
-            
+            appointments, rejected = await self._validate_selected_appointments(appointment_ids)
+
             result = await self._assign_appointments(appointments)
-            result["failed"] += failed
+            result["failed"] += len(rejected)
+            result["rejected"] = rejected
             
             return result
 
@@ -59,47 +62,138 @@ class MatchService:
                 "message": f"Critical error: {str(e)}"
             }
 
-    async def _assign_appointments(self, appointments):
-        successful = 0
-        failed = 0
+    async def _validate_selected_appointments(self, appointment_ids: list[str]) -> tuple[list[dict], list[dict]]:
+        """
+        Split the selected appointments into those that can be assigned, and `{appointment_id, reason}` for each
+        that can't, with reason one of REJECTION_REASONS
+        """
+        rows = {appointment['appointment_id']: appointment
+                for appointment in await self.match_repo.query_appointments_for_assignment(list(set(appointment_ids)))}
+
+        appointments = []
+        rejected = []
+        seen = set()
+        for appointment_id in appointment_ids:
+            appointment = rows.get(appointment_id)
+
+            if appointment_id in seen:
+                reason = "duplicate"
+            elif appointment is None:
+                reason = "not_found"
+            elif appointment.get('deleted_at') is not None:
+                reason = "deleted"
+            elif not appointment['is_upcoming']:
+                reason = "past"
+            elif appointment.get('waitlist_id') is not None:
+                reason = "already_assigned"
+            elif not appointment['is_manually_assignable']:
+                reason = "assignment_window_closed"
+            else:
+                reason = None
+
+            seen.add(appointment_id)
+            if reason:
+                rejected.append({"appointment_id": appointment_id, "reason": reason})
+                continue
+
+            appointment.pop('is_upcoming')
+            appointment.pop('is_manually_assignable')
+            appointments.append(appointment)
+
+        return appointments, rejected
+
+    async def _assign_appointments(self, appointments, max_concurrent_departments: int = 4):
+        """
+        Assign each appointment to its best patient.
+
+        Departments are processed in parallel (bounded by `max_concurrent_departments`), while slots within a
+        department are processed in time order. Patients picked for a slot are reserved in memory so no two
+        slots in the same run can pick the same patient. The columns each assignment wrote are returned under
+        `assignments`, so callers can update the appointments they hold without reading them back.
+        """
+        results = {
+            "successful": 0,
+            "failed": 0
+        }
+        assignments = []
 
         last_error = None #? Why only the last error is logged
         info = ""
 
+        timer = StageTimer()
+        reserved_ids: set[str] = set()
+        semaphore = asyncio.Semaphore(max_concurrent_departments)
+
+        appointments_by_department = defaultdict(list)
         for appointment in appointments:
-            try:
-                # Assign evening patients preferentially if between 8 PM and 6 AM
-                is_evening = is_evening_hours()
-                waitlist_id = await self.waitlist_service.find_best_patient(appointment, prefers_evening=is_evening)
-
-                if waitlist_id is None:
-                    # No patient found, clear the assign_at to prevent future attempts
-                    await self.match_repo.clear_appointment_assignment(appointment['appointment_id'])
-                    failed += 1
-                    info = " No patient found for one or more appointments."
-                else:
-                    assignment = Assignment(
-                        appointment_id=appointment['appointment_id'],
-                        waitlist_id=waitlist_id
-                    )
-                    await self.match_repo.assign_patient(assignment)
-                    successful += 1
-            except Exception as e:
-                failed += 1
-                last_error = str(e)
-                continue
+            appointments_by_department[appointment.get('department_id')].append(appointment)
+
+        async def assign_department(department_appointments):
+            nonlocal last_error, info
+
+            async with semaphore:
+                for appointment in sorted(department_appointments, key=lambda a: (a['appointment_time'], a['appointment_id'])):
+                    try:
+                        # Assign evening patients preferentially if between 8 PM and 6 AM
+                        is_evening = is_evening_hours()
+                        waitlist_id = await self.waitlist_service.find_best_patient(appointment,
+                                                                                    prefers_evening=is_evening,
+                                                                                    excluded_ids=reserved_ids,
+                                                                                    timer=timer)
+
+                        if waitlist_id is None:
+                            # No patient found, clear the assign_at to prevent future attempts
+                            with timer.stage("commit"):
+                                await self.match_repo.clear_appointment_assignment(appointment['appointment_id'])
+                            results["failed"] += 1
+                            info = " No patient found for one or more appointments."
+                        else:
+                            reserved_ids.add(waitlist_id)
+                            assignment = Assignment(
+                                appointment_id=appointment['appointment_id'],
+                                waitlist_id=waitlist_id
+                            )
+                            with timer.stage("commit"):
+                                committed = await self._commit_assignment(assignment)
+                            results["successful"] += 1
+                            assignments.append({"appointment_id": appointment['appointment_id'],
+                                                "waitlist_id": waitlist_id,
+                                                "assign_at": committed.get("assign_at"),
+                                                "assigner_email": committed.get("assigner_email")})
+                    except Exception as e:
+                        results["failed"] += 1
+                        last_error = str(e)
+                        continue
+
+        await asyncio.gather(*[assign_department(department_appointments)
+                               for department_appointments in appointments_by_department.values()])
 
         return {
-            "successful": successful,
-            "failed": failed,
-            "message": last_error if last_error else f"Assignment completed successfully.{info}"
+            "successful": results["successful"],
+            "failed": results["failed"],
+            "message": last_error if last_error else f"Assignment completed successfully.{info}",
+            "assignments": assignments,
+            "stage_latency": timer.summary()
         }
 
     async def assign_patient(
         self,
         assignment: Assignment
     ):
-        return await self.match_repo.assign_patient(assignment)
+        return await self._commit_assignment(assignment)
+
+    async def _commit_assignment(self, assignment: Assignment):
+        """
+        Assign while holding leases on both rows, so concurrent matchers touching the same appointment or patient
+        fail fast with LeaseUnavailableError instead of racing. The repository's compare-and-set updates cover
+        writers in other processes.
+        """
+        async with self.leases.hold([f"appointment:{assignment.appointment_id}", f"waitlist:{assignment.waitlist_id}"]):
+            result = await self.match_repo.assign_patient(assignment)
+
+        await self.waitlist_service.on_assignment_changed(assignment.appointment_id,
+                                                    [assignment.waitlist_id, result.get("previous_waitlist_id")])
+        return result
 
     async def _is_appointment_assignable(self, appointment_id: str) -> bool:
         """
@@ -115,4 +209,4 @@ class MatchService:
         if not await self._is_appointment_assignable(assignment.appointment_id):
             return None
         
-        return await self.match_repo.assign_patient(assignment)
+        return await self._commit_assignment(assignment)
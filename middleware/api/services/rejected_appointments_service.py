@@ -1,20 +1,28 @@
 from api.repositories import RejectedAppointmentsRepository
 from api.models import Assignment
+from api.services.waitlist_service import WaitlistService
+from api.utils.leases import LeaseManager
 
 
 class RejectedAppointmentsService:
-    def __init__(self):
-        self.repo = RejectedAppointmentsRepository()
+    def __init__(self, repo: RejectedAppointmentsRepository = None, waitlist_service: WaitlistService = None):
+        self.repo = repo or RejectedAppointmentsRepository()
+        self.leases = LeaseManager()
+        self.waitlist_service = waitlist_service or WaitlistService()
 
     async def reject_appointment(
         self,
         assignment: Assignment
     ):
         try:
-            # Update each table through the repository functions
-            await self.repo.update_waitlist(assignment)
-            await self.repo.update_appointments(assignment)
-            await self.repo.update_rejected_appointments(assignment)
+            # Hold the same leases as assignment so a rejection can't interleave with a concurrent assign
+            async with self.leases.hold([f"appointment:{assignment.appointment_id}", f"waitlist:{assignment.waitlist_id}"]):
+                # Update each table through the repository functions
+                await self.repo.update_waitlist(assignment)
+                await self.repo.update_appointments(assignment)
+                await self.repo.update_rejected_appointments(assignment)
+
+            await self.waitlist_service.on_assignment_changed(assignment.appointment_id, [assignment.waitlist_id])
 
             return {"success": True, "message": "Tables updated successfully."}
 
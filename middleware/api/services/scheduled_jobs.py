@@ -0,0 +1,18 @@
+from api.services.match_service import MatchService
+from api.services.waitlist_service import WaitlistService
+from api.utils.scheduler import Scheduler
+from api.utils.container import Container
+from api.config.scheduler import JOB_INTERVALS, SCHEDULER_JITTER_SECONDS
+
+
+def register_jobs(scheduler: Scheduler):
+    """Register the middleware's recurring jobs, run on their cadence in local mode or on demand by Cloud Scheduler"""
+    jobs = {
+        "automatic_assignment": lambda: Container().resolve(MatchService).automatic_assignment(),
+        "grade_all": lambda: Container().resolve(WaitlistService).grade_all_patients(),
+        "mark_seen": lambda: Container().resolve(WaitlistService).mark_seen(),
+        "refresh_shortlists": lambda: Container().resolve(WaitlistService).refresh_shortlists(),
+    }
+
+    for name, func in jobs.items():
+        scheduler.register(name, func, JOB_INTERVALS[name], SCHEDULER_JITTER_SECONDS)
@@ -1,14 +1,22 @@
 import os
 
-from google.cloud import secretmanager
-from google.api_core.exceptions import GoogleAPIError
-
 
 class Secrets:
     def __init__(self):
-        self.client = secretmanager.SecretManagerServiceClient()
+        self._client = None
+
+    @property
+    def client(self):
+        # Built on first use, most requests never read a secret
+        if self._client is None:
+            from google.cloud import secretmanager
+
+            self._client = secretmanager.SecretManagerServiceClient()
+        return self._client
 
     def get_secret(self, secret_name: str):
+        from google.api_core.exceptions import GoogleAPIError
+
         try:
             name = f"projects/{os.getenv('BQ_PROJECT_ID')}/secrets/{secret_name}/versions/latest"
             response = self.client.access_secret_version(request={"name": name})
@@ -1,39 +1,94 @@
-from api.repositories import WaitlistRepository, MatchRepository
+from api.repositories import WaitlistRepository, MatchRepository, JobStateRepository
+from api.repositories.waitlist_repo import PATIENT_LIST_COLUMNS
+from api.repositories.appointments_repo import APPOINTMENT_MATCHING_COLUMNS
 from api.models import WaitlistFilterParams, Patient, GradeOverride, AppointmentsFilterParams
 from api.services.hospitals_service import HospitalsService
 from api.services.appointments_service import AppointmentsService
 from api.services.secrets import Secrets
-from api.utils.time_utils import is_evening_hours
+from api.utils.time_utils import is_evening_hours, LOCAL_TIMEZONE
+from api.utils.stage_timer import StageTimer
+from api.utils.instrumentation import instrumented
+from api.utils.shortlist_cache import ShortlistCache
+from api.utils.ranking_cache import RankingCache
+from api.utils.background import run_in_background, debounce
+from api.config.cache import SHORTLIST_REFRESH_DELAY_SECONDS
+from api.config.ingestion import BULK_BATCH_SIZE, BULK_GRADING_CONCURRENCY
+from api.config.matching import CANDIDATE_BATCH_CONCURRENCY
+from api.utils.record_stream import batched
+from pydantic import ValidationError
+from typing import AsyncIterator
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
-import googlemaps
 import asyncio
 import os
 
+MARK_SEEN_JOB = "mark_seen"
+
+
+def _as_iso(value) -> str:
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
 
 class WaitlistService:
-    def __init__(self):
-        self.waitlist_repo = WaitlistRepository()
-        self.match_repo = MatchRepository()
-        self.hospitals_service = HospitalsService()
-        self.appointments_service = AppointmentsService()
-        self.secrets = Secrets()
+    def __init__(self, waitlist_repo: WaitlistRepository = None, match_repo: MatchRepository = None,
+                 job_state_repo: JobStateRepository = None, hospitals_service: HospitalsService = None,
+                 appointments_service: AppointmentsService = None, secrets: Secrets = None):
+        self.waitlist_repo = waitlist_repo or WaitlistRepository()
+        self.match_repo = match_repo or MatchRepository()
+        self.job_state_repo = job_state_repo or JobStateRepository()
+        self.hospitals_service = hospitals_service or HospitalsService()
+        self.appointments_service = appointments_service or AppointmentsService()
+        self.secrets = secrets or Secrets()
+        self.shortlists = ShortlistCache()
+        self.rankings = RankingCache()
 
     async def get_patients(self, params: WaitlistFilterParams):
-        return await self.waitlist_repo.query_patients(params)
+        return await self.waitlist_repo.query_patients(params, columns=PATIENT_LIST_COLUMNS)
+
+    async def get_patient(self, waitlist_id: str):
+        return await self.waitlist_repo.get_patient(waitlist_id)
 
     async def mark_seen(self):
-        return await self.waitlist_repo.mark_seen()
+        """
+        Mark patients seen for appointments that passed since the last successful run. The first run
+        (no watermark yet) processes the whole history.
+        """
+        current_time = datetime.now(tz=ZoneInfo(LOCAL_TIMEZONE)).replace(tzinfo=None)
+        watermark = await self.job_state_repo.get_watermark(MARK_SEEN_JOB)
+
+        result = await self.waitlist_repo.mark_seen(since=watermark, until=current_time)
+
+        # Only advance the watermark once the window is processed, a failed run is retried next time
+        if result["success"]:
+            await self.job_state_repo.set_watermark(MARK_SEEN_JOB, current_time)
+
+        return {**result, "since": watermark, "until": current_time}
+
+    async def backfill_mark_seen(self, start_time: datetime, end_time: datetime = None):
+        """
+        Mark patients seen for appointments between `start_time` and `end_time` (default now), e.g. to cover
+        a gap where the recurring job didn't run. Doesn't move the watermark.
+        """
+        if end_time is None:
+            end_time = datetime.now(tz=ZoneInfo(LOCAL_TIMEZONE)).replace(tzinfo=None)
+
+        result = await self.waitlist_repo.mark_seen(since=start_time, until=end_time)
+        return {**result, "since": start_time, "until": end_time}
 
     async def grade_patient(self, waitlist_id: str):
-        await self.waitlist_repo.grade_patient(waitlist_id)
+        updated_patient = await self.waitlist_repo.grade_patient(waitlist_id)
+
+        if updated_patient:
+            await self.on_waitlist_changed(updated_patient.get('department_id'))
 
-        updated_result = await self.waitlist_repo.query_patients(WaitlistFilterParams(waitlist_id=waitlist_id))
-        return updated_result['results'][0] if updated_result['results'] else None
+        return updated_patient
 
     async def grade_all_patients(self, max_concurrent: int = 5):
         waitlist_ids = await self.waitlist_repo.get_ungraded_waitlist_ids()
+        return await self.grade_patients(waitlist_ids, max_concurrent)
 
+    async def grade_patients(self, waitlist_ids: list[str], max_concurrent: int = 5):
+        """Grade the given patients, at most `max_concurrent` at a time"""
         results = {
             "total_processed": len(waitlist_ids),
             "successful": 0,
@@ -55,97 +110,210 @@ class WaitlistService:
 
         await asyncio.gather(*[grade_single_patient(wid) for wid in waitlist_ids], return_exceptions=True)
 
+        if results["successful"]:
+            await self.on_waitlist_changed()
+
         return results
 
     async def add_patient(self, patient: Patient):
-        return await self.waitlist_repo.add_patient(patient)
+        result = await self.waitlist_repo.add_patient(patient)
+        await self.on_waitlist_changed(patient.referral_department)
+        return result
+
+    async def add_patients(self, records: AsyncIterator[dict | ValueError], auto_grade: bool = False) -> AsyncIterator[dict]:
+        """
+        Add referrals in batches of BULK_BATCH_SIZE, yielding a result per record in order and then a summary.
+
+        Each batch looks up the history of its returning patients with one query and is written with one load job.
+        Repeat referrals within the upload carry over the history of the earlier ones. With `auto_grade` every added
+        patient is graded in the background, otherwise they are picked up by the next grade_all run.
+
+        :param records: Referrals with the fields of Patient (see read_records), or a ValueError for unparseable ones
+        """
+        summary = {"added": 0, "invalid": 0, "failed": 0, "grading_enqueued": 0}
+        # Latest referral per medical number, from the waitlist or earlier in this upload
+        latest = {}
+        row = 0
+
+        async for batch in batched(records, BULK_BATCH_SIZE):
+            results, valid = [], []
+            for record in batch:
+                row += 1
+                if isinstance(record, ValueError):
+                    results.append({"row": row, "status": "invalid", "errors": [str(record)]})
+                    continue
+                try:
+                    patient = Patient.model_validate({"auto_grade": auto_grade, **record})
+                except ValidationError as e:
+                    results.append({"row": row, "status": "invalid", "errors": [
+                        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+                    ]})
+                    continue
+                results.append({"row": row})
+                valid.append((results[-1], patient))
+
+            # A failed lookup or write fails only this batch, its rows are reported failed and later batches still run
+            previous_latest = dict(latest)
+            referrals = []
+            try:
+                latest.update(await self.waitlist_repo.get_latest_referrals(
+                    list({patient.medical_number for _, patient in valid} - latest.keys())))
+
+                for result, patient in valid:
+                    referral = self.waitlist_repo.build_referral(patient, latest.get(patient.medical_number))
+                    referrals.append(referral)
+                    result.update({"status": "added", "waitlist_id": referral["waitlist_id"]})
+
+                    last = latest.get(patient.medical_number)
+                    if last is None or _as_iso(patient.referral_date) >= _as_iso(last["referral_date"]):
+                        latest[patient.medical_number] = {**referral, "referral_date": patient.referral_date}
+
+                await self.waitlist_repo.insert_patients(referrals)
+            except Exception as e:
+                latest = previous_latest
+                for result, _ in valid:
+                    result.update({"status": "failed", "errors": [str(e)]})
+                    result.pop("waitlist_id", None)
+                referrals = []
+
+            for result in results:
+                summary[result["status"]] += 1
+                yield result
+
+            try:
+                for department_id in {referral["department_id"] for referral in referrals}:
+                    await self.on_waitlist_changed(department_id)
+            except Exception as e:
+                # The rows are already written, stale shortlists are still rebuilt by the next refresh_shortlists run
+                print(f"Failed to invalidate shortlists after bulk batch: {str(e)}")
+
+            if auto_grade and referrals:
+                run_in_background(self.grade_patients([referral["waitlist_id"] for referral in referrals],
+                                                      BULK_GRADING_CONCURRENCY), name="bulk-grading")
+                summary["grading_enqueued"] += len(referrals)
+
+        yield {"status": "complete", **summary}
 
     def _is_within_24_hours(self, appointment_time: datetime):
         """Check if appointment is within 24 hours from now"""
         time_difference = appointment_time - datetime.now()
         return timedelta(0) <= time_difference <= timedelta(hours=24)
 
-    async def _get_candidates_with_tiered_filtering(self, appointment_id, department_id, limit, prefers_evening=False):
+    async def _get_candidates_with_tiered_filtering(self, appointment_id, department_id, limit, prefers_evening=False, excluded_ids=None):
         """Get candidates using 3-tier filtering: 10 weeks, then 4 weeks, then no date filter"""
         current_time = datetime.now(tz=ZoneInfo("Etc/Greenwich")).replace(tzinfo=None)
+        excluded_ids = excluded_ids or set()
+
+        async def query_tier(max_referral_date=None):
+            # Over-fetch by the number of excluded patients so the limit still holds after filtering them out
+            candidates = await self.waitlist_repo.query_candidates(appointment_id, department_id, limit + len(excluded_ids),
+                                                                   prefers_evening, max_referral_date)
+            return [c for c in candidates if c['waitlist_id'] not in excluded_ids][:limit]
         
         # Try 10 weeks back first
         # There are more efficient ways to do this in query, but this logic is easier to understand/modify/remove
         ten_weeks_ago = current_time - timedelta(weeks=10)
-        candidates = await self.waitlist_repo.query_candidates(appointment_id, department_id, limit, prefers_evening, ten_weeks_ago)
+        candidates = await query_tier(ten_weeks_ago)
         
         if candidates and len(candidates) > 0:
             return candidates
         
         # Try 4 weeks back if no candidates found
         four_weeks_ago = current_time - timedelta(weeks=4)
-        candidates = await self.waitlist_repo.query_candidates(appointment_id, department_id, limit, prefers_evening, four_weeks_ago)
+        candidates = await query_tier(four_weeks_ago)
         
         if candidates and len(candidates) > 0:
             return candidates
         
         # Fall back to no date filter
-        return await self.waitlist_repo.query_candidates(appointment_id, department_id, limit, prefers_evening)
+        return await query_tier()
 
-    async def _get_candidates_with_proximity(self, appointment, limit=5, prefers_evening=False):
+    async def _get_candidates_with_proximity(self, appointment, limit=5, prefers_evening=False, excluded_ids=None, timer: StageTimer = None):
         """Get candidates with proximity information for appointments within 24 hours"""
-        hospital_postcode = await self.hospitals_service.get_hospital_postcode(appointment['hospital_id'])
-        candidates = await self._get_candidates_with_tiered_filtering(appointment['appointment_id'],
-                                                               appointment['department_id'], limit, prefers_evening)
+        timer = timer or StageTimer()
+
+        with timer.stage("candidate_fetch"):
+            hospital_postcode = await self.hospitals_service.get_hospital_postcode(appointment['hospital_id'])
+            candidates = await self._get_candidates_with_tiered_filtering(appointment['appointment_id'],
+                                                                   appointment['department_id'], limit, prefers_evening,
+                                                                   excluded_ids)
+
+        with timer.stage("proximity"):
+            await self._add_proximity(appointment, candidates, hospital_postcode[0]['postcode'] if hospital_postcode else None)
+        return candidates
 
-        # Add proximity information to each candidate
-        for candidate in candidates:
+    async def _add_proximity(self, appointment: dict, candidates: list[dict], hospital_postcode: str | None, distances: dict = None):
+        """
+        Add each candidate's distance to the hospital and sort them by it, closest first
+
+        :param dict distances: Routing calls already made, shared between slots of a batch so the same journey is only
+            looked up once
+        """
+        distances = {} if distances is None else distances
+
+        async def distance(candidate):
+            key = (hospital_postcode, candidate['postcode'], appointment['appointment_time'])
             try:
-                distance = await self.calculate_proximity(hospital_postcode[0]['postcode'],
-                                                          candidate['postcode'],
-                                                          appointment['appointment_time'])
-                candidate['proximity'] = distance
+                if hospital_postcode is None:
+                    raise ValueError(f"No postcode for hospital {appointment['hospital_id']}")
+                if key not in distances:
+                    distances[key] = asyncio.ensure_future(self.calculate_proximity(hospital_postcode, candidate['postcode'],
+                                                                                    appointment['appointment_time']))
+                candidate['proximity'] = await asyncio.shield(distances[key])
             except Exception as e:
                 print(f"Error calculating proximity for candidate {candidate.get('waitlist_id', 'unknown')}: {str(e)}")
                 candidate['proximity'] = float('inf') #HACK might want a more reliable way of handling this
 
+        await asyncio.gather(*(distance(candidate) for candidate in candidates))
+
         # Sort by proximity distance
         candidates.sort(key=lambda x: x.get('proximity', float('inf')))
         return candidates
 
-    async def find_best_patient(self, appointment: AppointmentsFilterParams, prefers_evening: bool = False):
+    async def find_best_patient(self, appointment: AppointmentsFilterParams, prefers_evening: bool = False, excluded_ids: set[str] = None, timer: StageTimer = None):
+        """
+        Return the waitlist_id of the best patient for the appointment, or None if there are no candidates
+
+        :param set[str] excluded_ids: Patients already reserved for other slots in the same run, never returned
+        :param StageTimer timer: Records candidate_fetch, proximity and ranking latency when provided
+        """
+        timer = timer or StageTimer()
+        excluded_ids = excluded_ids or set()
+
+        cached = await self.shortlists.get(appointment['appointment_id'], prefers_evening, self._is_within_24_hours(appointment['appointment_time']))
+        if cached:
+            available = [candidate for candidate in cached if candidate['waitlist_id'] not in excluded_ids]
+            if available:
+                return available[0]['waitlist_id']
+
         if self._is_within_24_hours(appointment['appointment_time']):
-            candidates = await self._get_candidates_with_proximity(appointment, 5, prefers_evening)
-            
-            if not candidates:
-                return None
-            elif len(candidates) == 1:
-                return candidates[0]['waitlist_id']
-            
-            candidates_by_preference = await self.waitlist_repo.analyse_preferences(appointment['appointment_id'],
-                                                                                    appointment['appointment_time'],
-                                                                                    appointment['properties'],
-                                                                                    candidates)
-            if candidates_by_preference:
-                return candidates_by_preference[0]['waitlist_id']
+            candidates = await self._get_candidates_with_proximity(appointment, 5, prefers_evening, excluded_ids, timer)
         else:
-            candidates = await self._get_candidates_with_tiered_filtering(appointment['appointment_id'],
-                                                                    appointment['department_id'], 5, prefers_evening)
+            with timer.stage("candidate_fetch"):
+                candidates = await self._get_candidates_with_tiered_filtering(appointment['appointment_id'],
+                                                                        appointment['department_id'], 5, prefers_evening,
+                                                                        excluded_ids)
             
-            if not candidates:
-                return None
-            elif len(candidates) == 1:
-                return candidates[0]['waitlist_id']
-
-            candidates_by_preference = await self.waitlist_repo.analyse_preferences(appointment['appointment_id'],
-                                                                                    appointment['appointment_time'],
-                                                                                    appointment['properties'],
-                                                                                    candidates)
-            if candidates_by_preference:
-                return candidates_by_preference[0]['waitlist_id']
+        if not candidates:
+            return None
+        elif len(candidates) == 1:
+            return candidates[0]['waitlist_id']
+
+        with timer.stage("ranking"):
+            candidates_by_preference = await self._rank_candidates(appointment, candidates)
+        if candidates_by_preference:
+            return candidates_by_preference[0]['waitlist_id']
 
     async def get_candidates(self, appointment_id: str, limit=5):
         # Check if appointment can be assigned before getting candidates
         if not await self.match_repo.can_manually_assign_appointment(appointment_id):
             return []
 
+        # Assign evening patients preferentially if between 8 PM and 6 AM
+        is_evening = is_evening_hours()
+
         appointment = await self.appointments_service.get_appointments(
-            AppointmentsFilterParams(appointment_id=appointment_id))
+            AppointmentsFilterParams(appointment_id=appointment_id), columns=APPOINTMENT_MATCHING_COLUMNS)
 
         if not appointment:
             return []
@@ -155,40 +323,200 @@ class WaitlistService:
         if not department_id:
             return []
 
-        # Assign evening patients preferentially if between 8 PM and 6 AM
+        cached = await self.shortlists.get(appointment_id, is_evening, self._is_within_24_hours(appointment_data['appointment_time']), limit)
+        if cached is not None:
+            return cached or None
+
+        return await self.build_shortlist(appointment_data, limit, prefers_evening=is_evening) or None
+
+    async def get_candidates_batch(self, appointment_ids: list[str], limit=5) -> AsyncIterator[dict]:
+        """
+        get_candidates for many slots, yielding `{appointment_id, candidates}` for each slot as soon as its shortlist
+        is ready, with `candidates` as get_candidates would return it (or `error` if the slot failed).
+
+        The slots share one assignability check and appointment fetch, one candidate query per tier for the whole
+        batch, one postcode lookup per hospital and routing calls for the same journey, and up to
+        CANDIDATE_BATCH_CONCURRENCY slots are ranked at once.
+        """
+        appointment_ids = list(dict.fromkeys(appointment_ids))
         is_evening = is_evening_hours()
 
-        # If within 24 hours, return candidates with proximity information, sorted by distance
-        if self._is_within_24_hours(appointment_data['appointment_time']):
-            candidates = await self._get_candidates_with_proximity(appointment_data, limit, prefers_evening=is_evening)
-            
-            if not candidates:
-                return None
-            elif len(candidates) == 1:
-                return candidates
+        appointments = {}
+        for appointment in await self.match_repo.query_appointments_for_assignment(appointment_ids, columns=APPOINTMENT_MATCHING_COLUMNS):
+            is_upcoming, is_manually_assignable = appointment.pop('is_upcoming'), appointment.pop('is_manually_assignable')
+            if is_upcoming and is_manually_assignable:
+                appointments[appointment['appointment_id']] = appointment
+
+        pending = []
+        for appointment_id in appointment_ids:
+            appointment = appointments.get(appointment_id)
+            if not appointment or not appointment.get('department_id'):
+                yield {"appointment_id": appointment_id, "candidates": []}
+                continue
+
+            cached = await self.shortlists.get(appointment_id, is_evening, self._is_within_24_hours(appointment['appointment_time']), limit)
+            if cached is not None:
+                yield {"appointment_id": appointment_id, "candidates": cached or None}
+                continue
+
+            pending.append(appointment)
+
+        if not pending:
+            return
+
+        # Take the versions before querying, so a waitlist change during the build leaves the results stale
+        versions = {appointment['department_id']: await self.shortlists.version(appointment['department_id']) for appointment in pending}
+        candidates_by_slot = await self._get_batch_candidates_with_tiered_filtering(pending, limit, prefers_evening=is_evening)
+
+        nearby = [appointment for appointment in pending
+                  if self._is_within_24_hours(appointment['appointment_time']) and candidates_by_slot.get(appointment['appointment_id'])]
+        hospital_ids = list({appointment['hospital_id'] for appointment in nearby})
+        postcodes = dict(zip(hospital_ids, await asyncio.gather(*(self.hospitals_service.get_hospital_postcode(hospital_id)
+                                                                   for hospital_id in hospital_ids))))
+
+        semaphore = asyncio.Semaphore(CANDIDATE_BATCH_CONCURRENCY)
+        distances = {}
+
+        async def build(appointment):
+            appointment_id = appointment['appointment_id']
+            with_proximity = self._is_within_24_hours(appointment['appointment_time'])
+            candidates = candidates_by_slot.get(appointment_id, [])
 
-            candidates_by_preference = await self.waitlist_repo.analyse_preferences(appointment_data['appointment_id'],
-                                                                                    appointment_data['appointment_time'],
-                                                                                    appointment_data['properties'],
-                                                                                    candidates)
+            try:
+                async with semaphore:
+                    if with_proximity and candidates:
+                        hospital_postcode = postcodes[appointment['hospital_id']]
+                        await self._add_proximity(appointment, candidates, hospital_postcode[0]['postcode'] if hospital_postcode else None,
+                                                  distances)
+                    if len(candidates) > 1:
+                        candidates = await self._rank_candidates(appointment, candidates)
+            except Exception as e:
+                return {"appointment_id": appointment_id, "error": str(e)}
+
+            await self.shortlists.put(appointment, candidates, limit, is_evening, with_proximity, versions[appointment['department_id']])
+            return {"appointment_id": appointment_id, "candidates": candidates or None}
+
+        for result in asyncio.as_completed([build(appointment) for appointment in pending]):
+            yield await result
+
+    async def _get_batch_candidates_with_tiered_filtering(self, appointments: list[dict], limit, prefers_evening=False) -> dict[str, list[dict]]:
+        """_get_candidates_with_tiered_filtering for many slots, each tier one query for every slot still without candidates"""
+        current_time = datetime.now(tz=ZoneInfo("Etc/Greenwich")).replace(tzinfo=None)
+        candidates_by_slot = {}
+
+        remaining = appointments
+        for max_referral_date in (current_time - timedelta(weeks=10), current_time - timedelta(weeks=4), None):
+            rows = await self.waitlist_repo.query_batch_candidates(
+                [(appointment['appointment_id'], appointment['department_id']) for appointment in remaining],
+                limit, prefers_evening, max_referral_date)
+
+            for row in rows:
+                row.pop('candidate_rank')
+                candidates_by_slot.setdefault(row.pop('appointment_id'), []).append(row)
+
+            remaining = [appointment for appointment in remaining if appointment['appointment_id'] not in candidates_by_slot]
+            if not remaining:
+                break
 
-            return candidates_by_preference
+        return candidates_by_slot
+
+    async def _find_ranked_candidates(self, appointment: dict, limit=5, prefers_evening=False):
+        """
+        Return the appointment's candidates ranked by preference. If within 24 hours, candidates carry
+        proximity information and are sorted by distance before ranking.
+        """
+        if self._is_within_24_hours(appointment['appointment_time']):
+            candidates = await self._get_candidates_with_proximity(appointment, limit, prefers_evening=prefers_evening)
         else:
-            candidates = await self._get_candidates_with_tiered_filtering(appointment_id, department_id, limit, prefers_evening=is_evening)
-            
-            if not candidates:
-                return None
-            elif len(candidates) == 1:
-                return candidates
-
-            candidates_by_preference = await self.waitlist_repo.analyse_preferences(appointment_data['appointment_id'],
-                                                                                    appointment_data[
-                                                                                        'appointment_time'],
-                                                                                    appointment_data['properties'],
-                                                                                    candidates)
-            return candidates_by_preference
+            candidates = await self._get_candidates_with_tiered_filtering(appointment['appointment_id'], appointment['department_id'],
+                                                                          limit, prefers_evening=prefers_evening)
+
+        if len(candidates) <= 1:
+            return candidates
 
+        return await self._rank_candidates(appointment, candidates)
+
+    async def _rank_candidates(self, appointment: dict, candidates: list[dict]):
+        """
+        Rank candidates by preference, reusing a cached agent ranking when the exact same payload was ranked before
+        """
+        key = self.rankings.key(self.waitlist_repo.build_preferences_payload(appointment['appointment_time'],
+                                                                             appointment['properties'],
+                                                                             candidates))
+        rankings = await self.rankings.get(key)
+
+        if rankings is None:
+            versions = await self.rankings.patient_versions([candidate['waitlist_id'] for candidate in candidates])
+            ranked = await self.waitlist_repo.analyse_preferences(appointment['appointment_id'],
+                                                                  appointment['appointment_time'],
+                                                                  appointment['properties'],
+                                                                  candidates)
+            if ranked:
+                await self.rankings.put(key, [{"waitlist_id": c["waitlist_id"], "rank": c["rank"], "reasoning": c["reasoning"]}
+                                        for c in ranked], versions)
+            return ranked
+
+        candidates_with_ranking = []
+        for ranking in rankings:
+            candidate_info = next((c for c in candidates if c["waitlist_id"] == ranking["waitlist_id"]), None)
+            if candidate_info:
+                candidates_with_ranking.append({**candidate_info, "rank": ranking["rank"], "reasoning": ranking["reasoning"]})
+
+        return sorted(candidates_with_ranking, key=lambda c: c["rank"])
+
+    async def build_shortlist(self, appointment: dict, limit=5, prefers_evening: bool = None):
+        """
+        Compute the appointment's ranked shortlist and cache it for get_candidates and automatic assignment
+        """
+        if prefers_evening is None:
+            prefers_evening = is_evening_hours()
+
+        # Take the version before querying, so a waitlist change during the build leaves the result stale
+        version = await self.shortlists.version(appointment['department_id'])
+        candidates = await self._find_ranked_candidates(appointment, limit, prefers_evening)
+
+        await self.shortlists.put(appointment, candidates, limit, prefers_evening,
+                            self._is_within_24_hours(appointment['appointment_time']), version)
+        return candidates
+
+    def schedule_shortlist(self, appointment: dict, limit=5):
+        """Build the appointment's shortlist in the background, shortly after it is created"""
+        run_in_background(self.build_shortlist(appointment, limit), name=f"shortlist:{appointment['appointment_id']}")
+
+    async def refresh_shortlists(self, department_id: str = None):
+        """Rebuild every stale shortlist, optionally only within one department"""
+        for pending in await self.shortlists.pending(department_id):
+            appointment = pending['appointment']
+            if appointment['appointment_time'] <= datetime.now():
+                await self.shortlists.discard(appointment['appointment_id'])
+                continue
+
+            await self.build_shortlist(appointment, pending['limit'])
+
+    async def on_waitlist_changed(self, department_id: str = None):
+        """
+        Invalidate the shortlists a waitlist change can affect and schedule their rebuild.
+        Pass the department when known, otherwise every shortlist is invalidated.
+        """
+        await self.shortlists.invalidate_department(department_id)
+        debounce(f"shortlist-refresh:{department_id or '*'}", SHORTLIST_REFRESH_DELAY_SECONDS,
+                 lambda: self.refresh_shortlists(department_id))
+
+    async def on_assignment_changed(self, appointment_id: str, waitlist_ids: list[str] = None):
+        """
+        An appointment was assigned or rejected: its shortlist is no longer needed, and the patients whose
+        assignment state changed must not be served from cached shortlists or rankings
+        """
+        for waitlist_id in filter(None, waitlist_ids or []):
+            await self.rankings.invalidate_patient(waitlist_id)
+
+        department_id = await self.shortlists.discard(appointment_id)
+        await self.on_waitlist_changed(department_id)
+
+    @instrumented("routing")
     async def calculate_proximity(self, hospital_postcode: str, patient_postcode: str, appointment_time: datetime):
+        import googlemaps
+
         api_key = self.secrets.get_secret('ROUTES_API')
         gmaps = googlemaps.Client(key=api_key)
 
@@ -217,19 +545,17 @@ class WaitlistService:
 
     async def override_grade(self, waitlist_id: str, grade_override: GradeOverride):
         # First get the current patient to check if they exist and values are different
-        result = self.waitlist_repo.query_patients(WaitlistFilterParams(waitlist_id=waitlist_id))
+        current_patient = await self.waitlist_repo.get_patient(waitlist_id)
 
-        if not result['results']:
+        if not current_patient or current_patient.get('is_seen') or current_patient.get('deleted_at') is not None:
             return None
 
-        current_patient = result['results'][0]
-
         # Don't update if the values are the same
         if (current_patient.get('clinical_urgency') == grade_override.clinical_urgency and
                 current_patient.get('condition_severity') == grade_override.condition_severity and
                 abs(current_patient.get('comorbidities', 0) - grade_override.comorbidities) < 0.001):
             return current_patient
 
-        self.waitlist_repo.override_grade(waitlist_id, grade_override)
-        updated_result = self.waitlist_repo.query_patients(WaitlistFilterParams(waitlist_id=waitlist_id))
-        return updated_result['results'][0] if updated_result['results'] else None
\ No newline at end of file
+        written = await self.waitlist_repo.override_grade(waitlist_id, grade_override)
+        await self.on_waitlist_changed(current_patient.get('department_id'))
+        return {**current_patient, **written}
\ No newline at end of file
@@ -1,2 +1,11 @@
 from .bigquery_client import BigQueryClient
-from .time_utils import is_evening_hours, LOCAL_TIMEZONE
\ No newline at end of file
+from .query_client import get_query_client
+from .time_utils import is_evening_hours, LOCAL_TIMEZONE
+from .stage_timer import StageTimer
+from .leases import LeaseManager, LeaseUnavailableError
+from .container import Container
+from .instrumentation import Metrics, instrument, instrumented
+from .query_budget import QueryBudget, QueryBudgetExceededError
+from .write_buffer import WriteBuffer
+from .search_index import SearchIndex, intersect_ids
+from .table_versions import TableVersions, conditional_get
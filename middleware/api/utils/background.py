@@ -0,0 +1,63 @@
+import asyncio
+from typing import Awaitable, Callable
+
+# Strong references to running tasks, the event loop only keeps weak ones
+_tasks: set[asyncio.Task] = set()
+_debounced: dict[str, asyncio.Task] = {}
+
+
+def run_in_background(coro: Awaitable, name: str = None) -> asyncio.Task:
+    """
+    Schedule a coroutine on the running event loop without awaiting it. Failures are logged, not raised.
+    """
+    task = asyncio.get_running_loop().create_task(_log_errors(coro, name), name=name)
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return task
+
+
+def debounce(key: str, delay_seconds: float, coro_factory: Callable[[], Awaitable]) -> asyncio.Task:
+    """
+    Run `coro_factory()` once after `delay_seconds`. Calls with the same key while one is already
+    waiting are folded into it, so a burst of changes triggers a single run.
+    """
+    pending = _debounced.get(key)
+    if pending and not pending.done():
+        return pending
+
+    async def _delayed():
+        try:
+            await asyncio.sleep(delay_seconds)
+        finally:
+            # Changes that arrive while the run is in progress schedule a new one
+            _debounced.pop(key, None)
+        await coro_factory()
+
+    task = run_in_background(_delayed(), name=key)
+    _debounced[key] = task
+    return task
+
+
+def cancel_debounced():
+    """Cancel the debounced runs still waiting out their delay, e.g. on shutdown, runs already started are left alone"""
+    for task in list(_debounced.values()):
+        task.cancel()
+    _debounced.clear()
+
+
+async def wait_for_background_tasks(timeout_seconds: float = None):
+    """Wait for every scheduled task to finish, e.g. on shutdown, or until `timeout_seconds` have passed"""
+    if not _tasks:
+        return
+
+    _, pending = await asyncio.wait(list(_tasks), timeout=timeout_seconds)
+    if pending:
+        print(f"{len(pending)} background tasks still running after {timeout_seconds}s: "
+              f"{', '.join(sorted(task.get_name() for task in pending))}")
+
+
+async def _log_errors(coro: Awaitable, name: str = None):
+    try:
+        return await coro
+    except Exception as e:
+        print(f"Background task {name or 'unnamed'} failed: {str(e)}")
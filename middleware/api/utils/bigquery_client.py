@@ -1,6 +1,25 @@
-from google.cloud import bigquery
+from api.config.query import QUERY_JOB_CREATION_MODE
+from api.utils.instrumentation import Metrics, instrumented
+from api.utils.query_budget import QueryBudget
+from api.utils.query_client import dml_table, is_dml, struct_array_fields
+from api.utils.table_versions import TableVersions
 import os
 import asyncio
+import time
+
+Metrics().histogram("mws_bigquery_read_duration_seconds",
+                    "Time to run a BigQuery read, by whether it ran without a job, created one or fell back to one")
+
+
+def _short_query_unsupported(error: Exception) -> bool:
+    """Whether a short query was refused because the project, location or API doesn't support job-optional queries"""
+    from google.api_core.exceptions import BadRequest, MethodNotImplemented
+
+    if isinstance(error, MethodNotImplemented):
+        return True
+    message = str(error).lower()
+    return isinstance(error, BadRequest) and any(hint in message for hint in ("jobcreationmode", "job_creation_mode", "job_creation_optional"))
+
 
 class BigQueryClient:
 
@@ -20,20 +39,166 @@ class BigQueryClient:
         if not project_id:
             raise EnvironmentError("BQ_PROJECT_ID not set in environment")
 
-        self.client = bigquery.Client(project=project_id)
+        self._project_id = project_id
+        self._client = None
+        # Reads go through the short query path (jobs.query), see QUERY_JOB_CREATION_MODE
+        self.job_creation_optional = QUERY_JOB_CREATION_MODE == "optional"
         self._initialized = True
 
-        if os.environ.get("ENV") == "development":
-            print(f"[BigQueryClient] Initialized with project_id: {project_id}")
+    @property
+    def client(self):
+        # The BigQuery SDK is slow to import and the client slow to build, so both wait for the first query
+        if self._client is None:
+            from google.cloud import bigquery
+
+            # Only applies to query_and_wait, client.query always creates a job
+            self._client = bigquery.Client(project=self._project_id, default_job_creation_mode="JOB_CREATION_OPTIONAL")
+
+            if os.environ.get("ENV") == "development":
+                print(f"[BigQueryClient] Initialized with project_id: {self._project_id}")
 
+        return self._client
+
+    @instrumented("query")
     async def run_query(self, query: str, named_params: dict[str, tuple[str, object]] = None, positional_params: list[tuple[str, object]] = None):
         """
             Runs a query against the instance of bigquery
 
             :param str query: SQL query (containing named `@name` params, or positional `?` params)
+            :param dict[str, tuple[str, object]] named_params: Dictionary of named params with type and value e.g. `{'name' : ('type', value)}`, or `('ARRAY<type>', [values])` for arrays (`('ARRAY<STRUCT<name type, ...>>', [dicts])` for arrays of structs)
+            :param list[tuple[str, object]] positional_params: List of positional parameters `[('type', value)]`
+        """
+        job_config = self._build_job_config(named_params, positional_params)
+        budget = QueryBudget.current()
+        if budget.needs_estimate:
+            budget.check_estimate(await self.estimate_bytes(query, named_params, positional_params))
+        
+        def _job_stats(query_job) -> tuple:
+            return query_job.total_bytes_processed, query_job.slot_millis, query_job.cache_hit
+
+        def _execute_query():
+            query_job = self.client.query(query, job_config=job_config)
+            result = query_job.result()
+            return [dict(row) for row in result], _job_stats(query_job)
+
+        def _execute_read():
+            start = time.perf_counter()
+            if not self.job_creation_optional:
+                rows, stats = _execute_query()
+                mode = "job"
+            else:
+                try:
+                    result = self.client.query_and_wait(query, job_config=job_config)
+                    rows = [dict(row) for row in result]
+                    if result.job_id:
+                        # BigQuery created a job after all, its statistics say whether the result cache answered it
+                        stats = _job_stats(self.client.get_job(result.job_id, project=result.project, location=result.location))
+                        mode = "job"
+                    else:
+                        # A jobless read only reports the bytes it processed, whether it hit the cache isn't exposed
+                        stats = (result.total_bytes_processed, None, None)
+                        mode = "jobless"
+                except Exception as e:
+                    # Errors of the query itself are raised as they are, running it again as a job would only fail twice
+                    if not _short_query_unsupported(e):
+                        raise
+                    print(f"[BigQueryClient] Short query mode unavailable, creating a job for every read: {str(e)}")
+                    self.job_creation_optional = False
+                    rows, stats = _execute_query()
+                    mode = "fallback"
+            Metrics().observe("mws_bigquery_read_duration_seconds", time.perf_counter() - start, mode=mode)
+            return rows, stats
+
+        # Statements that modify data (some repositories run them through run_query) always create a job, and are
+        # never answered from the result cache
+        dml = is_dml(query)
+        loop = asyncio.get_running_loop()
+        rows, (bytes_processed, slot_millis, cache_hit) = await loop.run_in_executor(None, _execute_query if dml else _execute_read)
+        budget.record(bytes_processed, slot_millis, None if dml else cache_hit)
+        if dml:
+            await TableVersions().bump(dml_table(query))
+        return rows
+
+    @instrumented("query")
+    async def run_dml(self, query: str, named_params: dict[str, tuple[str, object]] = None, positional_params: list[tuple[str, object]] = None) -> int:
+        """
+            Runs a DML statement (INSERT, UPDATE, DELETE, MERGE) and returns the number of rows it affected.
+            Used for compare-and-set updates, where 0 affected rows means the row changed since it was read.
+
+            :param str query: SQL DML statement (containing named `@name` params, or positional `?` params)
+            :param dict[str, tuple[str, object]] named_params: Dictionary of named params with type and value e.g. `{'name' : ('type', value)}`
+            :param list[tuple[str, object]] positional_params: List of positional parameters `[('type', value)]`
+        """
+        job_config = self._build_job_config(named_params, positional_params)
+        budget = QueryBudget.current()
+        if budget.needs_estimate:
+            budget.check_estimate(await self.estimate_bytes(query, named_params, positional_params))
+
+        def _execute_dml():
+            query_job = self.client.query(query, job_config=job_config)
+            query_job.result()
+            return query_job
+
+        loop = asyncio.get_running_loop()
+        query_job = await loop.run_in_executor(None, _execute_dml)
+        budget.record(query_job.total_bytes_processed, query_job.slot_millis)
+        await TableVersions().bump(dml_table(query))
+        return query_job.num_dml_affected_rows or 0
+
+    @instrumented("query")
+    async def load_rows(self, table: str, rows: list[dict]) -> int:
+        """
+            Appends rows to a table with a load job and returns the number of rows written. A single job however many
+            rows, so unlike INSERT statements it isn't limited by the DML quota and isn't billed on bytes scanned.
+
+            :param str table: Fully qualified table name, with or without backticks
+            :param list[dict] rows: Rows keyed by column name, with JSON-serialisable values (dates as ISO strings)
+        """
+        if not rows:
+            return 0
+
+        from google.cloud import bigquery
+
+        table_id = table.strip("`")
+
+        def _execute_load():
+            job_config = bigquery.LoadJobConfig(
+                source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+                write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+                # The table's own schema, autodetection would read JSON columns as records
+                schema=self.client.get_table(table_id).schema
+            )
+            load_job = self.client.load_table_from_json(rows, table_id, job_config=job_config)
+            load_job.result()
+            return load_job.output_rows or 0
+
+        loop = asyncio.get_running_loop()
+        loaded = await loop.run_in_executor(None, _execute_load)
+        await TableVersions().bump(table)
+        return loaded
+
+    @instrumented("query_dry_run")
+    async def estimate_bytes(self, query: str, named_params: dict[str, tuple[str, object]] = None, positional_params: list[tuple[str, object]] = None) -> int:
+        """
+            Dry-runs a query and returns the number of bytes it would process. Dry runs are free and don't run the query.
+
+            :param str query: SQL query or DML statement (containing named `@name` params, or positional `?` params)
             :param dict[str, tuple[str, object]] named_params: Dictionary of named params with type and value e.g. `{'name' : ('type', value)}`
             :param list[tuple[str, object]] positional_params: List of positional parameters `[('type', value)]`
         """
+        job_config = self._build_job_config(named_params, positional_params)
+        job_config.dry_run = True
+        job_config.use_query_cache = False
+
+        def _execute_dry_run():
+            return self.client.query(query, job_config=job_config).total_bytes_processed or 0
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, _execute_dry_run)
+
+    def _build_job_config(self, named_params: dict[str, tuple[str, object]] = None, positional_params: list[tuple[str, object]] = None):
+        from google.cloud import bigquery
+
         named_params = named_params or {}
         positional_params = positional_params or []
 
@@ -44,22 +209,32 @@ class BigQueryClient:
 
         if named_params:
             for name, (bq_data_type, value) in named_params.items():
-                query_params.append(bigquery.ScalarQueryParameter(name, bq_data_type, value))
+                query_params.append(self._query_parameter(name, bq_data_type, value))
 
         elif positional_params:
             for bq_data_type, value in positional_params:
-                query_params.append(bigquery.ScalarQueryParameter(None, bq_data_type, value))
+                query_params.append(self._query_parameter(None, bq_data_type, value))
 
         # Only pass query_parameters if we actually have parameters
         if query_params:
-            job_config = bigquery.QueryJobConfig(query_parameters=query_params)
-        else:
-            job_config = bigquery.QueryJobConfig()
-        
-        def _execute_query():
-            query_job = self.client.query(query, job_config=job_config)
-            result = query_job.result()
-            return [dict(row) for row in result]
-        
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, _execute_query)
\ No newline at end of file
+            return bigquery.QueryJobConfig(query_parameters=query_params)
+        return bigquery.QueryJobConfig()
+
+    @staticmethod
+    def _query_parameter(name: str | None, bq_data_type: str, value):
+        from google.cloud import bigquery
+
+        # Arrays of structs are typed e.g. `('ARRAY<STRUCT<id STRING, n INT64>>', [{'id': 'a', 'n': 1}])`, for
+        # `SELECT * FROM UNNEST(@name)`
+        fields = struct_array_fields(bq_data_type)
+        if fields is not None:
+            return bigquery.ArrayQueryParameter(name, "STRUCT", [
+                bigquery.StructQueryParameter(None, *[bigquery.ScalarQueryParameter(field, field_type, row[field])
+                                                      for field, field_type in fields])
+                for row in value
+            ])
+
+        # Arrays are typed e.g. `('ARRAY<STRING>', ['a', 'b'])`, for `IN UNNEST(@name)`
+        if bq_data_type.startswith("ARRAY<"):
+            return bigquery.ArrayQueryParameter(name, bq_data_type[len("ARRAY<"):-1], value)
+        return bigquery.ScalarQueryParameter(name, bq_data_type, value)
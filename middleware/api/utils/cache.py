@@ -0,0 +1,288 @@
+from api.config.cache import STATE_BACKEND, STATE_SQLITE_PATH, STATE_REDIS_URL
+import asyncio
+from datetime import date, datetime
+from decimal import Decimal
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def _encode(value) -> str:
+    """
+    Serialise a value for the shared backends as JSON, with datetimes, dates and decimals tagged so they come back
+    as the same type. Tuples come back as lists.
+    """
+    def default(value):
+        if isinstance(value, datetime):
+            return {"__datetime__": value.isoformat()}
+        if isinstance(value, date):
+            return {"__date__": value.isoformat()}
+        if isinstance(value, Decimal):
+            return {"__decimal__": str(value)}
+        raise TypeError(f"Cannot store {type(value).__name__} in the cache")
+
+    return json.dumps(value, default=default)
+
+
+def _decode(raw: str | bytes):
+    def object_hook(value: dict):
+        if len(value) == 1:
+            if "__datetime__" in value:
+                return datetime.fromisoformat(value["__datetime__"])
+            if "__date__" in value:
+                return date.fromisoformat(value["__date__"])
+            if "__decimal__" in value:
+                return Decimal(value["__decimal__"])
+        return value
+
+    try:
+        return json.loads(raw, object_hook=object_hook)
+    except ValueError:
+        # e.g. written by a version that pickled values, treated as missing
+        return None
+
+
+class MemoryCache:
+    """
+    Process-local key/value store with optional per-key expiry.
+
+    Values are stored as-is (no serialisation), so callers should treat returned values as read-only.
+    Only suitable when the middleware runs as a single worker process.
+    """
+
+    def __init__(self, namespace: str = None):
+        self._data: dict[str, tuple[object, float | None]] = {}
+
+    async def get(self, key: str, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+
+        return value
+
+    async def set(self, key: str, value, ttl_seconds: float | None = None):
+        expires_at = time.monotonic() + ttl_seconds if ttl_seconds else None
+        self._data[key] = (value, expires_at)
+
+    async def delete(self, key: str):
+        self._data.pop(key, None)
+
+    async def incr(self, key: str) -> int:
+        """Increment an integer counter (starting from 0) and return its new value"""
+        value = await self.get(key, 0) + 1
+        await self.set(key, value)
+        return value
+
+    async def acquire(self, key: str, owner: str, ttl_seconds: float) -> bool:
+        """Take (or renew) an expiring lease on `key` unless another owner holds it"""
+        holder = await self.get(key)
+        if holder is not None and holder != owner:
+            return False
+
+        await self.set(key, owner, ttl_seconds)
+        return True
+
+    async def release(self, key: str, owner: str):
+        """Release a lease, only if `owner` still holds it"""
+        if await self.get(key) == owner:
+            await self.delete(key)
+
+
+class SQLiteCache:
+    """
+    Key/value store in a local SQLite file, shared by every worker process on the same machine. Every call runs in
+    a worker thread so waiting on the file lock never blocks the event loop.
+    """
+
+    _connections: dict[tuple[str, int], sqlite3.Connection] = {}
+    _lock = threading.RLock()
+
+    def __init__(self, namespace: str, path: str = STATE_SQLITE_PATH):
+        self._namespace = namespace
+        self._path = path
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per process, connections must not be shared with forked workers
+        connection_key = (self._path, os.getpid())
+
+        with SQLiteCache._lock:
+            if connection_key not in SQLiteCache._connections:
+                connection = sqlite3.connect(self._path, isolation_level=None, check_same_thread=False, timeout=30)
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("""
+                    CREATE TABLE IF NOT EXISTS cache (
+                        namespace TEXT NOT NULL,
+                        key TEXT NOT NULL,
+                        value TEXT,
+                        expires_at REAL,
+                        PRIMARY KEY (namespace, key)
+                    )
+                """)
+                SQLiteCache._connections[connection_key] = connection
+            return SQLiteCache._connections[connection_key]
+
+    def _read(self, connection: sqlite3.Connection, key: str):
+        row = connection.execute(
+            "SELECT value FROM cache WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (self._namespace, key, time.time())
+        ).fetchone()
+        return _decode(row[0]) if row else None
+
+    def _write(self, connection: sqlite3.Connection, key: str, value, ttl_seconds: float | None):
+        connection.execute(
+            "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (self._namespace, key, _encode(value), time.time() + ttl_seconds if ttl_seconds else None)
+        )
+
+    def _transaction(self, func):
+        # BEGIN IMMEDIATE takes the write lock up front, making read-modify-write atomic across processes
+        with SQLiteCache._lock:
+            connection = self._connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(connection)
+                connection.execute("COMMIT")
+                return result
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+
+    def _get(self, key: str):
+        with SQLiteCache._lock:
+            return self._read(self._connection, key)
+
+    def _set(self, key: str, value, ttl_seconds: float | None):
+        with SQLiteCache._lock:
+            self._write(self._connection, key, value, ttl_seconds)
+
+    def _delete(self, connection: sqlite3.Connection, key: str):
+        connection.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self._namespace, key))
+
+    async def get(self, key: str, default=None):
+        value = await asyncio.to_thread(self._get, key)
+        return default if value is None else value
+
+    async def set(self, key: str, value, ttl_seconds: float | None = None):
+        await asyncio.to_thread(self._set, key, value, ttl_seconds)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._transaction, lambda connection: self._delete(connection, key))
+
+    async def incr(self, key: str) -> int:
+        def _incr(connection):
+            value = (self._read(connection, key) or 0) + 1
+            self._write(connection, key, value, None)
+            return value
+
+        return await asyncio.to_thread(self._transaction, _incr)
+
+    async def acquire(self, key: str, owner: str, ttl_seconds: float) -> bool:
+        def _acquire(connection):
+            holder = self._read(connection, key)
+            if holder is not None and holder != owner:
+                return False
+
+            self._write(connection, key, owner, ttl_seconds)
+            return True
+
+        return await asyncio.to_thread(self._transaction, _acquire)
+
+    async def release(self, key: str, owner: str):
+        def _release(connection):
+            if self._read(connection, key) == owner:
+                self._delete(connection, key)
+
+        await asyncio.to_thread(self._transaction, _release)
+
+
+class RedisCache:
+    """
+    Key/value store on any Redis-protocol server (Redis, Valkey, Memorystore, ...), shared by every
+    worker process and instance. Requires the optional `redis` package, whose asyncio client keeps calls
+    off the event loop.
+    """
+
+    _clients = {}
+
+    # Deletes the lease only if it is still held by the caller
+    _RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+
+    def __init__(self, namespace: str, url: str = STATE_REDIS_URL):
+        if url not in RedisCache._clients:
+            try:
+                import redis.asyncio
+            except ImportError:
+                raise EnvironmentError("STATE_BACKEND=redis requires the redis package (pip install redis)")
+
+            RedisCache._clients[url] = redis.asyncio.Redis.from_url(url)
+
+        self._client = RedisCache._clients[url]
+        self._namespace = namespace
+
+    def _key(self, key: str) -> str:
+        return f"mws:{self._namespace}:{key}"
+
+    async def get(self, key: str, default=None):
+        raw = await self._client.get(self._key(key))
+        if raw is None:
+            return default
+
+        # Counters and leases are stored as plain strings so INCR and the release script can work on them
+        if raw.isdigit():
+            return int(raw)
+        if raw.startswith(b"lease:"):
+            return raw[len(b"lease:"):].decode("utf-8")
+        value = _decode(raw)
+        return default if value is None else value
+
+    async def set(self, key: str, value, ttl_seconds: float | None = None):
+        await self._client.set(self._key(key), _encode(value), px=int(ttl_seconds * 1000) if ttl_seconds else None)
+
+    async def delete(self, key: str):
+        await self._client.delete(self._key(key))
+
+    async def incr(self, key: str) -> int:
+        return await self._client.incr(self._key(key))
+
+    async def acquire(self, key: str, owner: str, ttl_seconds: float) -> bool:
+        value = f"lease:{owner}"
+        if await self._client.set(self._key(key), value, nx=True, px=int(ttl_seconds * 1000)):
+            return True
+
+        # Renew if we already hold it
+        if await self._client.get(self._key(key)) == value.encode("utf-8"):
+            await self._client.pexpire(self._key(key), int(ttl_seconds * 1000))
+            return True
+
+        return False
+
+    async def release(self, key: str, owner: str):
+        await self._client.eval(self._RELEASE_SCRIPT, 1, self._key(key), f"lease:{owner}")
+
+
+_BACKENDS = {
+    "memory": MemoryCache,
+    "sqlite": SQLiteCache,
+    "redis": RedisCache,
+}
+
+_caches = {}
+
+def get_cache(namespace: str):
+    """
+    Return the shared cache for a namespace, e.g. `"shortlists"` or `"versions"`, on the backend chosen by
+    STATE_BACKEND. Use "sqlite" or "redis" when running more than one worker process or instance.
+    """
+    if namespace not in _caches:
+        if STATE_BACKEND not in _BACKENDS:
+            raise EnvironmentError(f"Unknown STATE_BACKEND {STATE_BACKEND}, expected one of {sorted(_BACKENDS)}")
+        _caches[namespace] = _BACKENDS[STATE_BACKEND](namespace)
+    return _caches[namespace]
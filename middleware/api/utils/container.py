@@ -0,0 +1,86 @@
+from contextlib import contextmanager
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class Container:
+    """
+    Application-scoped singletons (services, repositories, clients), registered once at startup and shared by
+    every request instead of being rebuilt per request.
+
+    Each type is registered with a provider that receives the container, so dependencies are resolved through it
+    too. Instances are built on first use, and `override` swaps any of them out, e.g. for a fake in a test.
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(Container, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._providers: dict[type, Callable[["Container"], object]] = {}
+        self._instances: dict[type, object] = {}
+        self._overrides: dict[type, object] = {}
+        self._dependencies: dict[type, Callable[[], object]] = {}
+        self._initialized = True
+
+    def register(self, cls: type[T], provider: Callable[["Container"], T]):
+        """
+        Register how to build the singleton for `cls`
+
+        :param type cls: Type the singleton is looked up by
+        :param provider: Called with the container the first time `cls` is resolved
+        """
+        self._providers[cls] = provider
+        self._instances.pop(cls, None)
+
+    def resolve(self, cls: type[T]) -> T:
+        if cls in self._overrides:
+            return self._overrides[cls]
+
+        if cls not in self._instances:
+            if cls not in self._providers:
+                raise LookupError(f"{cls.__name__} is not registered with the container")
+            self._instances[cls] = self._providers[cls](self)
+
+        return self._instances[cls]
+
+    def dependency(self, cls: type[T]) -> Callable[[], T]:
+        """
+        Return a FastAPI dependency resolving `cls`, e.g. `service: WaitlistService = Depends(container.dependency(WaitlistService))`.
+        The same function is returned for the same type, so it can also be used as a key in `app.dependency_overrides`.
+        """
+        if cls not in self._dependencies:
+            def _resolve() -> T:
+                return self.resolve(cls)
+
+            _resolve.__name__ = f"get_{cls.__name__}"
+            self._dependencies[cls] = _resolve
+
+        return self._dependencies[cls]
+
+    @contextmanager
+    def override(self, cls: type[T], instance: T):
+        """Serve `instance` for `cls` (and anything resolving it afterwards) for the duration of the block"""
+        previous = self._overrides.get(cls)
+        self._overrides[cls] = instance
+
+        try:
+            yield instance
+        finally:
+            if previous is None:
+                self._overrides.pop(cls, None)
+            else:
+                self._overrides[cls] = previous
+
+    def reset(self):
+        """Drop every built singleton and override, the next resolve builds fresh instances"""
+        self._instances.clear()
+        self._overrides.clear()
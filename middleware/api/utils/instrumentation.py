@@ -0,0 +1,239 @@
+from api.utils.stage_timer import StageTimer
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache, wraps
+from starlette.datastructures import MutableHeaders
+import bisect
+import threading
+import time
+
+# Upper bounds of the latency and calls-per-request histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+CALL_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# External calls that are instrumented: queries (BigQuery jobs, or the local backend) and their dry runs, agent
+# sessions and routing
+DEPENDENCIES = ("query", "query_dry_run", "grading_agent", "preferences_agent", "routing")
+
+# Timings of the external calls made while handling the current request, None outside of requests
+_request_timer: ContextVar[StageTimer | None] = ContextVar("request_timer", default=None)
+_request_scope: ContextVar[dict | None] = ContextVar("request_scope", default=None)
+
+
+@lru_cache(maxsize=1)
+def _tracer():
+    """OpenTelemetry tracer when the opentelemetry-api package is installed, spans are skipped otherwise"""
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        return None
+    return trace.get_tracer("mws")
+
+
+@contextmanager
+def _span(name: str, attributes: dict = None):
+    tracer = _tracer()
+    if tracer is None:
+        yield None
+        return
+
+    with tracer.start_as_current_span(name, attributes=attributes) as span:
+        yield span
+
+
+class Metrics:
+    """
+    Process-wide Prometheus-style histograms and counters, rendered in the text exposition format by `/metrics`.
+
+    Every worker process keeps its own, so scrape each worker (or sum across them) when running more than one.
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(Metrics, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._lock = threading.Lock()
+        self._help = {}
+        self._buckets = {}
+        # {name: {labels: [bucket counts..., sum, count]}}
+        self._series = {}
+        # {name: {labels: total}}
+        self._counters = {}
+        self._initialized = True
+
+    def histogram(self, name: str, description: str, buckets: tuple = DURATION_BUCKETS):
+        self._help[name] = description
+        self._buckets[name] = buckets
+        self._series.setdefault(name, {})
+
+    def counter(self, name: str, description: str):
+        self._help[name] = description
+        self._counters.setdefault(name, {})
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+
+        with self._lock:
+            self._counters[name][key] = self._counters[name].get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        buckets = self._buckets[name]
+        key = tuple(sorted(labels.items()))
+
+        with self._lock:
+            series = self._series[name].setdefault(key, [0] * (len(buckets) + 2))
+            series[bisect.bisect_left(buckets, value)] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> str:
+        lines = []
+
+        with self._lock:
+            for name, series in self._series.items():
+                lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+
+                for key, values in series.items():
+                    labels = ",".join(f'{label}="{value}"' for label, value in key)
+                    separator = "," if labels else ""
+                    cumulative = 0
+                    for bound, count in zip(self._buckets[name], values):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{labels}{separator}le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_bucket{{{labels}{separator}le="+Inf"}} {values[-1]}')
+                    lines.append(f"{name}_sum{{{labels}}} {values[-2]}")
+                    lines.append(f"{name}_count{{{labels}}} {values[-1]}")
+
+            for name, series in self._counters.items():
+                lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+
+                for key, value in series.items():
+                    labels = ",".join(f'{label}="{value}"' for label, value in key)
+                    lines.append(f"{name}{{{labels}}} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+Metrics().histogram("mws_http_request_duration_seconds", "Time to respond to a request, by route")
+Metrics().histogram("mws_dependency_duration_seconds", "Time spent in queries and calls to the agents and the routing API")
+Metrics().histogram("mws_request_dependency_calls", "Calls made to each dependency while handling one request",
+                    buckets=CALL_BUCKETS)
+
+
+@contextmanager
+def instrument(dependency: str):
+    """
+    Time a call to an external dependency. The call is counted against the current request (see
+    InstrumentationMiddleware), observed in `mws_dependency_duration_seconds` and traced as a span.
+    """
+    outcome = "error"
+    start = time.perf_counter()
+    try:
+        with _span(dependency):
+            yield
+        outcome = "ok"
+    finally:
+        elapsed = time.perf_counter() - start
+        Metrics().observe("mws_dependency_duration_seconds", elapsed, dependency=dependency, outcome=outcome)
+
+        timer = _request_timer.get()
+        if timer is not None:
+            timer.record(dependency, elapsed)
+
+
+def instrumented(dependency: str):
+    """Decorator form of `instrument` for coroutine functions"""
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            with instrument(dependency):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_request_stats() -> dict[str, dict[str, float]]:
+    """Dependency calls made so far by the current request, as `{dependency: {count, total_ms, avg_ms, max_ms}}`"""
+    timer = _request_timer.get()
+    return timer.summary() if timer is not None else {}
+
+
+def current_route() -> str | None:
+    """Route template (e.g. `/waitlist/`) of the request being handled, None outside of requests or before routing"""
+    scope = _request_scope.get()
+    if scope is None or "route" not in scope:
+        return None
+    return scope["route"].path
+
+
+def _server_timing(summary: dict[str, dict[str, float]], elapsed: float) -> str:
+    entries = [f'{dependency};dur={stats["total_ms"]};desc="{stats["count"]} calls"' for dependency, stats in summary.items()]
+    entries.append(f"total;dur={round(elapsed * 1000, 2)}")
+    return ", ".join(entries)
+
+
+class InstrumentationMiddleware:
+    """
+    Counts and times the BigQuery, agent and routing calls made while handling each request. They are returned in a
+    `Server-Timing` header (shown in the browser's network panel) and observed per route in `/metrics`.
+
+    Only calls made before the response starts are included in the header, e.g. not those of a streamed body.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timer = StageTimer()
+        token = _request_timer.set(timer)
+        scope_token = _request_scope.set(scope)
+        start = time.perf_counter()
+        status_code = 500
+
+        with _span(f"{scope['method']} {scope['path']}", {"http.request.method": scope["method"]}) as span:
+            async def send_with_timing(message):
+                nonlocal status_code
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", _server_timing(timer.summary(), time.perf_counter() - start))
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                _request_timer.reset(token)
+                _request_scope.reset(scope_token)
+                elapsed = time.perf_counter() - start
+
+                # The route template rather than the path, so ids don't explode the number of series
+                route = scope["route"].path if "route" in scope else "unmatched"
+                summary = timer.summary()
+
+                Metrics().observe("mws_http_request_duration_seconds", elapsed,
+                                  method=scope["method"], route=route, status=str(status_code))
+                for dependency in DEPENDENCIES:
+                    Metrics().observe("mws_request_dependency_calls", summary.get(dependency, {}).get("count", 0),
+                                      route=route, dependency=dependency)
+
+                if span is not None:
+                    span.update_name(f"{scope['method']} {route}")
+                    span.set_attribute("http.route", route)
+                    span.set_attribute("http.response.status_code", status_code)
+                    for dependency, stats in summary.items():
+                        span.set_attribute(f"mws.{dependency}.calls", stats["count"])
+                        span.set_attribute(f"mws.{dependency}.duration_ms", stats["total_ms"])
@@ -0,0 +1,66 @@
+from contextlib import asynccontextmanager
+from api.utils.cache import get_cache
+import uuid
+
+
+class LeaseUnavailableError(Exception):
+    """Raised when a lease is already held by another owner"""
+
+    def __init__(self, key: str):
+        super().__init__(f"{key} is being updated by another request, please try again")
+        self.key = key
+
+
+class LeaseManager:
+    """
+    Short-lived, non-blocking leases on rows that are about to be written, e.g. `appointment:<id>` or `waitlist:<id>`.
+
+    Leases let concurrent matchers work on different rows in parallel while failing fast when two of them touch
+    the same row. They live in the shared state backend (see STATE_BACKEND), so they also hold across worker
+    processes. They are a first line of defence only; repositories still use compare-and-set updates so a
+    lease that expires mid-write can never double-book a patient.
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(LeaseManager, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._leases = get_cache("leases")
+        self._initialized = True
+
+    async def try_acquire(self, key: str, owner: str, ttl_seconds: float) -> bool:
+        return await self._leases.acquire(key, owner, ttl_seconds)
+
+    async def release(self, key: str, owner: str):
+        await self._leases.release(key, owner)
+
+    @asynccontextmanager
+    async def hold(self, keys: list[str], ttl_seconds: float = 60):
+        """
+        Hold leases on all `keys` for the duration of the block, raising LeaseUnavailableError if any is taken
+
+        :param list[str] keys: Lease keys, e.g. `["appointment:<id>", "waitlist:<id>"]`
+        :param float ttl_seconds: Time after which the lease is considered abandoned
+        """
+        owner = uuid.uuid4().hex
+        acquired = []
+
+        try:
+            # Acquire in a stable order so two holders can't each take half of the same set
+            for key in sorted(set(keys)):
+                if not await self.try_acquire(key, owner, ttl_seconds):
+                    raise LeaseUnavailableError(key)
+                acquired.append(key)
+
+            yield owner
+        finally:
+            for key in acquired:
+                await self.release(key, owner)
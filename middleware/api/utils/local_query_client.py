@@ -0,0 +1,268 @@
+from api.config.query import LOCAL_DATABASE_PATH, LOCAL_SCHEMA_PATH, LOCAL_DATA_DIR
+from api.utils.instrumentation import instrumented
+from api.utils.query_client import dml_table, is_dml, struct_array_fields
+from api.utils.table_versions import TableVersions
+from datetime import date, datetime
+from functools import lru_cache
+import asyncio
+import json
+import os
+import re
+
+# BigQuery column types and their DuckDB equivalents
+_COLUMN_TYPES = {
+    "STRING": "VARCHAR",
+    "INT64": "BIGINT",
+    "FLOAT64": "DOUBLE",
+    "BOOL": "BOOLEAN",
+    "DATE": "DATE",
+    "DATETIME": "TIMESTAMP",
+    "TIMESTAMP": "TIMESTAMP",
+    "JSON": "JSON",
+}
+
+_DATA_FORMATS = {
+    ".parquet": "read_parquet",
+    ".csv": "read_csv_auto",
+    ".json": "read_json_auto",
+    ".ndjson": "read_json_auto",
+}
+
+
+def local_table_name(name: str) -> str:
+    """Local name of a bq-schema.txt table, following the same <NAME>_TABLE env vars as the BigQuery dataset"""
+    return os.environ.get(f"{name.upper()}_TABLE", name)
+
+
+def parse_schema(schema: str) -> dict[str, list[str]]:
+    """
+    Turn the CREATE TABLE statements in bq-schema.txt into DuckDB column definitions per table.
+    Descriptions and (unenforced) key constraints are dropped, NOT NULL and DEFAULT are kept.
+    """
+    tables = {}
+
+    for fqtn, body in re.findall(r"CREATE TABLE `([^`]+)`\s*\((.*?)\n\)", schema, re.DOTALL):
+        columns = []
+        for line in body.splitlines():
+            match = re.match(r"\s*(\w+)\s+(\w+)(.*)$", line)
+            if not match or match.group(1) in ("PRIMARY", "CONSTRAINT"):
+                continue
+
+            name, bq_type, rest = match.groups()
+            rest = re.sub(r"\s*OPTIONS\(.*\)", "", rest).rstrip(", ")
+            columns.append(f"{name} {_COLUMN_TYPES[bq_type]}{rest}")
+
+        tables[local_table_name(fqtn.split(".")[-1])] = columns
+
+    return tables
+
+
+@lru_cache(maxsize=1024)
+def translate_query(query: str) -> str:
+    """
+    Translate a BigQuery query to DuckDB's dialect: `project.dataset.table` becomes "table", @param becomes $param,
+    double-quoted strings become single-quoted, MERGE becomes MERGE INTO, `IN UNNEST(@array)` becomes a subquery and
+    `SELECT * FROM UNNEST(@structs)` a recursive unnest, which also expands the struct fields into columns.
+    String literals are left untouched.
+    """
+    translated = []
+    i = 0
+
+    while i < len(query):
+        quote = query[i]
+        if quote in "'\"`":
+            end = i + 1
+            while end < len(query) and query[end] != quote:
+                end += 2 if query[end] == "\\" else 1
+            body = query[i + 1:end]
+
+            if quote == "`":
+                translated.append(f'"{body.split(".")[-1]}"')
+            elif quote == '"':
+                translated.append("'" + body.replace("'", "''") + "'")
+            else:
+                translated.append(query[i:end + 1])
+            i = end + 1
+            continue
+
+        # Plain SQL up to the next quote
+        end = i
+        while end < len(query) and query[end] not in "'\"`":
+            end += 1
+        chunk = re.sub(r"@(\w+)", r"$\1", query[i:end])
+        chunk = re.sub(r"\bSELECT\s+\*\s+FROM\s+UNNEST\s*\(\s*(\$\w+)\s*\)", r"SELECT UNNEST(\1, recursive := true)", chunk,
+                       flags=re.IGNORECASE)
+        chunk = re.sub(r"\bIN\s+UNNEST\s*\(\s*(\$\w+)\s*\)", r"IN (SELECT UNNEST(\1))", chunk, flags=re.IGNORECASE)
+        chunk = re.sub(r"\bMERGE\s+(?!INTO\b)", "MERGE INTO ", chunk, flags=re.IGNORECASE)
+        translated.append(chunk)
+        i = end
+
+    return "".join(translated)
+
+
+def _to_duckdb_value(bq_data_type: str, value):
+    """Convert a BigQuery query parameter value to what DuckDB expects for the same type"""
+    if value is None:
+        return None
+    fields = struct_array_fields(bq_data_type)
+    if fields is not None:
+        return [{field: _to_duckdb_value(field_type, row[field]) for field, field_type in fields} for row in value]
+    if bq_data_type in ("DATETIME", "TIMESTAMP") and isinstance(value, str):
+        return datetime.fromisoformat(value)
+    if bq_data_type == "DATE" and isinstance(value, str):
+        return date.fromisoformat(value)
+    if bq_data_type == "JSON" and not isinstance(value, str):
+        return json.dumps(value, default=str)
+    return value
+
+
+class LocalQueryClient:
+    """
+    Stand-in for BigQueryClient on an embedded DuckDB database, so the middleware can run (and be load tested)
+    on a laptop without network access. Select it with QUERY_BACKEND=duckdb.
+
+    Tables are created from bq-schema.txt and filled from LOCAL_DATA_DIR when given. Repositories keep writing
+    BigQuery SQL with named `@name` params; queries are translated before running (see translate_query).
+    Requires the optional `duckdb` package.
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(LocalQueryClient, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        try:
+            import duckdb
+        except ImportError:
+            raise EnvironmentError("QUERY_BACKEND=duckdb requires the duckdb package (pip install duckdb)")
+
+        self.connection = duckdb.connect(LOCAL_DATABASE_PATH)
+        self.create_tables()
+        if LOCAL_DATA_DIR:
+            self.load_directory(LOCAL_DATA_DIR)
+
+        self._initialized = True
+
+        if os.environ.get("ENV") == "development":
+            print(f"[LocalQueryClient] Initialized with database: {LOCAL_DATABASE_PATH}")
+
+    def create_tables(self, schema_path: str = LOCAL_SCHEMA_PATH):
+        with open(schema_path) as schema_file:
+            tables = parse_schema(schema_file.read())
+
+        for table, columns in tables.items():
+            self.connection.execute(f'CREATE TABLE IF NOT EXISTS "{table}" ({", ".join(columns)})')
+
+    def load_directory(self, path: str) -> dict[str, int]:
+        """
+        Load `<table>.parquet`, `<table>.csv` or `<table>.json` files from a directory into tables that are still
+        empty, matching columns by name. Returns the number of rows loaded per table.
+        """
+        loaded = {}
+
+        for file_name in sorted(os.listdir(path)):
+            table, extension = os.path.splitext(file_name)
+            if extension not in _DATA_FORMATS:
+                continue
+
+            table = local_table_name(table)
+            if self.connection.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]:
+                continue
+
+            reader = _DATA_FORMATS[extension]
+            self.connection.execute(f'INSERT INTO "{table}" BY NAME SELECT * FROM {reader}(?)',
+                                    [os.path.join(path, file_name)])
+            loaded[table] = self.connection.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+
+        return loaded
+
+    @instrumented("query")
+    async def run_query(self, query: str, named_params: dict[str, tuple[str, object]] = None, positional_params: list[tuple[str, object]] = None):
+        """
+            Runs a BigQuery query against the local database, see BigQueryClient.run_query
+        """
+        def _execute_query():
+            result = self._execute(query, named_params, positional_params)
+            # BigQuery returns no rows for DML, DuckDB returns the affected row count
+            if result.description is None or is_dml(query):
+                return []
+
+            columns = [column[0] for column in result.description]
+            json_columns = {column[0] for column in result.description if str(column[1]) == "JSON"}
+
+            rows = []
+            for values in result.fetchall():
+                row = dict(zip(columns, values))
+                for column in json_columns:
+                    if row[column] is not None:
+                        row[column] = json.loads(row[column])
+                rows.append(row)
+            return rows
+
+        loop = asyncio.get_running_loop()
+        rows = await loop.run_in_executor(None, _execute_query)
+        if is_dml(query):
+            await TableVersions().bump(dml_table(query))
+        return rows
+
+    @instrumented("query")
+    async def run_dml(self, query: str, named_params: dict[str, tuple[str, object]] = None, positional_params: list[tuple[str, object]] = None) -> int:
+        """
+            Runs a DML statement against the local database and returns the number of rows it affected, see BigQueryClient.run_dml
+        """
+        def _execute_dml():
+            row = self._execute(query, named_params, positional_params).fetchone()
+            return row[0] if row else 0
+
+        loop = asyncio.get_running_loop()
+        affected = await loop.run_in_executor(None, _execute_dml)
+        await TableVersions().bump(dml_table(query))
+        return affected
+
+    @instrumented("query")
+    async def load_rows(self, table: str, rows: list[dict]) -> int:
+        """
+            Appends rows to a local table, see BigQueryClient.load_rows
+        """
+        def _execute_load():
+            if not rows:
+                return 0
+
+            columns = list(rows[0])
+            values = [[json.dumps(row[column], default=str) if isinstance(row[column], (dict, list)) else row[column]
+                       for column in columns] for row in rows]
+
+            cursor = self.connection.cursor()
+            cursor.executemany(f'INSERT INTO {translate_query(table)} ({", ".join(columns)}) '
+                               f'VALUES ({", ".join("?" for _ in columns)})', values)
+            return len(rows)
+
+        loop = asyncio.get_running_loop()
+        loaded = await loop.run_in_executor(None, _execute_load)
+        await TableVersions().bump(table)
+        return loaded
+
+    def _execute(self, query: str, named_params: dict[str, tuple[str, object]] = None, positional_params: list[tuple[str, object]] = None):
+        if named_params and positional_params:
+            raise ValueError("Cannot use both named and positional parameters in the same query")
+
+        translated = translate_query(query)
+
+        if named_params:
+            # BigQuery ignores unused parameters, DuckDB rejects them
+            used = set(re.findall(r"\$(\w+)", translated))
+            parameters = {name: _to_duckdb_value(bq_data_type, value)
+                          for name, (bq_data_type, value) in named_params.items() if name in used}
+        else:
+            parameters = [_to_duckdb_value(bq_data_type, value) for bq_data_type, value in positional_params or []]
+
+        # A cursor per call, DuckDB connections must not be used from several threads at once
+        cursor = self.connection.cursor()
+        return cursor.execute(translated, parameters or None)
@@ -0,0 +1,65 @@
+from api.config.query import QUERY_BYTES_BUDGETS, QUERY_BYTES_BUDGET, QUERY_BUDGET_ACTION, QUERY_DRY_RUN
+from api.utils.instrumentation import Metrics, current_route
+
+# Upper bounds of the bytes-processed histogram buckets, 1 MB to 1 TB
+BYTES_BUCKETS = tuple(10 ** exponent for exponent in range(6, 13))
+
+Metrics().histogram("mws_query_bytes_processed", "Bytes processed (and billed on) by each BigQuery query, by route",
+                    buckets=BYTES_BUCKETS)
+Metrics().histogram("mws_query_bytes_estimated", "Bytes each BigQuery query was estimated to process by a dry run, by route",
+                    buckets=BYTES_BUCKETS)
+Metrics().histogram("mws_query_slot_seconds", "Slot time consumed by each BigQuery query, by route")
+Metrics().counter("mws_query_cache_total", "BigQuery reads by route and whether they were answered from the result cache")
+
+
+class QueryBudgetExceededError(Exception):
+    def __init__(self, route: str, estimated_bytes: int, budget: int):
+        self.route = route
+        self.estimated_bytes = estimated_bytes
+        self.budget = budget
+        super().__init__(f"Query would scan {estimated_bytes:,} bytes, over the {budget:,} byte budget for {route}; "
+                         f"narrow the filters and try again")
+
+
+class QueryBudget:
+    """
+    Bytes-scanned budget for the queries of one request (or job), see QUERY_BYTES_BUDGETS.
+    BigQueryClient checks each query against it before running it and records what it actually processed.
+    """
+
+    def __init__(self, route: str | None):
+        self.route = route or "background"
+        self.limit = QUERY_BYTES_BUDGETS.get(route, QUERY_BYTES_BUDGET) if route else QUERY_BYTES_BUDGET
+
+    @classmethod
+    def current(cls) -> "QueryBudget":
+        return cls(current_route())
+
+    @property
+    def needs_estimate(self) -> bool:
+        """Whether queries should be dry-run before running"""
+        return bool(self.limit) and (QUERY_BUDGET_ACTION == "reject" or QUERY_DRY_RUN)
+
+    def check_estimate(self, estimated_bytes: int):
+        """Raise QueryBudgetExceededError (reject) or log (warn) when a dry run estimate is over budget"""
+        Metrics().observe("mws_query_bytes_estimated", estimated_bytes, route=self.route)
+
+        if estimated_bytes > self.limit:
+            if QUERY_BUDGET_ACTION == "reject":
+                raise QueryBudgetExceededError(self.route, estimated_bytes, self.limit)
+            print(f"[QueryBudget] {self.route} query estimated at {estimated_bytes:,} bytes, over its {self.limit:,} byte budget")
+
+    def record(self, bytes_processed: int | None, slot_millis: int | None, cache_hit: bool | None = None):
+        """
+        Record what a query actually processed, logging it when over budget, and for reads whether BigQuery's result
+        cache answered it (the cache-hit ratio is `mws_query_cache_total{cache_hit="true"}` over the reads that report
+        it, jobless short queries don't)
+        """
+        if bytes_processed is not None:
+            Metrics().observe("mws_query_bytes_processed", bytes_processed, route=self.route)
+            if self.limit and bytes_processed > self.limit:
+                print(f"[QueryBudget] {self.route} query processed {bytes_processed:,} bytes, over its {self.limit:,} byte budget")
+        if slot_millis is not None:
+            Metrics().observe("mws_query_slot_seconds", slot_millis / 1000, route=self.route)
+        if cache_hit is not None:
+            Metrics().inc("mws_query_cache_total", route=self.route, cache_hit=str(cache_hit).lower())
@@ -0,0 +1,43 @@
+from api.config.query import QUERY_BACKEND
+import re
+
+_DML_STATEMENT = re.compile(r"\s*(INSERT|UPDATE|DELETE|MERGE)\b", re.IGNORECASE)
+_DML_TABLE = re.compile(r"\s*(?:INSERT(?:\s+INTO)?|UPDATE|DELETE(?:\s+FROM)?|MERGE(?:\s+INTO)?)\s+(`[^`]+`|[\w.-]+)", re.IGNORECASE)
+
+
+def get_query_client():
+    """
+    Return the client repositories run their queries through, chosen by QUERY_BACKEND: BigQueryClient, or
+    LocalQueryClient for an embedded DuckDB stand-in. Both take BigQuery SQL with the same named parameters.
+    """
+    if QUERY_BACKEND == "bigquery":
+        from api.utils.bigquery_client import BigQueryClient
+        return BigQueryClient()
+
+    if QUERY_BACKEND == "duckdb":
+        from api.utils.local_query_client import LocalQueryClient
+        return LocalQueryClient()
+
+    raise EnvironmentError(f"Unknown QUERY_BACKEND {QUERY_BACKEND}, expected one of ['bigquery', 'duckdb']")
+
+
+def struct_array_fields(bq_data_type: str) -> list[tuple[str, str]] | None:
+    """
+    Fields of an array of structs parameter type, e.g. `ARRAY<STRUCT<waitlist_id STRING, graded_at DATETIME>>` gives
+    `[('waitlist_id', 'STRING'), ('graded_at', 'DATETIME')]`. None for any other type.
+    """
+    match = re.fullmatch(r"ARRAY<STRUCT<(.*)>>", bq_data_type.strip())
+    if not match:
+        return None
+    return [tuple(field.split()) for field in match.group(1).split(",")]
+
+
+def is_dml(query: str) -> bool:
+    """Whether a statement modifies data (INSERT, UPDATE, DELETE or MERGE) rather than only reading it"""
+    return _DML_STATEMENT.match(query) is not None
+
+
+def dml_table(query: str) -> str | None:
+    """Table a DML statement writes to, as written in the statement, None if the statement isn't DML"""
+    match = _DML_TABLE.match(query)
+    return match.group(1) if match else None
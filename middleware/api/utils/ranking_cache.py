@@ -0,0 +1,48 @@
+import hashlib
+import json
+from api.utils.cache import get_cache
+from api.config.cache import RANKING_CACHE_TTL_SECONDS
+
+
+class RankingCache:
+    """
+    Preference agent rankings keyed by a hash of the exact payload sent to the agent.
+
+    The payload already contains the appointment properties, time, and each candidate's preferences and
+    proximity, so identical payloads always get the same ranking. Entries also remember each candidate's
+    version when they were stored, and are evicted once any of those candidates has changed.
+    """
+
+    def __init__(self):
+        self._rankings = get_cache("rankings")
+        self._versions = get_cache("versions")
+
+    @staticmethod
+    def key(payload: dict) -> str:
+        """Stable hash of an agent payload, independent of dict ordering"""
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    async def patient_versions(self, waitlist_ids: list[str]) -> dict[str, int]:
+        return {waitlist_id: await self._versions.get(f"ranking:patient:{waitlist_id}", 0) for waitlist_id in waitlist_ids}
+
+    async def get(self, key: str) -> list[dict] | None:
+        """Return the cached `[{waitlist_id, rank, reasoning}]` rankings, or None"""
+        entry = await self._rankings.get(key)
+        if entry is None:
+            return None
+
+        if entry["versions"] != await self.patient_versions(list(entry["versions"])):
+            await self._rankings.delete(key)
+            return None
+
+        return entry["rankings"]
+
+    async def put(self, key: str, rankings: list[dict], versions: dict[str, int]):
+        """
+        :param dict[str, int] versions: Candidate versions taken *before* calling the agent
+        """
+        await self._rankings.set(key, {"rankings": rankings, "versions": versions}, ttl_seconds=RANKING_CACHE_TTL_SECONDS)
+
+    async def invalidate_patient(self, waitlist_id: str):
+        """A patient's preferences or assignment state changed, evict every ranking they appear in"""
+        await self._versions.incr(f"ranking:patient:{waitlist_id}")
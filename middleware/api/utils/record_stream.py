@@ -0,0 +1,106 @@
+from starlette.responses import StreamingResponse
+from typing import AsyncIterator
+import codecs
+import csv
+import json
+
+# Content types accepted for bulk uploads and the record format each one is parsed as
+RECORD_FORMATS = {
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "text/csv": "csv",
+}
+
+# CSV cells holding JSON, e.g. medical_history and preferences
+_JSON_PREFIXES = ("[", "{")
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a stream of UTF-8 bytes into lines, however the chunks fall"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def _csv_value(value: str):
+    value = value.strip()
+    if value.startswith(_JSON_PREFIXES):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            pass
+    return value
+
+
+async def read_records(chunks: AsyncIterator[bytes], record_format: str) -> AsyncIterator[dict | ValueError]:
+    """
+    Parse a streamed NDJSON or CSV (with a header row) body one record at a time, without holding the whole body.
+    Yields each record as a dict, or a ValueError for a line that can't be parsed so one bad line doesn't abort the
+    rest. Empty CSV cells are left out and cells holding a JSON array or object are decoded.
+    """
+    header = None
+    record = ""
+
+    async for line in _lines(chunks):
+        if record_format == "ndjson":
+            if not line.strip():
+                continue
+            try:
+                value = json.loads(line)
+                yield value if isinstance(value, dict) else ValueError("Expected a JSON object")
+            except json.JSONDecodeError as e:
+                yield ValueError(f"Invalid JSON: {e}")
+            continue
+
+        # A CSV record is complete once its quotes are balanced, quoted cells may span lines
+        record += line
+        if record.count('"') % 2:
+            continue
+        row, record = next(csv.reader([record])) if record.strip() else [], ""
+
+        if not row:
+            continue
+        if header is None:
+            header = [column.strip() for column in row]
+        elif len(row) != len(header):
+            yield ValueError(f"Expected {len(header)} columns, got {len(row)}")
+        else:
+            yield {column: _csv_value(value) for column, value in zip(header, row) if value.strip()}
+
+    if record.strip():
+        yield ValueError("Unterminated quoted CSV cell")
+
+
+async def batched(items: AsyncIterator, size: int) -> AsyncIterator[list]:
+    """Group an async stream into lists of up to `size` items"""
+    batch = []
+    async for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    A StreamingResponse whose body can keep reading the request body, e.g. to stream results back while an upload
+    is still arriving. Starlette's own listens for the client disconnecting by reading the request concurrently,
+    which would swallow the upload.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
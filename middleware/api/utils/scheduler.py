@@ -0,0 +1,150 @@
+from datetime import datetime
+from typing import Awaitable, Callable
+from zoneinfo import ZoneInfo
+from api.utils.cache import get_cache
+from api.utils.time_utils import LOCAL_TIMEZONE
+from api.config.scheduler import SCHEDULER_HISTORY_SIZE, JOB_LEASE_TTL_SECONDS
+import asyncio
+import random
+import time
+import uuid
+
+
+class JobAlreadyRunningError(Exception):
+    """Raised when a job is triggered while a previous run is still in progress"""
+
+    def __init__(self, name: str):
+        super().__init__(f"Job {name} is already running")
+        self.name = name
+
+
+class Job:
+    def __init__(self, name: str, func: Callable[[], Awaitable], interval_seconds: float, jitter_seconds: float = 0):
+        self.name = name
+        self.func = func
+        self.interval_seconds = interval_seconds
+        self.jitter_seconds = jitter_seconds
+        self.next_run_at = None
+
+
+class Scheduler:
+    """
+    In-process scheduler for the recurring jobs (automatic assignment, grading, mark seen, ...).
+
+    Jobs are registered once with a cadence and can be run either by the scheduler's own loop (local mode)
+    or on demand, e.g. from the endpoints Cloud Scheduler calls. Either way a run holds a job lease in the
+    shared state backend, so a job never overlaps with itself even across workers, and every run is
+    recorded in the job's history.
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(Scheduler, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self.jobs: dict[str, Job] = {}
+        self._state = get_cache("scheduler")
+        self._loops: list[asyncio.Task] = []
+        self._initialized = True
+
+    def register(self, name: str, func: Callable[[], Awaitable], interval_seconds: float, jitter_seconds: float = 0):
+        """
+        :param str name: Unique job name
+        :param func: Coroutine function run on every execution
+        :param float interval_seconds: Time between the end of one run and the start of the next
+        :param float jitter_seconds: Random delay of up to this many seconds added to each interval
+        """
+        self.jobs[name] = Job(name, func, interval_seconds, jitter_seconds)
+
+    async def run_job(self, name: str, trigger: str = "request"):
+        """
+        Run a job now and return its result, raising JobAlreadyRunningError if a previous run hasn't finished
+        """
+        job = self.jobs[name]
+        owner = uuid.uuid4().hex
+        start = time.perf_counter()
+
+        if not await self._state.acquire(f"lease:{name}", owner, JOB_LEASE_TTL_SECONDS):
+            await self._record(job, trigger, "skipped", start)
+            raise JobAlreadyRunningError(name)
+
+        await self._state.set(f"last_started:{name}", time.time())
+
+        try:
+            result = await job.func()
+            await self._record(job, trigger, "succeeded", start)
+            return result
+        except Exception as e:
+            await self._record(job, trigger, "failed", start, str(e))
+            raise
+        finally:
+            await self._state.release(f"lease:{name}", owner)
+
+    def start(self):
+        """Start running every registered job on its cadence"""
+        if self._loops:
+            return
+
+        for job in self.jobs.values():
+            self._loops.append(asyncio.get_running_loop().create_task(self._run_forever(job), name=f"scheduler:{job.name}"))
+
+    async def stop(self):
+        for loop in self._loops:
+            loop.cancel()
+
+        await asyncio.gather(*self._loops, return_exceptions=True)
+        self._loops = []
+
+    async def status(self):
+        return {
+            "running": bool(self._loops),
+            "jobs": [{
+                "name": job.name,
+                "interval_seconds": job.interval_seconds,
+                "jitter_seconds": job.jitter_seconds,
+                "running": await self._state.get(f"lease:{job.name}") is not None,
+                "next_run_at": job.next_run_at,
+                "history": await self._state.get(f"history:{job.name}", [])
+            } for job in self.jobs.values()]
+        }
+
+    async def _run_forever(self, job: Job):
+        # Start each job at a random point within its jitter so they don't all fire together
+        delay = random.uniform(0, job.jitter_seconds)
+
+        while True:
+            job.next_run_at = self._now(delay)
+            await asyncio.sleep(delay)
+
+            # With several workers every one runs this loop, skip if another worker already ran the job this interval
+            last_started = await self._state.get(f"last_started:{job.name}")
+            if last_started is None or time.time() - last_started >= job.interval_seconds:
+                try:
+                    await self.run_job(job.name, trigger="schedule")
+                except JobAlreadyRunningError:
+                    pass
+                except Exception as e:
+                    print(f"Scheduled job {job.name} failed: {str(e)}")
+
+            delay = job.interval_seconds + random.uniform(0, job.jitter_seconds)
+
+    async def _record(self, job: Job, trigger: str, status: str, start: float, error: str = None):
+        history = await self._state.get(f"history:{job.name}", [])
+        await self._state.set(f"history:{job.name}", [{
+            "trigger": trigger,
+            "status": status,
+            "finished_at": self._now(),
+            "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+            "error": error
+        }] + history[:SCHEDULER_HISTORY_SIZE - 1])
+
+    @staticmethod
+    def _now(offset_seconds: float = 0):
+        return datetime.fromtimestamp(time.time() + offset_seconds, tz=ZoneInfo(LOCAL_TIMEZONE)).replace(tzinfo=None).isoformat()
@@ -0,0 +1,198 @@
+from api.config.search import SEARCH_INDEX_ENABLED, SEARCH_INDEX_MAX_AGE_SECONDS, SEARCH_INDEX_MAX_MATCHES
+from api.utils.background import run_in_background
+from api.utils.query_client import get_query_client
+from array import array
+import asyncio
+import bisect
+import time
+from typing import Callable
+
+# Characters LIKE treats as wildcards, searches containing them are left to the query
+_LIKE_WILDCARDS = ("%", "_")
+
+
+class TrigramIndex:
+    """
+    Substring search over one field. Values are split into overlapping 3-character grams; a search only checks the
+    values containing its rarest gram, and shorter searches check every value.
+    """
+
+    def __init__(self):
+        self.values: list[str | None] = []
+        self._grams: dict[str, array] = {}
+
+    def set(self, position: int, value: str | None):
+        if position == len(self.values):
+            self.values.append(value)
+        else:
+            # The grams of the old value are left behind, search checks the current value
+            self.values[position] = value
+        if value:
+            for gram in {value[i:i + 3] for i in range(len(value) - 2)}:
+                self._grams.setdefault(gram, array("I")).append(position)
+
+    def search(self, text: str, limit: int) -> list[int]:
+        if len(text) < 3:
+            candidates = range(len(self.values))
+        else:
+            postings = [self._grams.get(text[i:i + 3]) for i in range(len(text) - 2)]
+            if not all(postings):
+                return []
+            candidates = sorted(set(min(postings, key=len)))
+
+        matches = []
+        for position in candidates:
+            value = self.values[position]
+            if value and text in value:
+                matches.append(position)
+                if len(matches) >= limit:
+                    break
+        return matches
+
+
+class PrefixIndex:
+    """Prefix search over one field, on its values kept sorted"""
+
+    def __init__(self):
+        self.values: list[str | None] = []
+        self._sorted: list[tuple[str, int]] = []
+
+    def set(self, position: int, value: str | None):
+        if position == len(self.values):
+            self.values.append(value)
+        else:
+            # The old entry is left behind, search checks the current value
+            self.values[position] = value
+        if value:
+            bisect.insort(self._sorted, (value, position))
+
+    def load(self, values: list[str | None]):
+        self.values = values
+        self._sorted = sorted((value, position) for position, value in enumerate(values) if value)
+
+    def search(self, prefix: str, limit: int) -> list[int]:
+        matches = []
+        for value, position in self._sorted[bisect.bisect_left(self._sorted, (prefix,)):]:
+            if not value.startswith(prefix):
+                break
+            if self.values[position] == value:
+                matches.append(position)
+                if len(matches) >= limit:
+                    break
+        return matches
+
+
+class SearchIndex:
+    """
+    In-memory substring and prefix search over the identifiers of one table, a hint of which keys a `LIKE` search
+    matches so it can be tried on those first.
+
+    Loaded with one query on first use and rebuilt in the background once older than SEARCH_INDEX_MAX_AGE_SECONDS.
+    Writes made by this process are applied straight away with `upsert`, writes by other workers or instances show
+    up at the next rebuild. An index can hold keys whose value has since changed and miss keys written elsewhere, so
+    callers keep their own filter and query without the index when it matches nothing or none of its keys match.
+    """
+
+    def __init__(self, table: str, key: str, substring: tuple[str, ...] = (), prefix: tuple[str, ...] = (),
+                 where: str = None, where_params: Callable[[], dict] = None):
+        """
+            :param str where: Filter on the rows indexed, e.g. to leave out past appointments
+            :param where_params: Returns the named parameters of `where`, evaluated at every rebuild
+        """
+        self.table = table
+        self.key = key
+        self.substring = substring
+        self.prefix = prefix
+        self.where = where
+        self.where_params = where_params
+
+        self._keys: list[str] = []
+        self._positions: dict[str, int] = {}
+        self._fields: dict[str, TrigramIndex | PrefixIndex] = self._empty_fields()
+        self._loaded_at = None
+        self._loading = None
+        # Writes made while a rebuild's query runs, replayed onto the rebuilt index
+        self._pending = None
+
+    def _empty_fields(self) -> dict:
+        return {**{field: TrigramIndex() for field in self.substring}, **{field: PrefixIndex() for field in self.prefix}}
+
+    async def search(self, field: str, text: str, limit: int = SEARCH_INDEX_MAX_MATCHES) -> list[str] | None:
+        """
+        Keys whose field contains `text` (substring fields) or starts with it (prefix fields). None when the index
+        can't answer, i.e. it's disabled, the search has LIKE wildcards or more than `limit` keys match, in which case
+        the caller should query without it.
+        """
+        if not SEARCH_INDEX_ENABLED or any(wildcard in text for wildcard in _LIKE_WILDCARDS):
+            return None
+
+        await self._ensure_fresh()
+        positions = self._fields[field].search(text, limit + 1)
+        if len(positions) > limit:
+            return None
+        return [self._keys[position] for position in positions]
+
+    def upsert(self, key: str, **values):
+        """Add a row or change some of its indexed fields"""
+        if self._loaded_at is None and self._loading is None:
+            return # Loaded from the table when first searched
+        if self._pending is not None:
+            self._pending.append((key, values))
+        self._apply(self._keys, self._positions, self._fields, key, values)
+
+    @staticmethod
+    def _apply(keys: list, positions: dict, fields: dict, key: str, values: dict):
+        position = positions.get(key)
+        if position is None:
+            position = positions[key] = len(keys)
+            keys.append(key)
+            for field, index in fields.items():
+                index.set(position, values.get(field))
+            return
+
+        for field, value in values.items():
+            if field in fields:
+                fields[field].set(position, value)
+
+    async def _ensure_fresh(self):
+        if self._loaded_at is None:
+            if self._loading is None:
+                self._loading = asyncio.ensure_future(self._load())
+            await asyncio.shield(self._loading)
+        elif self._loading is None and time.monotonic() - self._loaded_at > SEARCH_INDEX_MAX_AGE_SECONDS:
+            self._loading = run_in_background(self._load(), name=f"search-index:{self.table}")
+
+    async def _load(self):
+        try:
+            self._pending = []
+            columns = [self.key, *self.substring, *self.prefix]
+            query = f"SELECT {', '.join(columns)} FROM {self.table}"
+            if self.where:
+                query += f" WHERE {self.where}"
+            rows = await get_query_client().run_query(query=query, named_params=self.where_params() if self.where_params else None)
+
+            keys = [row[self.key] for row in rows]
+            positions = {key: position for position, key in enumerate(keys)}
+            fields = self._empty_fields()
+            for field in self.substring:
+                for position, row in enumerate(rows):
+                    fields[field].set(position, row[field])
+            for field in self.prefix:
+                fields[field].load([row[field] for row in rows])
+
+            for key, values in self._pending:
+                self._apply(keys, positions, fields, key, values)
+
+            self._keys, self._positions, self._fields = keys, positions, fields
+            self._loaded_at = time.monotonic()
+        finally:
+            self._pending = None
+            self._loading = None
+
+
+def intersect_ids(ids: list[str] | None, other: list[str] | None) -> list[str] | None:
+    """Keys matched by two searches, where None (the index couldn't answer) matches anything"""
+    if ids is None or other is None:
+        return other if ids is None else ids
+    other = set(other)
+    return [key for key in ids if key in other]
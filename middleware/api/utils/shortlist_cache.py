@@ -0,0 +1,102 @@
+from api.utils.cache import get_cache
+from api.config.cache import SHORTLIST_TTL_SECONDS
+
+ALL_DEPARTMENTS = "*"
+
+
+class ShortlistCache:
+    """
+    Ranked candidate shortlists per appointment, built ahead of assign_at.
+
+    Each shortlist records the waitlist version of its department when it was built. Any change to the
+    waitlist bumps that version (or the global one), which makes every shortlist built before the change
+    stale; stale shortlists are never served and are rebuilt in the background.
+    """
+
+    def __init__(self):
+        self._shortlists = get_cache("shortlists")
+        self._versions = get_cache("versions")
+
+    async def version(self, department_id: str) -> tuple[int, int]:
+        """Current waitlist version for a department, take this *before* fetching candidates"""
+        return (await self._versions.get(f"shortlist:department:{ALL_DEPARTMENTS}", 0),
+                await self._versions.get(f"shortlist:department:{department_id}", 0))
+
+    async def get(self, appointment_id: str, prefers_evening: bool, with_proximity: bool, limit: int = None) -> list[dict] | None:
+        """
+        Return a copy of the cached shortlist, or None if there is no usable one
+
+        :param bool prefers_evening: Whether evening patients are currently preferred, must match the build
+        :param bool with_proximity: Whether the appointment is within 24 hours, must match the build
+        :param int limit: Required shortlist size, any size is accepted when not given
+        """
+        entry = await self._shortlists.get(f"appointment:{appointment_id}")
+        if entry is None:
+            return None
+
+        # The shared backends store the version as a list
+        if (tuple(entry["version"]) != await self.version(entry["appointment"]["department_id"])
+                or entry["prefers_evening"] != prefers_evening
+                or entry["with_proximity"] != with_proximity
+                or (limit is not None and entry["limit"] != limit)):
+            return None
+
+        return [dict(candidate) for candidate in entry["candidates"]]
+
+    async def put(self, appointment: dict, candidates: list[dict], limit: int, prefers_evening: bool, with_proximity: bool,
+                  version: tuple[int, int]):
+        department_id = appointment["department_id"]
+
+        await self._shortlists.set(f"appointment:{appointment['appointment_id']}", {
+            "appointment": appointment,
+            "candidates": [dict(candidate) for candidate in candidates],
+            "limit": limit,
+            "prefers_evening": prefers_evening,
+            "with_proximity": with_proximity,
+            "version": version
+        }, ttl_seconds=SHORTLIST_TTL_SECONDS)
+
+        # Keep the department's index of shortlists, pruning any that have expired
+        appointment_ids = [appointment_id for appointment_id in await self._shortlists.get(f"department:{department_id}", [])
+                           if appointment_id != appointment['appointment_id']
+                           and await self._shortlists.get(f"appointment:{appointment_id}") is not None]
+        await self._shortlists.set(f"department:{department_id}", appointment_ids + [appointment['appointment_id']],
+                                   ttl_seconds=SHORTLIST_TTL_SECONDS)
+
+        department_ids = await self._shortlists.get("departments", [])
+        if department_id not in department_ids:
+            await self._shortlists.set("departments", department_ids + [department_id])
+
+    async def discard(self, appointment_id: str) -> str | None:
+        """Drop an appointment's shortlist, returning its department if it was cached"""
+        entry = await self._shortlists.get(f"appointment:{appointment_id}")
+        await self._shortlists.delete(f"appointment:{appointment_id}")
+
+        if entry is None:
+            return None
+
+        department_id = entry["appointment"]["department_id"]
+        appointment_ids = await self._shortlists.get(f"department:{department_id}", [])
+        await self._shortlists.set(f"department:{department_id}", [a for a in appointment_ids if a != appointment_id],
+                                   ttl_seconds=SHORTLIST_TTL_SECONDS)
+        return department_id
+
+    async def invalidate_department(self, department_id: str | None):
+        """Mark every shortlist in the department stale, or every shortlist if the department is unknown"""
+        await self._versions.incr(f"shortlist:department:{department_id or ALL_DEPARTMENTS}")
+
+    async def pending(self, department_id: str | None) -> list[dict]:
+        """Return `{appointment, limit}` for every cached shortlist that is stale, optionally within one department"""
+        if department_id:
+            appointment_ids = await self._shortlists.get(f"department:{department_id}", [])
+        else:
+            appointment_ids = [appointment_id for key in await self._shortlists.get("departments", [])
+                               for appointment_id in await self._shortlists.get(f"department:{key}", [])]
+
+        stale = []
+        for appointment_id in appointment_ids:
+            entry = await self._shortlists.get(f"appointment:{appointment_id}")
+            if entry and tuple(entry["version"]) != await self.version(entry["appointment"]["department_id"]):
+                stale.append({"appointment": entry["appointment"], "limit": entry["limit"]})
+
+        return stale
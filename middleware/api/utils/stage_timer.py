@@ -0,0 +1,46 @@
+from collections import defaultdict
+from contextlib import contextmanager
+import time
+
+
+class StageTimer:
+    """
+    Accumulates wall-clock latency per named stage of a pipeline.
+
+    Safe to share between coroutines on the same event loop, so concurrent
+    workers can report into a single timer.
+    """
+
+    def __init__(self):
+        self._totals = defaultdict(float)
+        self._counts = defaultdict(int)
+        self._max = defaultdict(float)
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, elapsed: float):
+        """
+        Record one run of a stage that took `elapsed` seconds
+        """
+        self._totals[name] += elapsed
+        self._counts[name] += 1
+        self._max[name] = max(self._max[name], elapsed)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """
+        Returns `{stage: {count, total_ms, avg_ms, max_ms}}` for every stage recorded
+        """
+        return {
+            name: {
+                "count": self._counts[name],
+                "total_ms": round(self._totals[name] * 1000, 2),
+                "avg_ms": round(self._totals[name] * 1000 / self._counts[name], 2),
+                "max_ms": round(self._max[name] * 1000, 2)
+            } for name in self._totals
+        }
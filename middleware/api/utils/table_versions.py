@@ -0,0 +1,97 @@
+from api.config.cache import ETAG_MAX_AGE_SECONDS, STATE_BACKEND
+from api.utils.cache import get_cache
+from api.utils.instrumentation import Metrics, current_route
+from api.utils.time_utils import query_current_time
+from email.utils import formatdate
+from fastapi import HTTPException, Request, Response
+import hashlib
+import time
+import uuid
+
+Metrics().counter("mws_conditional_get_total", "Conditional GETs by route and whether they were answered with 304 Not Modified")
+
+
+class TableVersions:
+    """
+    A version counter per table, bumped by the query clients after every write to it (see `dml_table`), and the time
+    of that write. Kept in the shared "versions" cache, so use STATE_BACKEND sqlite or redis with more than one worker.
+    """
+
+    def __init__(self):
+        self._versions = get_cache("versions")
+
+    @staticmethod
+    def _name(table: str) -> str:
+        return table.strip("`").lower()
+
+    async def epoch(self) -> dict:
+        """
+        When and under which id the counters started, a restarted in-memory cache starts again from 0, so the id
+        keeps its tags from matching those given out before
+        """
+        epoch = await self._versions.get("table:epoch")
+        if epoch is None:
+            epoch = {"id": uuid.uuid4().hex, "at": time.time()}
+            await self._versions.set("table:epoch", epoch)
+        return epoch
+
+    async def get(self, table: str) -> int:
+        return await self._versions.get(f"table:{self._name(table)}", 0)
+
+    async def modified_at(self, table: str) -> float | None:
+        return await self._versions.get(f"table:{self._name(table)}:modified_at")
+
+    async def bump(self, table: str | None):
+        if not table:
+            return
+        await self._versions.incr(f"table:{self._name(table)}")
+        await self._versions.set(f"table:{self._name(table)}:modified_at", time.time())
+
+
+def conditional_get(*tables: str, clock: str = None):
+    """
+    Dependency giving a GET endpoint an ETag and Last-Modified from the versions of the tables it reads, and answering
+    a matching `If-None-Match` with 304 before the endpoint runs any query. Add it after the auth dependency, so
+    unauthenticated requests are still refused.
+
+    Does nothing with STATE_BACKEND memory: each worker and instance would keep its own counters, and one that never
+    saw a write would keep answering 304 for data another one changed.
+
+    :param tables: Fully qualified names of every table the response is built from
+    :param str clock: Key in QUERY_TIME_BUCKETS of the endpoint's @current_time, for responses that also change with
+        the time (e.g. upcoming appointments), so the tag changes with each time bucket
+    """
+    async def dependency(request: Request, response: Response):
+        if STATE_BACKEND == "memory":
+            return
+
+        table_versions = TableVersions()
+        # Taken before the endpoint queries, so a write while it runs leaves the response under the older tag
+        epoch = await table_versions.epoch()
+        versions = [await table_versions.get(table) for table in tables]
+        modified_at = max([await table_versions.modified_at(table) or epoch["at"] for table in tables])
+
+        parts = [epoch["id"], request.url.path, request.url.query, *map(str, versions)]
+        if clock:
+            parts.append(query_current_time(clock))
+        if ETAG_MAX_AGE_SECONDS > 0:
+            # Writes made outside the middleware never bump a version, this bounds how long they go unseen
+            parts.append(str(int(time.time() // ETAG_MAX_AGE_SECONDS)))
+        etag = f'W/"{hashlib.sha1("|".join(parts).encode()).hexdigest()[:20]}"'
+
+        headers = {"ETag": etag, "Last-Modified": formatdate(modified_at, usegmt=True),
+                   # Revalidate every time rather than letting the browser guess how long the response stays fresh
+                   "Cache-Control": "private, no-cache"}
+
+        # Weak comparison, a tag matches with or without its W/ prefix
+        if_none_match = request.headers.get("if-none-match")
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")} if if_none_match else set()
+        not_modified = "*" in tags or etag.removeprefix("W/") in tags
+        Metrics().inc("mws_conditional_get_total", route=current_route() or request.url.path,
+                      outcome="not_modified" if not_modified else "modified")
+        if not_modified:
+            raise HTTPException(status_code=304, headers=headers)
+
+        response.headers.update(headers)
+
+    return dependency
@@ -1,3 +1,4 @@
+from api.config.query import QUERY_TIME_BUCKETS
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
@@ -46,3 +47,25 @@ def datetime_sub(hours: int, truncate_to_hour: bool = False) -> str:
         current_time = current_time.replace(minute=0, second=0, microsecond=0)
     result_time = current_time - timedelta(hours=hours)
     return result_time.replace(tzinfo=None).isoformat()
+
+def query_current_time(query_name: str, round_up: bool = False) -> str:
+    """
+    Current London time for a query's @current_time parameter, truncated to the query's bucket in QUERY_TIME_BUCKETS
+    so repeated queries can hit BigQuery's result cache.
+
+    Args:
+        query_name: Key of the query in QUERY_TIME_BUCKETS, queries not listed get the exact time
+        round_up: Round up to the end of the bucket instead of down, for queries where a later bound is the safe side
+
+    Returns:
+        str: Datetime as ISO string without timezone info
+    """
+    current_time = datetime.now(tz=ZoneInfo(LOCAL_TIMEZONE)).replace(tzinfo=None)
+    bucket_seconds = QUERY_TIME_BUCKETS.get(query_name, 0)
+    if bucket_seconds <= 0:
+        return current_time.isoformat()
+
+    midnight = current_time.replace(hour=0, minute=0, second=0, microsecond=0)
+    offset = (current_time - midnight).total_seconds()
+    buckets = offset // bucket_seconds + (1 if round_up and offset % bucket_seconds else 0)
+    return (midnight + timedelta(seconds=buckets * bucket_seconds)).isoformat()
@@ -0,0 +1,120 @@
+from api.config.query import WRITE_BUFFER_WINDOW_SECONDS, WRITE_BUFFER_MAX_ROWS
+from api.utils.background import run_in_background
+from api.utils.instrumentation import Metrics
+from api.utils.query_client import get_query_client
+import asyncio
+import time
+
+# Rows per coalesced write
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+Metrics().histogram("mws_write_buffer_flush_duration_seconds", "Time to write one coalesced batch of point updates")
+Metrics().histogram("mws_write_buffer_batch_size", "Rows written by one coalesced batch of point updates",
+                    buckets=BATCH_SIZE_BUCKETS)
+
+
+class WriteBuffer:
+    """
+    Coalesces point updates (`UPDATE table SET ... WHERE key = ...`) to the same table and columns that arrive within
+    WRITE_BUFFER_WINDOW_SECONDS into a single MERGE from an array of structs, as BigQuery throttles concurrent DML
+    statements per table. Later updates to a row replace earlier ones still waiting in the same batch.
+
+    `update` returns once its batch is written and raises if the write failed, so callers can read their writes
+    straight after. Call `flush` on shutdown to write whatever is still waiting.
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(WriteBuffer, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self.bq_client = get_query_client()
+        # {(table, key column and type, columns and types): {key: (values, future)}}
+        self._batches = {}
+        self._initialized = True
+
+    async def update(self, table: str, key: tuple[str, str, object], values: dict[str, tuple[str, object]]):
+        """
+        Set columns of one row, e.g. `update(WAITLIST_FQTN, ("waitlist_id", "STRING", waitlist_id),
+        {"grading_status": ("STRING", "FAILED")})`
+
+        :param str table: Fully qualified table name
+        :param tuple key: Column identifying the row, its type and value
+        :param dict values: Columns to set, with their type and value like query parameters
+        """
+        key_column, key_type, key_value = key
+        signature = (table, (key_column, key_type), tuple(sorted((column, bq_type) for column, (bq_type, _) in values.items())))
+
+        batch = self._batches.get(signature)
+        if batch is None:
+            batch = self._batches[signature] = {}
+            if WRITE_BUFFER_WINDOW_SECONDS > 0:
+                run_in_background(self._flush_later(signature, batch), name=f"write-buffer:{table}")
+
+        _, future = batch.get(key_value, (None, None))
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+        batch[key_value] = ({column: value for column, (_, value) in values.items()}, future)
+
+        if WRITE_BUFFER_WINDOW_SECONDS <= 0 or len(batch) >= WRITE_BUFFER_MAX_ROWS:
+            await self._flush(signature)
+
+        await future
+
+    async def flush(self):
+        """Write every waiting batch now"""
+        await asyncio.gather(*[self._flush(signature) for signature in list(self._batches)])
+
+    async def _flush_later(self, signature, batch: dict):
+        await asyncio.sleep(WRITE_BUFFER_WINDOW_SECONDS)
+        # The batch may have been written already (it filled up, or on shutdown) and a newer one started since,
+        # which has its own timer
+        if self._batches.get(signature) is batch:
+            await self._flush(signature)
+
+    async def _flush(self, signature):
+        batch = self._batches.pop(signature, None)
+        if not batch:
+            return
+
+        table, (key_column, key_type), columns = signature
+        fields = ", ".join(f"{column} {bq_type}" for column, bq_type in [(key_column, key_type), *columns])
+        rows = [{key_column: key_value, **values} for key_value, (values, _) in batch.items()]
+
+        query = f"""
+        MERGE {table} t
+        USING (SELECT * FROM UNNEST(@updates)) AS u
+        ON t.{key_column} = u.{key_column}
+        WHEN MATCHED THEN
+            UPDATE SET {", ".join(f"{column} = u.{column}" for column, _ in columns)}
+        """
+
+        start = time.perf_counter()
+        try:
+            await self.bq_client.run_dml(query=query, named_params={"updates": (f"ARRAY<STRUCT<{fields}>>", rows)})
+        except BaseException as e:
+            # Every waiter is resolved, a cancelled flush (e.g. on shutdown) cancels them rather than leaving them hanging
+            for _, future in batch.values():
+                if future.done():
+                    continue
+                if isinstance(e, Exception):
+                    future.set_exception(e)
+                else:
+                    future.cancel()
+            if not isinstance(e, Exception):
+                raise
+        else:
+            for _, future in batch.values():
+                if not future.done():
+                    future.set_result(None)
+        finally:
+            table_name = table.strip("`").split(".")[-1]
+            Metrics().observe("mws_write_buffer_flush_duration_seconds", time.perf_counter() - start, table=table_name)
+            Metrics().observe("mws_write_buffer_batch_size", len(rows), table=table_name)
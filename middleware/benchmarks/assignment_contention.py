@@ -0,0 +1,200 @@
+"""
+Concurrent automatic and manual assignment against the same slots and patients, checking nothing gets double-booked.
+
+A synthetic dataset is generated (see benchmarks.generate_data) and the middleware is started in a fresh process on
+the local DuckDB backend, with stub agents, routing and secrets (see benchmarks.stubs). Each round releases a batch
+of slots for automatic assignment and, while GET /match/automatic-assignment runs, fires POST /match/manual-assign
+requests that assign a small pool of free patients to those same slots in random order.
+
+Afterwards it checks that:
+
+    no patient holds more than one appointment
+    every patient holding one of the slots is marked is_assigned
+    every patient of the pool marked is_assigned holds an appointment
+
+and exits with status 1 if any of them fails:
+
+    python -m benchmarks.assignment_contention --patients 10000 --rounds 5 --slots-per-round 20
+"""
+import argparse
+import asyncio
+import collections
+import contextlib
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+from benchmarks import generate_data, stubs
+
+RESULT_MARKER = "BENCHMARK_RESULT "
+FAR_FUTURE = "2999-01-01 00:00:00"
+
+
+async def _run_rounds(args) -> dict:
+    """Runs inside the benchmark process, with the environment prepared by `_run`"""
+    import httpx
+    import main
+    from api.utils import get_query_client
+    from api.utils.local_query_client import local_table_name
+
+    stubs.install(main.app, args.agent_latency_ms / 1000, args.routing_latency_ms / 1000)
+
+    connection = get_query_client().connection
+    appointments = local_table_name("appointments")
+    waitlist = local_table_name("waitlist")
+    rng = random.Random(args.seed)
+
+    # Park every open appointment so automatic assignment only picks up the slots each round releases
+    connection.execute(f"""
+        UPDATE "{appointments}" SET assign_at = TIMESTAMP '{FAR_FUTURE}'
+        WHERE waitlist_id IS NULL AND appointment_time >= current_localtimestamp()
+    """)
+    open_slots = [row[0] for row in connection.execute(f"""
+        SELECT appointment_id FROM "{appointments}"
+        WHERE waitlist_id IS NULL AND appointment_time >= current_localtimestamp()
+        ORDER BY hash(appointment_id)
+    """).fetchall()]
+    free_patients = [row[0] for row in connection.execute(f"""
+        SELECT waitlist_id FROM "{waitlist}" w
+        WHERE is_assigned IS FALSE AND NOT EXISTS (SELECT 1 FROM "{appointments}" a WHERE a.waitlist_id = w.waitlist_id)
+        ORDER BY hash(waitlist_id)
+    """).fetchall()]
+
+    touched_slots, pool = [], []
+    outcomes = collections.Counter()
+
+    async def automatic(client):
+        response = await client.get("/match/automatic-assignment")
+        outcomes[f"automatic {response.status_code}"] += 1
+
+    async def manual(client, appointment_id: str, waitlist_id: str):
+        await asyncio.sleep(rng.random() * args.spread_ms / 1000)
+        response = await client.post("/match/manual-assign", json={"appointment_id": appointment_id, "waitlist_id": waitlist_id})
+        outcomes[f"manual {response.status_code}"] += 1
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        for n in range(args.rounds):
+            slots = open_slots[n * args.slots_per_round:][:args.slots_per_round]
+            patients = free_patients[n * args.patients_per_round:][:args.patients_per_round]
+            touched_slots += slots
+            pool += patients
+
+            connection.execute(f'UPDATE "{appointments}" SET assign_at = NULL WHERE appointment_id IN (SELECT unnest(?))', [slots])
+
+            # Every patient of the pool is sent for several slots and every slot gets several patients
+            requests = [(rng.choice(slots), rng.choice(patients)) for _ in range(args.manual_per_round)]
+            await asyncio.gather(*[automatic(client) for _ in range(args.automatic_per_round)],
+                                 *[manual(client, appointment_id, waitlist_id) for appointment_id, waitlist_id in requests])
+
+    double_booked = connection.execute(f"""
+        SELECT waitlist_id, count(*) FROM "{appointments}"
+        WHERE waitlist_id IN (
+            SELECT waitlist_id FROM "{appointments}" WHERE appointment_id IN (SELECT unnest(?))
+            UNION ALL SELECT unnest(?)
+        )
+        GROUP BY waitlist_id HAVING count(*) > 1
+    """, [touched_slots, pool]).fetchall()
+    unflagged = connection.execute(f"""
+        SELECT a.appointment_id, a.waitlist_id FROM "{appointments}" a JOIN "{waitlist}" w USING (waitlist_id)
+        WHERE a.appointment_id IN (SELECT unnest(?)) AND w.is_assigned IS NOT TRUE
+    """, [touched_slots]).fetchall()
+    orphaned = connection.execute(f"""
+        SELECT waitlist_id FROM "{waitlist}" w
+        WHERE waitlist_id IN (SELECT unnest(?)) AND is_assigned IS TRUE
+        AND NOT EXISTS (SELECT 1 FROM "{appointments}" a WHERE a.waitlist_id = w.waitlist_id)
+    """, [pool]).fetchall()
+    assigned_slots = connection.execute(f"""
+        SELECT count(*) FROM "{appointments}" WHERE appointment_id IN (SELECT unnest(?)) AND waitlist_id IS NOT NULL
+    """, [touched_slots]).fetchone()[0]
+
+    return {
+        "slots": len(touched_slots),
+        "assigned_slots": assigned_slots,
+        "outcomes": dict(sorted(outcomes.items())),
+        "violations": [f"patient {waitlist_id} holds {count} appointments" for waitlist_id, count in double_booked]
+                      + [f"appointment {appointment_id} holds patient {waitlist_id}, who is not marked assigned"
+                         for appointment_id, waitlist_id in unflagged]
+                      + [f"patient {waitlist_id} is marked assigned without an appointment" for (waitlist_id,) in orphaned]
+    }
+
+
+def _dataset(args) -> str:
+    """Directory holding the dataset, generated on first use"""
+    directory = os.path.join(args.data_root, f"patients-{args.patients}-seed-{args.seed}")
+    if not os.path.exists(os.path.join(directory, "waitlist.parquet")):
+        print(f"Generating {args.patients:,} patients into {directory}", file=sys.stderr)
+        generate_data.run(generate_data.build_parser().parse_args([
+            "--patients", str(args.patients), "--seed", str(args.seed), "--output", directory
+        ]))
+    return directory
+
+
+def _run(args) -> dict:
+    env = {
+        **os.environ,
+        "QUERY_BACKEND": "duckdb",
+        "LOCAL_DATA_DIR": _dataset(args),
+        "LOCAL_DATABASE_PATH": ":memory:",
+        "STATE_BACKEND": "memory",
+        "SCHEDULER_MODE": "external",
+        "SHORTLIST_REFRESH_DELAY_SECONDS": "3600",
+    }
+    for name in ["departments", "hospitals", "waitlist", "appointments", "rejected_appointments", "job_state", "users"]:
+        env.setdefault(f"{name.upper()}_TABLE", name)
+    env.setdefault("BQ_PROJECT_ID", "benchmark")
+    env.setdefault("PROJECT_DATASET", "benchmark")
+
+    command = [sys.executable, "-m", "benchmarks.assignment_contention", "--child", *sys.argv[1:]]
+    completed = subprocess.run(command, env=env, capture_output=True, text=True,
+                               cwd=os.path.join(os.path.dirname(__file__), ".."))
+
+    for line in completed.stdout.splitlines():
+        if line.startswith(RESULT_MARKER):
+            return json.loads(line[len(RESULT_MARKER):])
+
+    raise RuntimeError(f"Contention run failed:\n{completed.stderr[-4000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=10_000, help="Dataset size, in patients")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--slots-per-round", type=int, default=20, help="Appointments released per round")
+    parser.add_argument("--patients-per-round", type=int, default=10, help="Free patients sent to manual assignment per round")
+    parser.add_argument("--manual-per-round", type=int, default=60, help="Concurrent manual assignments per round")
+    parser.add_argument("--automatic-per-round", type=int, default=2, help="Concurrent automatic assignment runs per round")
+    parser.add_argument("--spread-ms", type=float, default=50, help="Manual assignments start at random within this window")
+    parser.add_argument("--agent-latency-ms", type=float, default=5, help="Simulated latency of each agent call")
+    parser.add_argument("--routing-latency-ms", type=float, default=0, help="Simulated latency of each routing call")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data-root", default=os.path.join(tempfile.gettempdir(), "mws-benchmark-data"))
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # The app logs agent sessions to stdout, keep them out of the result
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = asyncio.run(_run_rounds(args))
+        print(RESULT_MARKER + json.dumps(result))
+        return
+
+    result = _run(args)
+    print(f"{result['slots']} slots released, {result['assigned_slots']} assigned")
+    for outcome, count in result["outcomes"].items():
+        print(f"  {outcome:<16} {count:>6}")
+
+    if result["violations"]:
+        print("\nDouble bookings:")
+        for violation in result["violations"]:
+            print(f"  {violation}")
+        sys.exit(1)
+    print("\nNo double bookings")
+
+
+if __name__ == "__main__":
+    main()
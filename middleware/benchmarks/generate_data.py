@@ -0,0 +1,343 @@
+"""
+Generate a synthetic waitlist dataset matching bq-schema.txt, at anything from 10k to 10M referrals.
+
+Departments and hospitals come from frontend/public/*.json. Referrals are spread over those departments with a
+skew towards the first few, clinical urgency and severity follow configurable weights (mostly low, few high),
+some patients are referred more than once (later referrals carry the earlier ones in medical_history, as
+WaitlistRepository.add_patient does), and most patients have preference JSON. Appointments cover the past and
+the future: past ones are assigned to patients who have since been seen, some future ones are assigned and the
+rest are open, and open appointments collect rejections from patients in the same department.
+
+Rows are generated inside DuckDB (pip install duckdb) and written as one columnar file per table, ready for
+LOCAL_DATA_DIR (QUERY_BACKEND=duckdb) or for `bq load --source_format=PARQUET`:
+
+    python -m benchmarks.generate_data --patients 1000000 --output data/
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+
+FRONTEND_PUBLIC = os.path.join(os.path.dirname(__file__), "..", "..", "frontend", "public")
+
+_FORMATS = {
+    "parquet": ("parquet", "FORMAT PARQUET, COMPRESSION ZSTD"),
+    "csv": ("csv", "FORMAT CSV, HEADER"),
+    "json": ("json", "FORMAT JSON"),
+}
+
+REFERRAL_NOTES = [
+    "Referred by GP with persistent symptoms over several weeks.",
+    "Follow-up requested after abnormal test results.",
+    "Worsening pain despite current medication.",
+    "Routine review of a long-term condition.",
+    "Urgent review requested following emergency attendance.",
+    "Second opinion requested by the patient.",
+    "Symptoms affecting sleep and daily activities.",
+    "Referred for further investigation of recurrent episodes.",
+]
+
+PREFERENCES = {
+    "transport": ["car", "public transport", "hospital transport"],
+    "time_of_day": ["morning", "afternoon", "evening"],
+    "clinician_gender": ["female", "male", "no preference"],
+    "accessibility": ["wheelchair access", "hearing loop", "step-free access"],
+}
+
+APPOINTMENT_PROPERTIES = ["wheelchair access", "hearing loop", "female clinician", "evening clinic", "near public transport"]
+
+
+def _sql_list(values: list[str]) -> str:
+    return "[" + ", ".join("'" + value.replace("'", "''") + "'" for value in values) + "]"
+
+
+def _pick(values: list[str], salt: str, key: str = "i") -> str:
+    """SQL picking one of `values` uniformly, keyed on `key`"""
+    return f"list_extract({_sql_list(values)}, 1 + floor(rnd({key}, '{salt}') * {len(values)})::INTEGER)"
+
+
+def generate(connection, args) -> dict[str, int]:
+    """Build the departments, hospitals, users, waitlist, appointments and rejected_appointments tables"""
+    now = args.now
+    high, medium, _ = args.urgency_weights
+    people = max(1, round(args.patients / args.referrals_per_patient))
+
+    # Deterministic uniform [0, 1) and UUID-shaped ids per row and purpose, so the same seed always gives the same dataset
+    connection.execute(f"CREATE MACRO rnd(i, salt) AS (hash(i, salt, {args.seed}) % 1000000) / 1000000.0")
+    connection.execute(f"""
+        CREATE MACRO uid(i, salt) AS (
+            SELECT substr(h, 1, 8) || '-' || substr(h, 9, 4) || '-4' || substr(h, 14, 3) || '-a' || substr(h, 18, 3) || '-' || substr(h, 21, 12)
+            FROM (SELECT md5(i::VARCHAR || salt || '{args.seed}') AS h)
+        )
+    """)
+    connection.execute(f"CREATE MACRO urgency(u) AS CASE WHEN u < {high} THEN 3 WHEN u < {high + medium} THEN 2 ELSE 1 END")
+
+    connection.execute(f"""
+        CREATE TABLE departments AS
+        SELECT department_id::VARCHAR AS department_id, department_name::VARCHAR AS department_name,
+               (row_number() OVER (ORDER BY department_id::INTEGER) - 1)::INTEGER AS idx
+        FROM read_json_auto('{os.path.join(args.frontend_public, "departments.json")}')
+    """)
+    connection.execute(f"""
+        CREATE TABLE hospitals AS
+        SELECT hospital_id::VARCHAR AS hospital_id, hospital_name::VARCHAR AS hospital_name,
+               address_line1::VARCHAR AS address_line1, address_line2::VARCHAR AS address_line2,
+               city::VARCHAR AS city, county::VARCHAR AS county, post_code::VARCHAR AS postcode,
+               (row_number() OVER (ORDER BY hospital_id::INTEGER) - 1)::INTEGER AS idx
+        FROM read_json_auto('{os.path.join(args.frontend_public, "hospitals.json")}')
+    """)
+    departments = connection.execute("SELECT COUNT(*) FROM departments").fetchone()[0]
+    hospitals = connection.execute("SELECT COUNT(*) FROM hospitals").fetchone()[0]
+    areas = [row[0] for row in connection.execute(
+        "SELECT DISTINCT regexp_extract(postcode, '^[A-Z]+') FROM hospitals WHERE postcode IS NOT NULL ORDER BY 1").fetchall()]
+
+    connection.execute(f"""
+        CREATE TABLE users AS
+        SELECT 'admin@medical.uk' AS email
+        UNION ALL
+        SELECT 'clinician' || i || '@medical.uk' FROM range({args.users}) t(i)
+    """)
+
+    # Referrals: people are drawn at random, so some medical_numbers appear several times
+    preference_entries = ", ".join(
+        f"CASE WHEN rnd(person, 'pref_{key}') < 0.5 THEN {{'k': '{key}', 'v': {_pick(values, 'pref_value_' + key, 'person')}}} END"
+        for key, values in PREFERENCES.items()
+    )
+    connection.execute(f"""
+        CREATE TABLE referrals AS
+        SELECT
+            i,
+            uid(i, 'waitlist') AS waitlist_id,
+            (1000000000 + person)::VARCHAR AS medical_number,
+            DATE '1930-01-01' + floor(rnd(person, 'dob') * 32000)::INTEGER AS date_of_birth,
+            {_pick(areas, 'area', 'person')} || (1 + floor(rnd(person, 'district') * 30)::INTEGER) || ' '
+                || floor(rnd(person, 'sector') * 10)::INTEGER
+                || chr(65 + floor(rnd(person, 'unit1') * 26)::INTEGER) || chr(65 + floor(rnd(person, 'unit2') * 26)::INTEGER) AS postcode,
+            d.department_id,
+            {_pick(REFERRAL_NOTES, 'notes')} AS referral_notes,
+            date_trunc('minute', TIMESTAMP '{now:%Y-%m-%d %H:%M:%S}' - to_seconds((rnd(i, 'referred') * {args.days} * 86400)::BIGINT)) AS referral_date,
+            rnd(i, 'grading') AS grading_draw,
+            CASE WHEN rnd(person, 'evening') < 0.2 THEN TRUE ELSE FALSE END AS prefers_evening,
+            CASE WHEN rnd(person, 'has_preferences') < 0.7
+                 THEN list_filter([{preference_entries}], entry -> entry IS NOT NULL) END AS preference_entries,
+            CASE WHEN rnd(i, 'deleted') < 0.01 THEN TRUE ELSE FALSE END AS deleted
+        FROM (SELECT i, floor(rnd(i, 'person') * {people})::BIGINT AS person FROM range({args.patients}) t(i))
+        JOIN departments d ON d.idx = floor({departments} * pow(rnd(i, 'department'), {args.department_skew}))::INTEGER
+    """)
+
+    # Appointments in working hours, from `past_days` ago to `future_days` ahead
+    properties = ", ".join(
+        f"CASE WHEN rnd(i, 'property_{n}') < 0.15 THEN '{value}' END" for n, value in enumerate(APPOINTMENT_PROPERTIES)
+    )
+    connection.execute(f"""
+        CREATE TABLE appointment_slots AS
+        SELECT
+            i,
+            uid(i, 'appointment') AS appointment_id,
+            date_trunc('day', TIMESTAMP '{now:%Y-%m-%d %H:%M:%S}')
+                + to_days(floor(rnd(i, 'day') * {args.past_days + args.future_days})::INTEGER - {args.past_days})
+                + to_minutes(8 * 60 + 15 * floor(rnd(i, 'slot') * 36)::INTEGER) AS appointment_time,
+            d.department_id,
+            h.hospital_id,
+            list_filter([{properties}], p -> p IS NOT NULL) AS properties,
+            rnd(i, 'assigned') AS assigned_draw,
+            rnd(i, 'assign_at') AS assign_at_draw
+        FROM range({args.appointments}) t(i)
+        JOIN departments d ON d.idx = floor({departments} * pow(rnd(i, 'department'), {args.department_skew}))::INTEGER
+        JOIN hospitals h ON h.idx = floor(rnd(i, 'hospital') * {hospitals})::INTEGER
+    """)
+
+    # Only a patient's latest referral can still be waiting, pair assigned appointments with them per department
+    connection.execute(f"""
+        CREATE TABLE latest AS
+        SELECT waitlist_id, department_id,
+               row_number() OVER (PARTITION BY department_id ORDER BY hash(waitlist_id, {args.seed})) AS rn
+        FROM (
+            SELECT *, row_number() OVER (PARTITION BY medical_number ORDER BY referral_date DESC) AS referral_rank
+            FROM referrals
+        )
+        WHERE referral_rank = 1 AND NOT deleted
+    """)
+    connection.execute(f"""
+        CREATE TABLE assignments AS
+        WITH wanted AS (
+            SELECT appointment_id, department_id, appointment_time < TIMESTAMP '{now:%Y-%m-%d %H:%M:%S}' AS past,
+                   row_number() OVER (PARTITION BY department_id ORDER BY hash(appointment_id, {args.seed})) AS rn
+            FROM appointment_slots
+            WHERE assigned_draw < CASE WHEN appointment_time < TIMESTAMP '{now:%Y-%m-%d %H:%M:%S}'
+                                       THEN 0.9 ELSE {args.assigned_rate} END
+        )
+        SELECT wanted.appointment_id, latest.waitlist_id, wanted.past,
+               'clinician' || floor(rnd(hash(wanted.appointment_id), 'assigner') * {args.users})::INTEGER || '@medical.uk' AS assigner_email
+        FROM wanted JOIN latest USING (department_id, rn)
+    """)
+
+    connection.execute(f"""
+        CREATE TABLE waitlist AS
+        SELECT
+            r.waitlist_id,
+            r.medical_number,
+            r.date_of_birth,
+            r.postcode,
+            r.department_id,
+            r.referral_notes,
+            r.referral_date,
+            CASE WHEN len(history) > 0 THEN to_json(history) END AS medical_history,
+            CASE WHEN graded THEN urgency(rnd(r.i, 'urgency')) END AS clinical_urgency,
+            CASE WHEN graded THEN CASE WHEN rnd(r.i, 'correlated') < 0.6 THEN urgency(rnd(r.i, 'urgency'))
+                                       ELSE urgency(rnd(r.i, 'severity')) END END AS condition_severity,
+            CASE WHEN graded THEN round(pow(rnd(r.i, 'comorbidities'), 2), 2) END AS comorbidities,
+            CASE WHEN graded THEN 'Synthetic grading for load testing.' END AS agent_justification,
+            CASE WHEN graded AND rnd(r.i, 'edited') < 0.02 THEN r.referral_date + INTERVAL 1 DAY END AS edited_at,
+            r.referral_rank > 1 OR coalesce(a.past, FALSE) AS is_seen,
+            CASE WHEN graded THEN 'COMPLETED'
+                 WHEN r.grading_draw < {args.graded_rate + (1 - args.graded_rate) / 2} THEN NULL
+                 WHEN r.grading_draw < {args.graded_rate + (1 - args.graded_rate) * 0.8} THEN 'FAILED'
+                 ELSE 'GRADING' END AS grading_status,
+            CASE WHEN r.grading_draw < {args.graded_rate + (1 - args.graded_rate) / 2} AND NOT graded THEN NULL
+                 ELSE r.referral_date + INTERVAL 1 HOUR END AS graded_at,
+            a.waitlist_id IS NOT NULL AS is_assigned,
+            CASE WHEN len(r.preference_entries) > 0 THEN to_json(map_from_entries(r.preference_entries)) END AS preferences,
+            CASE WHEN r.deleted THEN r.referral_date + INTERVAL 7 DAY END AS deleted_at,
+            CASE WHEN r.deleted THEN 'Duplicate referral' END AS delete_reason,
+            r.prefers_evening,
+            CASE WHEN rnd(r.i, 'no_response') < 0.1 THEN 1 + floor(rnd(r.i, 'no_response_count') * 3)::BIGINT ELSE 0 END AS no_response_count
+        FROM (
+            SELECT *,
+                   grading_draw < {args.graded_rate} AS graded,
+                   row_number() OVER (PARTITION BY medical_number ORDER BY referral_date DESC) AS referral_rank,
+                   list({{'date': strftime(referral_date, '%Y-%m-%d'), 'notes': referral_notes}}) OVER (
+                       PARTITION BY medical_number ORDER BY referral_date DESC
+                       ROWS BETWEEN 1 FOLLOWING AND UNBOUNDED FOLLOWING
+                   ) AS history
+            FROM referrals
+        ) r
+        LEFT JOIN assignments a ON a.waitlist_id = r.waitlist_id
+    """)
+
+    connection.execute(f"""
+        CREATE TABLE appointments AS
+        SELECT
+            s.appointment_id,
+            s.appointment_time,
+            a.waitlist_id,
+            s.department_id,
+            s.hospital_id,
+            a.assigner_email,
+            CASE WHEN len(s.properties) > 0 THEN to_json(s.properties) END AS properties,
+            CASE WHEN a.waitlist_id IS NULL AND s.appointment_time >= TIMESTAMP '{now:%Y-%m-%d %H:%M:%S}' AND s.assign_at_draw < 0.5
+                 THEN s.appointment_time - INTERVAL 2 DAY END AS assign_at,
+            NULL::TIMESTAMP AS deleted_at,
+            NULL::VARCHAR AS delete_reason
+        FROM appointment_slots s
+        LEFT JOIN assignments a USING (appointment_id)
+    """)
+
+    # Rejections of open future appointments by waiting patients in the same department
+    connection.execute(f"""
+        CREATE TABLE open_slots AS
+        SELECT appointment_id, department_id, (row_number() OVER (ORDER BY appointment_id) - 1)::INTEGER AS idx
+        FROM appointments
+        WHERE waitlist_id IS NULL AND appointment_time >= TIMESTAMP '{now:%Y-%m-%d %H:%M:%S}'
+    """)
+    open_slots = connection.execute("SELECT COUNT(*) FROM open_slots").fetchone()[0]
+    connection.execute(f"""
+        CREATE TABLE rejected_appointments AS
+        WITH department_sizes AS (SELECT department_id, COUNT(*) AS size FROM latest GROUP BY department_id),
+        draws AS (
+            SELECT o.appointment_id, o.department_id, 1 + floor(rnd(i, 'rejector') * s.size)::INTEGER AS rn
+            FROM range({args.rejections}) t(i)
+            JOIN open_slots o ON o.idx = floor(rnd(i, 'rejected_slot') * {open_slots})::INTEGER
+            JOIN department_sizes s USING (department_id)
+        )
+        SELECT DISTINCT d.appointment_id, l.waitlist_id
+        FROM draws d
+        JOIN latest l USING (department_id, rn)
+    """)
+
+    return {table: connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in OUTPUT_TABLES}
+
+
+# Tables written out, with their columns in bq-schema.txt order
+OUTPUT_TABLES = {
+    "departments": "department_id, department_name",
+    "hospitals": "hospital_id, hospital_name, address_line1, address_line2, city, county, postcode",
+    "users": "email",
+    "waitlist": "waitlist_id, medical_number, date_of_birth, postcode, department_id, referral_notes, referral_date, "
+                "medical_history, clinical_urgency, condition_severity, comorbidities, agent_justification, edited_at, "
+                "is_seen, grading_status, graded_at, is_assigned, preferences, deleted_at, delete_reason, "
+                "prefers_evening, no_response_count",
+    "appointments": "appointment_id, appointment_time, waitlist_id, department_id, hospital_id, assigner_email, "
+                    "properties, assign_at, deleted_at, delete_reason",
+    "rejected_appointments": "appointment_id, waitlist_id",
+}
+
+
+def write(connection, output: str, file_format: str) -> dict[str, str]:
+    extension, options = _FORMATS[file_format]
+    os.makedirs(output, exist_ok=True)
+
+    paths = {}
+    for table, columns in OUTPUT_TABLES.items():
+        path = os.path.join(output, f"{table}.{extension}")
+        connection.execute(f"COPY (SELECT {columns} FROM {table}) TO '{path}' ({options})")
+        paths[table] = path
+
+    return paths
+
+
+def _weights(value: str) -> tuple[float, float, float]:
+    weights = tuple(float(weight) for weight in value.split(","))
+    if len(weights) != 3 or abs(sum(weights) - 1) > 1e-6:
+        raise argparse.ArgumentTypeError("expected three weights for high,medium,low summing to 1, e.g. 0.1,0.3,0.6")
+    return weights
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=10_000, help="Number of waitlist rows (referrals)")
+    parser.add_argument("--appointments", type=int, help="Number of appointments, defaults to a tenth of --patients")
+    parser.add_argument("--rejections", type=int, help="Rejections to draw, defaults to half of --appointments")
+    parser.add_argument("--referrals-per-patient", type=float, default=1.25,
+                        help="Average referrals per medical_number, above 1 gives repeat patients with history")
+    parser.add_argument("--urgency-weights", type=_weights, default=(0.1, 0.3, 0.6),
+                        help="Share of high, medium and low clinical urgency among graded patients")
+    parser.add_argument("--department-skew", type=float, default=1.5,
+                        help="1 spreads referrals evenly over departments, higher values favour the first few")
+    parser.add_argument("--graded-rate", type=float, default=0.9, help="Share of referrals already graded")
+    parser.add_argument("--assigned-rate", type=float, default=0.3, help="Share of future appointments already assigned")
+    parser.add_argument("--days", type=int, default=365, help="Referral dates span this many days before --now")
+    parser.add_argument("--past-days", type=int, default=30)
+    parser.add_argument("--future-days", type=int, default=60)
+    parser.add_argument("--users", type=int, default=20, help="Number of clinician accounts assigning appointments")
+    parser.add_argument("--now", type=datetime.fromisoformat, default=datetime.now().replace(minute=0, second=0, microsecond=0))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--format", choices=sorted(_FORMATS), default="parquet")
+    parser.add_argument("--frontend-public", default=FRONTEND_PUBLIC, help="Directory holding departments.json and hospitals.json")
+    parser.add_argument("--output", default="data")
+    return parser
+
+
+def run(args) -> tuple[dict[str, int], dict[str, str]]:
+    """Generate and write a dataset, returning the row count and file path per table"""
+    import duckdb
+
+    args.appointments = args.appointments if args.appointments is not None else max(1, args.patients // 10)
+    args.rejections = args.rejections if args.rejections is not None else args.appointments // 2
+
+    connection = duckdb.connect()
+    counts = generate(connection, args)
+    return counts, write(connection, args.output, args.format)
+
+
+def main():
+    start = time.perf_counter()
+    counts, paths = run(build_parser().parse_args())
+
+    for table, count in counts.items():
+        print(f"{count:>12,} {table:<24} {paths[table]}")
+    print(f"Generated in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+End-to-end latency of the matching and listing hot paths as the dataset grows.
+
+For every size, a synthetic dataset is generated (see benchmarks.generate_data, cached between runs) and the
+middleware is started in a fresh process on the local DuckDB backend, with stub agents, routing and secrets
+(see benchmarks.stubs). Requests go through the full FastAPI stack in-process, one at a time, to:
+
+    GET /waitlist/                      GET /appointments/
+    GET /match/get-candidates           GET /match/automatic-assignment
+
+Each endpoint reports p50/p95/p99 latency, queries per request and resident memory. Results can be saved as a
+baseline and later runs compared against it, exiting with status 1 if any endpoint regressed:
+
+    python -m benchmarks.hot_paths --sizes 10000 100000 --save-baseline
+    python -m benchmarks.hot_paths --sizes 10000 100000
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import generate_data, stubs
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+RESULT_MARKER = "BENCHMARK_RESULT "
+FAR_FUTURE = "2999-01-01 00:00:00"
+
+
+def _percentile(values: list[float], percentile: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(percentile / 100 * len(ordered)) - 1))]
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+
+
+def _count_queries(query_client) -> dict:
+    """Count every query the repositories run through `query_client`"""
+    counter = {"queries": 0}
+
+    for name in ("run_query", "run_dml"):
+        original = getattr(query_client, name)
+
+        async def counted(*args, _original=original, **kwargs):
+            counter["queries"] += 1
+            return await _original(*args, **kwargs)
+
+        setattr(query_client, name, counted)
+
+    return counter
+
+
+async def _measure(client, counter: dict, requests: list[tuple[str, dict]], warmup: int) -> dict:
+    latencies, queries = [], []
+
+    for n, (path, params) in enumerate(requests):
+        before = counter["queries"]
+        start = time.perf_counter()
+        response = await client.get(path, params=params)
+        elapsed = time.perf_counter() - start
+
+        if response.status_code >= 400:
+            raise RuntimeError(f"GET {path} {params} returned {response.status_code}: {response.text[:200]}")
+        if n >= warmup:
+            latencies.append(elapsed * 1000)
+            queries.append(counter["queries"] - before)
+
+    return {
+        "requests": len(latencies),
+        "p50_ms": round(_percentile(latencies, 50), 2),
+        "p95_ms": round(_percentile(latencies, 95), 2),
+        "p99_ms": round(_percentile(latencies, 99), 2),
+        "mean_ms": round(sum(latencies) / len(latencies), 2),
+        "queries_per_request": round(sum(queries) / len(queries), 2),
+        "rss_mb": round(_rss_mb(), 1)
+    }
+
+
+async def _run_endpoints(args) -> dict:
+    """Runs inside the benchmark process, with the environment prepared by `_run_size`"""
+    import httpx
+    import main
+    from api.utils import get_query_client
+    from api.utils.local_query_client import local_table_name
+
+    stub_services = stubs.install(main.app, args.agent_latency_ms / 1000, args.routing_latency_ms / 1000)
+
+    start = time.perf_counter()
+    query_client = get_query_client()
+    load_seconds = time.perf_counter() - start
+    connection = query_client.connection
+    appointments = local_table_name("appointments")
+
+    # Park every open appointment so automatic assignment only picks up the slots each round releases
+    connection.execute(f"""
+        UPDATE "{appointments}" SET assign_at = TIMESTAMP '{FAR_FUTURE}'
+        WHERE waitlist_id IS NULL AND appointment_time >= current_localtimestamp()
+    """)
+    # Soonest first, so get-candidates also covers slots within a day, which rank candidates by travel distance
+    open_slots = [row[0] for row in connection.execute(f"""
+        SELECT appointment_id FROM "{appointments}"
+        WHERE waitlist_id IS NULL AND appointment_time >= current_localtimestamp()
+        ORDER BY appointment_time < current_localtimestamp() + INTERVAL 1 DAY DESC, hash(appointment_id)
+    """).fetchall()]
+    departments = [row[0] for row in connection.execute(
+        f'SELECT department_id FROM "{local_table_name("departments")}" ORDER BY department_id').fetchall()]
+
+    candidate_slots = open_slots[:args.iterations + args.warmup]
+    assignment_rounds = [open_slots[len(candidate_slots) + n * args.slots_per_round:][:args.slots_per_round]
+                         for n in range(args.assignment_rounds)]
+
+    counter = _count_queries(query_client)
+    results = {}
+
+    def cycle(variants: list[dict]) -> list[dict]:
+        return [variants[n % len(variants)] for n in range(args.iterations + args.warmup)]
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        results["GET /waitlist/"] = await _measure(client, counter, [("/waitlist/", params) for params in cycle([
+            {}, {"department_id": departments[0]}, {"page": 5}, {"min_clinical_urgency": 3}, {"medical_number": "100000"}
+        ])], args.warmup)
+
+        results["GET /appointments/"] = await _measure(client, counter, [("/appointments/", params) for params in cycle([
+            {}, {"status": 1}, {"department_id": departments[0]}, {"page": 3}
+        ])], args.warmup)
+
+        results["GET /match/get-candidates"] = await _measure(client, counter, [
+            ("/match/get-candidates", {"appointment_id": appointment_id, "limit": 5}) for appointment_id in candidate_slots
+        ], args.warmup)
+
+        # Each round releases a fresh batch of slots for automatic assignment
+        rounds = []
+        for slots in assignment_rounds:
+            connection.execute(f'UPDATE "{appointments}" SET assign_at = NULL WHERE appointment_id IN (SELECT unnest(?))', [slots])
+            rounds.append(await _measure(client, counter, [("/match/automatic-assignment", {})], 0))
+
+        if rounds:
+            latencies = [r["mean_ms"] for r in rounds]
+            results["GET /match/automatic-assignment"] = {
+                "requests": len(rounds),
+                "slots_per_request": args.slots_per_round,
+                "p50_ms": round(_percentile(latencies, 50), 2),
+                "p95_ms": round(_percentile(latencies, 95), 2),
+                "p99_ms": round(_percentile(latencies, 99), 2),
+                "mean_ms": round(sum(latencies) / len(latencies), 2),
+                "queries_per_request": round(sum(r["queries_per_request"] for r in rounds) / len(rounds), 2),
+                "rss_mb": rounds[-1]["rss_mb"]
+            }
+
+    return {
+        "endpoints": results,
+        "load_seconds": round(load_seconds, 2),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "agent_calls": stub_services["agent"].calls,
+        "routing_calls": stub_services["routing"].calls
+    }
+
+
+def _dataset(size: int, args) -> str:
+    """Directory holding the dataset for `size` patients, generated on first use"""
+    directory = os.path.join(args.data_root, f"patients-{size}-seed-{args.seed}")
+    if not os.path.exists(os.path.join(directory, "waitlist.parquet")):
+        print(f"Generating {size:,} patients into {directory}", file=sys.stderr)
+        generate_data.run(generate_data.build_parser().parse_args([
+            "--patients", str(size), "--seed", str(args.seed), "--output", directory
+        ]))
+    return directory
+
+
+def _run_size(size: int, args) -> dict:
+    env = {
+        **os.environ,
+        "QUERY_BACKEND": "duckdb",
+        "LOCAL_DATA_DIR": _dataset(size, args),
+        "LOCAL_DATABASE_PATH": ":memory:",
+        "STATE_BACKEND": "memory",
+        "SCHEDULER_MODE": "external",
+        # Keep background shortlist rebuilds out of the measured requests
+        "SHORTLIST_REFRESH_DELAY_SECONDS": "3600",
+    }
+    for name in ["departments", "hospitals", "waitlist", "appointments", "rejected_appointments", "job_state", "users"]:
+        env.setdefault(f"{name.upper()}_TABLE", name)
+    env.setdefault("BQ_PROJECT_ID", "benchmark")
+    env.setdefault("PROJECT_DATASET", "benchmark")
+
+    command = [sys.executable, "-m", "benchmarks.hot_paths", "--child",
+               "--iterations", str(args.iterations), "--warmup", str(args.warmup),
+               "--assignment-rounds", str(args.assignment_rounds), "--slots-per-round", str(args.slots_per_round),
+               "--agent-latency-ms", str(args.agent_latency_ms), "--routing-latency-ms", str(args.routing_latency_ms)]
+    completed = subprocess.run(command, env=env, capture_output=True, text=True,
+                               cwd=os.path.join(os.path.dirname(__file__), ".."))
+
+    for line in completed.stdout.splitlines():
+        if line.startswith(RESULT_MARKER):
+            return json.loads(line[len(RESULT_MARKER):])
+
+    raise RuntimeError(f"Benchmark for {size} patients failed:\n{completed.stderr[-4000:]}")
+
+
+def compare(results: dict, baseline: dict, tolerance: float, min_delta_ms: float) -> list[str]:
+    """Describe every endpoint whose p95 latency or query count got worse than the baseline"""
+    regressions = []
+
+    for size, result in results.items():
+        for endpoint, current in result["endpoints"].items():
+            previous = baseline.get(size, {}).get("endpoints", {}).get(endpoint)
+            if previous is None:
+                continue
+
+            if (current["p95_ms"] > previous["p95_ms"] * (1 + tolerance)
+                    and current["p95_ms"] - previous["p95_ms"] > min_delta_ms):
+                regressions.append(f"{endpoint} at {int(size):,} patients: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+            if current["queries_per_request"] > previous["queries_per_request"]:
+                regressions.append(f"{endpoint} at {int(size):,} patients: queries per request "
+                                   f"{previous['queries_per_request']} -> {current['queries_per_request']}")
+
+    return regressions
+
+
+def _print_results(results: dict):
+    print(f"{'patients':>10}  {'endpoint':<34} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8} {'rss MB':>8}")
+    for size, result in results.items():
+        for endpoint, stats in result["endpoints"].items():
+            print(f"{int(size):>10,}  {endpoint:<34} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} "
+                  f"{stats['queries_per_request']:>8.2f} {stats['rss_mb']:>8.1f}")
+        print(f"{'':>10}  load {result['load_seconds']}s, peak rss {result['peak_rss_mb']} MB, "
+              f"{result['agent_calls']} agent calls, {result['routing_calls']} routing calls")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000], help="Dataset sizes, in patients")
+    parser.add_argument("--iterations", type=int, default=50, help="Measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=3, help="Unmeasured requests per endpoint")
+    parser.add_argument("--assignment-rounds", type=int, default=3)
+    parser.add_argument("--slots-per-round", type=int, default=20, help="Appointments released per automatic assignment")
+    parser.add_argument("--agent-latency-ms", type=float, default=0, help="Simulated latency of each agent call")
+    parser.add_argument("--routing-latency-ms", type=float, default=0, help="Simulated latency of each routing call")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--data-root", default=os.path.join(tempfile.gettempdir(), "mws-benchmark-data"))
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative p95 slowdown before flagging")
+    parser.add_argument("--min-delta-ms", type=float, default=5, help="Ignore p95 slowdowns smaller than this")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # The app logs agent sessions to stdout, keep them out of the result
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = asyncio.run(_run_endpoints(args))
+        print(RESULT_MARKER + json.dumps(result))
+        return
+
+    results = {str(size): _run_size(size, args) for size in args.sizes}
+    _print_results(results)
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+        print(f"\nSaved baseline to {args.baseline}")
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance, args.min_delta_ms)
+
+        if regressions:
+            print("\nRegressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nNo regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
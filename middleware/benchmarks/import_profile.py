@@ -0,0 +1,71 @@
+"""
+Report what importing the app costs at cold start, using `python -X importtime`.
+
+Prints the slowest top-level imports and whether any heavy SDK (BigQuery, Secret Manager, Vertex AI,
+Google Maps, Firebase) was imported before the first request. Run from the middleware directory with the
+app's environment set (see .env.example):
+
+    python -m benchmarks.import_profile --top 25
+"""
+import argparse
+import subprocess
+import sys
+
+# SDKs that should only be imported when a request actually needs them
+HEAVY_MODULES = [
+    "google.cloud.bigquery",
+    "google.cloud.secretmanager",
+    "vertexai",
+    "googlemaps",
+    "firebase_admin",
+]
+
+
+def profile(module: str) -> list[dict]:
+    """Import `module` in a fresh interpreter and return `{module, self_us, cumulative_us, depth}` per import"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        imports.append({
+            "module": name.strip(),
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+            "depth": (len(name) - len(name.lstrip())) // 2
+        })
+
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main", help="Module to import, defaults to the app")
+    parser.add_argument("--top", type=int, default=20, help="Number of imports to list")
+    args = parser.parse_args()
+
+    imports = profile(args.module)
+    total_us = sum(i["cumulative_us"] for i in imports if i["depth"] == 0)
+    # Imports made directly by the interpreter or the module under test, nested ones are included in these
+    direct = sorted((i for i in imports if i["depth"] <= 1 and i["module"] != args.module),
+                    key=lambda i: i["cumulative_us"], reverse=True)
+
+    print(f"Importing {args.module}: {total_us / 1000:.1f} ms across {len(imports)} modules\n")
+    print(f"{'cumulative ms':>14} {'self ms':>10}  module")
+    for i in direct[:args.top]:
+        print(f"{i['cumulative_us'] / 1000:>14.1f} {i['self_us'] / 1000:>10.1f}  {i['module']}")
+
+    imported = {i["module"] for i in imports}
+    eager = [name for name in HEAVY_MODULES if name in imported]
+    print()
+    print(f"Heavy SDKs imported at startup: {', '.join(eager)}" if eager else "No heavy SDKs imported at startup")
+
+
+if __name__ == "__main__":
+    main()
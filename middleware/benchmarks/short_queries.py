@@ -0,0 +1,122 @@
+"""
+Compare the latency of representative repository reads with and without BigQuery's short query mode.
+
+Runs each lookup against the configured BigQuery dataset, alternating between job creation "required" (a job is
+created and polled for every query) and "optional" (see QUERY_JOB_CREATION_MODE), and prints p50/p95 latency per
+mode and how many of the optional-mode reads actually ran without a job:
+
+    HospitalsRepository.query_hospital_postcode        MatchRepository.can_manually_assign_appointment
+    WaitlistRepository._get_patient_data               DepartmentsRepository.query_departments
+
+It needs BigQuery credentials and hasn't been run against a real dataset yet, so no results are recorded. Run from
+the middleware directory, with the same environment the app needs (see .env.example):
+
+    python -m benchmarks.short_queries --iterations 50
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+
+def _percentile(values: list[float], percentile: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(percentile / 100 * len(ordered)) - 1))]
+
+
+def _read_counts() -> dict[str, int]:
+    """Reads run so far by mode, from the client's histogram"""
+    from api.utils import Metrics
+
+    counts = {}
+    for line in Metrics().render().splitlines():
+        if line.startswith("mws_bigquery_read_duration_seconds_count"):
+            mode = line.split('mode="')[1].split('"')[0]
+            counts[mode] = int(float(line.split()[-1]))
+    return counts
+
+
+async def _sample_ids(client) -> dict[str, str]:
+    import api.config.project
+
+    rows = await client.run_query(f"""
+        SELECT
+            (SELECT hospital_id FROM {api.config.project.HOSPITALS_FQTN} LIMIT 1) AS hospital_id,
+            (SELECT appointment_id FROM {api.config.project.APPOINTMENTS_FQTN} LIMIT 1) AS appointment_id,
+            (SELECT waitlist_id FROM {api.config.project.WAITLIST_FQTN} WHERE NOT is_seen AND deleted_at IS NULL LIMIT 1) AS waitlist_id
+    """)
+    return rows[0]
+
+
+async def run(args) -> dict:
+    from api.repositories import DepartmentsRepository, HospitalsRepository, MatchRepository, WaitlistRepository
+    from api.utils import BigQueryClient
+
+    client = BigQueryClient()
+    ids = await _sample_ids(client)
+
+    lookups = {
+        "query_hospital_postcode": lambda: HospitalsRepository().query_hospital_postcode(ids["hospital_id"]),
+        "can_manually_assign_appointment": lambda: MatchRepository().can_manually_assign_appointment(ids["appointment_id"]),
+        "_get_patient_data": lambda: WaitlistRepository()._get_patient_data(ids["waitlist_id"]),
+        "query_departments": lambda: DepartmentsRepository().query_departments(),
+    }
+
+    results = {}
+    for name, lookup in lookups.items():
+        latencies = {"required": [], "optional": []}
+
+        # Warm up the connection and BigQuery's result cache for both modes before measuring
+        for optional in (False, True):
+            client.job_creation_optional = optional
+            await lookup()
+
+        before = _read_counts()
+        # Interleaved, so both modes see the same network conditions
+        for _ in range(args.iterations):
+            for mode in ("required", "optional"):
+                client.job_creation_optional = mode == "optional"
+                start = time.perf_counter()
+                await lookup()
+                latencies[mode].append(time.perf_counter() - start)
+        after = _read_counts()
+
+        results[name] = {
+            mode: {
+                "p50_ms": round(statistics.median(values) * 1000, 2),
+                "p95_ms": round(_percentile(values, 95) * 1000, 2)
+            } for mode, values in latencies.items()
+        }
+        # Required-mode reads are all counted as "job", so optional-mode jobs are the difference
+        results[name]["optional"]["jobless"] = after.get("jobless", 0) - before.get("jobless", 0)
+        results[name]["optional"]["fallback"] = after.get("fallback", 0) - before.get("fallback", 0)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50, help="Runs of each lookup per mode")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    load_dotenv()
+    results = asyncio.run(run(args))
+
+    print(f"{'lookup':<34} {'job p50':>9} {'job p95':>9} {'short p50':>10} {'short p95':>10} {'speedup':>8} {'jobless':>8} {'fallback':>9}")
+    for name, result in results.items():
+        required, optional = result["required"], result["optional"]
+        speedup = required["p50_ms"] / optional["p50_ms"] if optional["p50_ms"] else float("inf")
+        print(f"{name:<34} {required['p50_ms']:>9.1f} {required['p95_ms']:>9.1f} {optional['p50_ms']:>10.1f} "
+              f"{optional['p95_ms']:>10.1f} {speedup:>7.2f}x {optional['jobless']:>4}/{args.iterations:<3} {optional['fallback']:>9}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+In-process stand-ins for the external services the middleware calls (Vertex AI agents, the Google Maps routing
+API, Secret Manager and Firebase auth), so benchmarks measure the middleware itself. Each stub can sleep to
+simulate the real service's latency.
+"""
+import json
+import sys
+import time
+import types
+import uuid
+import zlib
+
+
+class StubAgent:
+    """Answers like the grading and preference-ranking agents, with deterministic scores and rankings"""
+
+    def __init__(self, latency_seconds: float):
+        self.latency_seconds = latency_seconds
+        self.calls = 0
+
+    def create_session(self, user_id: str):
+        return {"id": uuid.uuid4().hex}
+
+    def delete_session(self, user_id: str, session_id: str):
+        pass
+
+    def stream_query(self, user_id: str, session_id: str, message: str):
+        self.calls += 1
+        time.sleep(self.latency_seconds)
+        data = json.loads(message)
+
+        if "candidates" in data:
+            # Preference ranking: keep a stable but non-trivial order
+            ranked = sorted(data["candidates"], key=lambda c: zlib.crc32(c["waitlist_id"].encode()))
+            yield {"content": {"parts": [{"text": json.dumps({
+                "status": "success",
+                "rankings": [{"waitlist_id": c["waitlist_id"], "rank": rank + 1, "reasoning": "Stub ranking"}
+                             for rank, c in enumerate(ranked)]
+            })}]}}
+            return
+
+        seed = zlib.crc32(message.encode())
+        for author, score in [("urgency_grader", 1 + seed % 3), ("condition_grader", 1 + seed // 3 % 3),
+                              ("comorbidities_grader", seed % 100 / 100)]:
+            yield {"author": author, "content": {"parts": [{"text": f"SCORE: {score} JUSTIFICATION: Stub {author}"}]}}
+
+
+class StubAgentEngines:
+    """Replaces `vertexai.agent_engines`"""
+
+    def __init__(self, latency_seconds: float):
+        self.agent = StubAgent(latency_seconds)
+
+    def get(self, resource_id: str) -> StubAgent:
+        return self.agent
+
+
+class StubSecrets:
+    def get_secret(self, secret_name: str):
+        return f"stub-{secret_name}"
+
+
+def _stub_googlemaps(latency_seconds: float):
+    """A `googlemaps` module whose distance matrix returns a deterministic distance per postcode pair"""
+    module = types.ModuleType("googlemaps")
+    module.exceptions = types.SimpleNamespace(ApiError=type("ApiError", (Exception,), {}))
+    module.calls = 0
+
+    class Client:
+        def __init__(self, key: str = None):
+            pass
+
+        def distance_matrix(self, origins, destinations, **kwargs):
+            module.calls += 1
+            time.sleep(latency_seconds)
+            distance = 1000 + zlib.crc32(f"{origins}|{destinations}".encode()) % 50000
+            return {"status": "OK", "rows": [{"elements": [{"status": "OK", "distance": {"value": distance}}]}]}
+
+    module.Client = Client
+    return module
+
+
+def install(app, agent_latency_seconds: float = 0.0, routing_latency_seconds: float = 0.0) -> dict:
+    """
+    Swap every external service for a stub. Must run before the first request, as services are built on first use.
+    Returns the stubs so callers can read their call counts.
+    """
+    from api.repositories import waitlist_repo
+    from api.services import AuthService, Secrets
+    from api.utils.container import Container
+
+    agent_engines = StubAgentEngines(agent_latency_seconds)
+    waitlist_repo._agent_engines = lambda: agent_engines
+
+    googlemaps = _stub_googlemaps(routing_latency_seconds)
+    sys.modules["googlemaps"] = googlemaps
+
+    Container().register(Secrets, lambda c: StubSecrets())
+
+    identity = {"identity": "benchmark", "email": "benchmark@medical.uk"}
+    app.dependency_overrides[AuthService.get_current_user_or_service] = lambda: identity
+    app.dependency_overrides[AuthService.get_programmatic_access] = lambda: identity
+
+    return {"agent": agent_engines.agent, "routing": googlemaps}
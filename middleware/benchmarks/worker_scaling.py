@@ -0,0 +1,113 @@
+"""
+Measure requests per second as the number of gunicorn workers grows.
+
+Starts the middleware once per worker count with a shared STATE_BACKEND (sqlite by default, so caches,
+leases and job leases are shared between workers), drives it with concurrent requests and prints
+throughput and latency for each run.
+
+Run from the middleware directory, with the same environment the app needs (see .env.example):
+
+    python -m benchmarks.worker_scaling --workers 1 2 4 --path /hospitals/ --requests 2000 --concurrency 64
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+
+async def _drive(url: str, total: int, concurrency: int, headers: dict):
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(timeout=60) as client:
+        async def _request():
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(url, headers=headers)
+                    if response.status_code >= 500:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[_request() for _ in range(total)])
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "errors": errors
+    }
+
+
+async def _wait_until_ready(base_url: str, timeout_seconds: float = 60):
+    deadline = time.monotonic() + timeout_seconds
+    async with httpx.AsyncClient(timeout=2) as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(base_url + "/")
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.25)
+    raise TimeoutError(f"Server at {base_url} did not start within {timeout_seconds}s")
+
+
+def run(workers: int, args) -> dict:
+    port = args.port
+    env = {**os.environ, "STATE_BACKEND": args.state_backend}
+    if args.state_backend == "sqlite":
+        env.setdefault("STATE_SQLITE_PATH", os.path.join(tempfile.gettempdir(), "mws-benchmark-state.sqlite3"))
+
+    server = subprocess.Popen([
+        sys.executable, "-m", "gunicorn",
+        "--workers", str(workers),
+        "--worker-class", "uvicorn.workers.UvicornWorker",
+        "--bind", f"127.0.0.1:{port}",
+        "--log-level", "warning",
+        "main:app"
+    ], env=env)
+
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        asyncio.run(_wait_until_ready(base_url))
+
+        headers = {"x-api-key": args.api_key} if args.api_key else {}
+        # Warm every worker up before measuring
+        asyncio.run(_drive(base_url + args.path, workers * 20, workers * 4, headers))
+        return asyncio.run(_drive(base_url + args.path, args.requests, args.concurrency, headers))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--path", default="/hospitals/", help="Endpoint to benchmark, sent with --api-key")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--state-backend", default="sqlite", choices=["memory", "sqlite", "redis"])
+    parser.add_argument("--api-key", default=os.environ.get("BENCHMARK_API_KEY"), help="Sent as x-api-key for authenticated endpoints")
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'req/s':>10} {'p50 ms':>10} {'p95 ms':>10} {'errors':>8}")
+    for workers in args.workers:
+        result = run(workers, args)
+        print(f"{workers:>8} {result['rps']:>10.1f} {result['p50_ms']:>10.2f} {result['p95_ms']:>10.2f} {result['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
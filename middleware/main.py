@@ -2,15 +2,45 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-import firebase_admin
-from api.routes import waitlist, match, appointments, departments, hospitals, rejected_appointments, dashboard, auth
+from api.routes import waitlist, match, appointments, departments, hospitals, rejected_appointments, dashboard, auth, scheduler, metrics
+from api.services import register_jobs, register_services
+from api.utils.scheduler import Scheduler
+from api.utils.container import Container
+from api.utils.background import cancel_debounced, wait_for_background_tasks
+from api.utils.write_buffer import WriteBuffer
+from api.utils.instrumentation import InstrumentationMiddleware
+from api.utils.query_budget import QueryBudgetExceededError
+from api.config.scheduler import SCHEDULER_MODE, SHUTDOWN_TIMEOUT_SECONDS
 import os
 
-app = FastAPI()
 
-firebase_admin.initialize_app()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # In local mode the middleware runs its own recurring jobs instead of relying on Cloud Scheduler
+    if SCHEDULER_MODE == "local":
+        Scheduler().start()
+
+    yield
+
+    await Scheduler().stop()
+    # Debounced shortlist refreshes would otherwise sleep out their delay before anything is written, the
+    # shortlists are rebuilt on demand after the restart
+    cancel_debounced()
+    # Updates still waiting to be coalesced would otherwise be lost
+    await WriteBuffer().flush()
+    await wait_for_background_tasks(SHUTDOWN_TIMEOUT_SECONDS)
+    # Including those queued by the background tasks that just finished
+    await WriteBuffer().flush()
+
+
+app = FastAPI(lifespan=lifespan)
+
+register_services(Container())
+register_jobs(Scheduler())
 
 # Allow the frontend to access the API
 app.add_middleware(
@@ -22,8 +52,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+# Per-request query, agent and routing call counts and timings, see `/metrics`
+app.add_middleware(InstrumentationMiddleware)
+
 app.include_router(appointments.router, prefix="/appointments")
 app.include_router(waitlist.router, prefix="/waitlist")
 app.include_router(match.router, prefix="/match")
@@ -32,6 +66,14 @@ app.include_router(hospitals.router, prefix="/hospitals")
 app.include_router(rejected_appointments.router, prefix="/rejected-appointments")
 app.include_router(dashboard.router, prefix="/dashboard")
 app.include_router(auth.router, prefix="/auth")
+app.include_router(scheduler.router, prefix="/scheduler")
+app.include_router(metrics.router, prefix="/metrics")
+
+
+@app.exception_handler(QueryBudgetExceededError)
+async def query_budget_exceeded(request: Request, e: QueryBudgetExceededError):
+    # The same shape as an HTTPException, which is what the frontend reads errors from
+    return JSONResponse(status_code=400, content={"detail": str(e)})
 
 
 @app.get("/")
@@ -0,0 +1,76 @@
+"""
+The suite runs the middleware on the embedded DuckDB backend (QUERY_BACKEND=duckdb) with in-process state, filled
+with a small synthetic dataset (see benchmarks.generate_data), so it needs no network or Google credentials:
+
+    pip install pytest duckdb
+    python -m pytest
+
+Run from the middleware directory.
+"""
+import os
+
+# Set before anything imports api.config, which reads the environment once on import
+os.environ.update({
+    "QUERY_BACKEND": "duckdb",
+    "LOCAL_DATABASE_PATH": ":memory:",
+    "STATE_BACKEND": "memory",
+    "SCHEDULER_MODE": "external",
+    "SHORTLIST_REFRESH_DELAY_SECONDS": "3600",
+    "WRITE_BUFFER_WINDOW_SECONDS": "0",
+})
+for name in ["departments", "hospitals", "waitlist", "appointments", "rejected_appointments", "job_state", "users"]:
+    os.environ.setdefault(f"{name.upper()}_TABLE", name)
+os.environ.setdefault("BQ_PROJECT_ID", "test")
+os.environ.setdefault("PROJECT_DATASET", "test")
+
+import httpx
+import pytest
+
+from benchmarks import generate_data, stubs
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+def dataset(tmp_path_factory) -> str:
+    """A few hundred patients and their appointments, loaded into the local database once per run"""
+    from api.utils import get_query_client
+
+    directory = str(tmp_path_factory.mktemp("data"))
+    generate_data.run(generate_data.build_parser().parse_args([
+        "--patients", "300", "--appointments", "60", "--seed", "7", "--output", directory
+    ]))
+    get_query_client().load_directory(directory)
+    return directory
+
+
+@pytest.fixture
+def connection(dataset):
+    """The DuckDB connection behind the local query client, to arrange and check rows directly"""
+    from api.utils import get_query_client
+    return get_query_client().connection
+
+
+@pytest.fixture
+def app(dataset):
+    """
+    The application with its external services stubbed and authentication overridden. Overrides of the container
+    and of `app.dependency_overrides` made by a test are undone afterwards.
+    """
+    import main
+    from api.utils.container import Container
+
+    stubs.install(main.app)
+    yield main.app
+
+    main.app.dependency_overrides.clear()
+    Container().reset()
+
+
+@pytest.fixture
+async def client(app):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
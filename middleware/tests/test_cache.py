@@ -0,0 +1,110 @@
+from datetime import date, datetime
+from decimal import Decimal
+import asyncio
+import multiprocessing
+
+import pytest
+
+from api.utils.cache import MemoryCache, SQLiteCache
+from api.utils.leases import LeaseManager, LeaseUnavailableError
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request, tmp_path):
+    if request.param == "memory":
+        return MemoryCache("test")
+    return SQLiteCache("test", path=str(tmp_path / "state.sqlite3"))
+
+
+@pytest.fixture
+def leases(cache, monkeypatch):
+    manager = LeaseManager()
+    monkeypatch.setattr(manager, "_leases", cache)
+    return manager
+
+
+async def test_values_round_trip(cache):
+    value = {"at": datetime(2030, 3, 4, 9, 20), "on": date(2030, 3, 4), "score": Decimal("0.75"), "ids": ["a", "b"]}
+
+    await cache.set("value", value)
+
+    assert await cache.get("value") == value
+    assert await cache.get("missing", "default") == "default"
+
+
+async def test_set_expires_after_ttl(cache):
+    await cache.set("value", 1, ttl_seconds=0.05)
+    await asyncio.sleep(0.1)
+
+    assert await cache.get("value") is None
+
+
+async def test_incr_counts_from_one(cache):
+    assert [await cache.incr("counter") for _ in range(3)] == [1, 2, 3]
+
+
+async def test_acquire_is_refused_to_another_owner(cache):
+    assert await cache.acquire("appointment:a1", "first", ttl_seconds=60)
+
+    assert not await cache.acquire("appointment:a1", "second", ttl_seconds=60)
+    assert await cache.acquire("appointment:a1", "first", ttl_seconds=60)
+
+
+async def test_release_by_another_owner_keeps_the_lease(cache):
+    await cache.acquire("appointment:a1", "first", ttl_seconds=60)
+
+    await cache.release("appointment:a1", "second")
+    assert not await cache.acquire("appointment:a1", "second", ttl_seconds=60)
+
+    await cache.release("appointment:a1", "first")
+    assert await cache.acquire("appointment:a1", "second", ttl_seconds=60)
+
+
+async def test_expired_lease_can_be_taken(cache):
+    await cache.acquire("appointment:a1", "first", ttl_seconds=0.05)
+    await asyncio.sleep(0.1)
+
+    assert await cache.acquire("appointment:a1", "second", ttl_seconds=60)
+
+
+async def test_hold_releases_its_leases_afterwards(leases):
+    async with leases.hold(["appointment:a1", "waitlist:w1"]) as owner:
+        assert await leases._leases.get("appointment:a1") == owner
+
+    assert await leases.try_acquire("appointment:a1", "other", ttl_seconds=60)
+    assert await leases.try_acquire("waitlist:w1", "other", ttl_seconds=60)
+
+
+async def test_hold_fails_fast_and_releases_what_it_took(leases):
+    await leases.try_acquire("waitlist:w1", "other", ttl_seconds=60)
+
+    with pytest.raises(LeaseUnavailableError) as error:
+        async with leases.hold(["appointment:a1", "waitlist:w1"]):
+            pytest.fail("The block should not run while a lease is taken")
+
+    assert error.value.key == "waitlist:w1"
+    assert await leases.try_acquire("appointment:a1", "other", ttl_seconds=60)
+
+
+def _acquire_in_process(path: str, owner: str, start, results):
+    start.wait()
+    results.put((owner, asyncio.run(SQLiteCache("test", path=path).acquire("appointment:a1", owner, ttl_seconds=60))))
+
+
+def test_sqlite_lease_is_held_across_processes(tmp_path):
+    context = multiprocessing.get_context("spawn")
+    start, results = context.Event(), context.Queue()
+    workers = [
+        context.Process(target=_acquire_in_process, args=(str(tmp_path / "state.sqlite3"), f"worker-{i}", start, results))
+        for i in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    start.set()
+    for worker in workers:
+        worker.join(timeout=30)
+
+    acquired = [results.get(timeout=5) for _ in workers]
+    assert sum(ok for _, ok in acquired) == 1
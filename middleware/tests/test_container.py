@@ -0,0 +1,69 @@
+import pytest
+
+from api.utils.container import Container
+
+
+class Repository:
+    pass
+
+
+class Service:
+    def __init__(self, repo: Repository):
+        self.repo = repo
+
+
+@pytest.fixture
+def container():
+    container = Container()
+    container.register(Repository, lambda c: Repository())
+    container.register(Service, lambda c: Service(c.resolve(Repository)))
+    yield container
+    container.reset()
+
+
+def test_resolve_builds_each_singleton_once(container):
+    service = container.resolve(Service)
+
+    assert container.resolve(Service) is service
+    assert service.repo is container.resolve(Repository)
+
+
+def test_resolve_unregistered_type_raises(container):
+    class Unregistered:
+        pass
+
+    with pytest.raises(LookupError):
+        container.resolve(Unregistered)
+
+
+def test_override_applies_to_dependents_built_inside_the_block(container):
+    fake = Repository()
+
+    with container.override(Repository, fake):
+        assert container.resolve(Repository) is fake
+        assert container.resolve(Service).repo is fake
+
+    assert container.resolve(Repository) is not fake
+
+
+def test_nested_overrides_restore_the_outer_one(container):
+    outer, inner = Repository(), Repository()
+
+    with container.override(Repository, outer):
+        with container.override(Repository, inner):
+            assert container.resolve(Repository) is inner
+        assert container.resolve(Repository) is outer
+
+
+def test_register_replaces_a_built_singleton(container):
+    first = container.resolve(Repository)
+    container.register(Repository, lambda c: Repository())
+
+    assert container.resolve(Repository) is not first
+
+
+def test_dependency_is_stable_per_type(container):
+    dependency = container.dependency(Service)
+
+    assert container.dependency(Service) is dependency
+    assert dependency() is container.resolve(Service)
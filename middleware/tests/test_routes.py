@@ -0,0 +1,85 @@
+import pytest
+
+from api.repositories import AssignmentConflictError
+from api.services import AuthService, MatchService, WaitlistService
+from api.utils.container import Container
+from api.utils.local_query_client import local_table_name
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_waitlist_search_by_medical_number(client, connection):
+    medical_number, waitlist_id = connection.execute(f"""
+        SELECT medical_number, waitlist_id FROM "{local_table_name("waitlist")}"
+        WHERE NOT is_seen AND deleted_at IS NULL LIMIT 1
+    """).fetchone()
+
+    response = await client.get("/waitlist/", params={"medical_number": medical_number})
+
+    assert response.status_code == 200
+    assert waitlist_id in [patient["waitlist_id"] for patient in response.json()["results"]]
+
+
+async def test_patient_details_not_found(client):
+    response = await client.get("/waitlist/no-such-patient")
+
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Patient not found"}
+
+
+async def test_appointments_listing_pages_upcoming_appointments(client):
+    response = await client.get("/appointments/")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["page"] == 1
+    assert len(body["results"]) <= 20
+    assert body["total"] >= len(body["results"])
+
+
+async def test_template_resubmission_creates_nothing(client, connection):
+    department_id, hospital_id = connection.execute(
+        f'SELECT department_id, hospital_id FROM "{local_table_name("appointments")}" LIMIT 1'
+    ).fetchone()
+    template = {"start_date": "2030-03-04", "end_date": "2030-03-10", "slot_minutes": 20,
+                "sessions": [{"weekday": 1, "start_time": "09:00", "end_time": "10:00"}],
+                "department_id": department_id, "hospital_id": hospital_id}
+
+    first = await client.post("/appointments/template", json=template)
+    second = await client.post("/appointments/template", json=template)
+
+    assert first.status_code == 200 and len(first.json()["created"]) == 3
+    assert second.status_code == 200 and second.json()["created"] == []
+    assert sorted(second.json()["existing"]) == sorted(slot["appointment_id"] for slot in first.json()["created"])
+
+
+async def test_container_override_replaces_the_service_a_route_uses(client):
+    class FakeWaitlistService:
+        async def get_candidates(self, appointment_id: str, limit=5):
+            return [{"waitlist_id": "w1", "appointment_id": appointment_id}]
+
+    with Container().override(WaitlistService, FakeWaitlistService()):
+        response = await client.get("/match/get-candidates", params={"appointment_id": "a1"})
+
+    assert response.status_code == 200
+    assert response.json() == [{"waitlist_id": "w1", "appointment_id": "a1"}]
+
+
+async def test_manual_assign_conflict_is_a_409(client):
+    class ConflictingMatchService:
+        async def manual_assign_patient(self, assignment):
+            raise AssignmentConflictError("Appointment a1 was assigned by another request")
+
+    with Container().override(MatchService, ConflictingMatchService()):
+        response = await client.post("/match/manual-assign", json={"appointment_id": "a1", "waitlist_id": "w1"})
+
+    assert response.status_code == 409
+    assert response.json() == {"detail": "Appointment a1 was assigned by another request"}
+
+
+async def test_requests_are_refused_without_the_auth_override(app, client):
+    app.dependency_overrides.pop(AuthService.get_current_user_or_service)
+
+    response = await client.get("/appointments/")
+
+    assert response.status_code in (401, 403)
@@ -0,0 +1,158 @@
+import asyncio
+
+import pytest
+
+from api.repositories.waitlist_repo import PATIENT_SEARCH
+from api.utils import search_index
+from api.utils.local_query_client import local_table_name
+from api.utils.search_index import PrefixIndex, SearchIndex, TrigramIndex, intersect_ids
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeQueryClient:
+    def __init__(self, rows: list[dict]):
+        self.rows = rows
+        self.queries = 0
+
+    async def run_query(self, query: str, named_params: dict = None):
+        self.queries += 1
+        return [dict(row) for row in self.rows]
+
+
+@pytest.fixture
+def bq_client(monkeypatch):
+    bq_client = FakeQueryClient([
+        {"waitlist_id": "w1", "medical_number": "MN-100200", "postcode": "SW1A 1AA"},
+        {"waitlist_id": "w2", "medical_number": "MN-100300", "postcode": "SW1A 2BB"},
+        {"waitlist_id": "w3", "medical_number": "MN-900200", "postcode": "E1 6AN"},
+        {"waitlist_id": "w4", "medical_number": None, "postcode": None},
+    ])
+    monkeypatch.setattr(search_index, "get_query_client", lambda: bq_client)
+    return bq_client
+
+
+@pytest.fixture
+def index(bq_client):
+    return SearchIndex("waitlist", "waitlist_id", substring=("medical_number",), prefix=("postcode",))
+
+
+def test_trigram_index_finds_substrings():
+    index = TrigramIndex()
+    for position, value in enumerate(["MN-100200", "MN-100300", None, "MN-900200"]):
+        index.set(position, value)
+
+    assert index.search("0020", limit=10) == [0, 3]
+    assert index.search("100", limit=10) == [0, 1]
+    assert index.search("999", limit=10) == []
+    assert index.search("00200", limit=1) == [0]
+
+
+def test_trigram_index_scans_every_value_for_short_text():
+    index = TrigramIndex()
+    for position, value in enumerate(["AB1", "XY2", "CAB", None]):
+        index.set(position, value)
+
+    assert index.search("AB", limit=10) == [0, 2]
+    assert index.search("", limit=10) == [0, 1, 2]
+
+
+def test_trigram_index_checks_the_current_value():
+    index = TrigramIndex()
+    index.set(0, "MN-100200")
+    index.set(0, "MN-555555")
+
+    assert index.search("100", limit=10) == []
+    assert index.search("555", limit=10) == [0]
+
+
+def test_prefix_index_finds_prefixes():
+    index = PrefixIndex()
+    index.load(["SW1A 1AA", "E1 6AN", None, "SW1A 2BB"])
+    index.set(4, "SW2 1AA")
+    index.set(1, "SW1A 3CC")
+
+    assert index.search("SW1A", limit=10) == [0, 3, 1]
+    assert index.search("SW", limit=2) == [0, 3]
+    assert index.search("E1", limit=10) == []
+
+
+async def test_cold_index_loads_on_first_search(index, bq_client):
+    assert await index.search("medical_number", "00200") == ["w1", "w3"]
+    assert await index.search("postcode", "SW1A") == ["w1", "w2"]
+    assert bq_client.queries == 1
+
+
+async def test_concurrent_first_searches_share_one_load(index, bq_client):
+    results = await asyncio.gather(*[index.search("medical_number", "MN-1") for _ in range(5)])
+
+    assert results == [["w1", "w2"]] * 5
+    assert bq_client.queries == 1
+
+
+async def test_search_it_cannot_answer_is_none(index, monkeypatch):
+    assert await index.search("medical_number", "MN%200") is None
+    assert await index.search("medical_number", "MN_100") is None
+    assert await index.search("medical_number", "MN-", limit=2) is None
+
+    monkeypatch.setattr(search_index, "SEARCH_INDEX_ENABLED", False)
+    assert await index.search("medical_number", "00200") is None
+
+
+async def test_upsert_applies_writes_to_a_loaded_index(index, bq_client):
+    index.upsert("w5", medical_number="MN-777777", postcode="N1 9GU")
+    await index.search("medical_number", "MN-")
+    assert await index.search("medical_number", "777") == []
+
+    index.upsert("w5", medical_number="MN-777777", postcode="N1 9GU")
+    index.upsert("w1", postcode="N1 0AA")
+
+    assert await index.search("medical_number", "777") == ["w5"]
+    assert await index.search("postcode", "N1") == ["w1", "w5"]
+
+
+async def test_stale_index_is_rebuilt_in_the_background(index, bq_client, monkeypatch):
+    await index.search("medical_number", "MN-")
+    bq_client.rows.append({"waitlist_id": "w5", "medical_number": "MN-777777", "postcode": "N1 9GU"})
+    monkeypatch.setattr(search_index, "SEARCH_INDEX_MAX_AGE_SECONDS", 0)
+
+    # Answered from the old index while the rebuild runs
+    assert await index.search("medical_number", "777") == []
+    await index._loading
+
+    assert await index.search("medical_number", "777") == ["w5"]
+    assert bq_client.queries == 2
+
+
+def test_intersect_ids():
+    assert intersect_ids(None, ["w1"]) == ["w1"]
+    assert intersect_ids(["w1"], None) == ["w1"]
+    assert intersect_ids(None, None) is None
+    assert intersect_ids(["w1", "w2", "w3"], ["w3", "w1"]) == ["w1", "w3"]
+
+
+async def test_patient_search_falls_back_when_the_index_is_stale(client, connection):
+    table = local_table_name("waitlist")
+    (first_id, first_number), (second_id, second_number) = connection.execute(f"""
+        SELECT waitlist_id, medical_number FROM "{table}"
+        WHERE NOT is_seen AND deleted_at IS NULL ORDER BY waitlist_id LIMIT 2
+    """).fetchall()
+
+    def set_medical_number(waitlist_id: str, medical_number: str):
+        connection.execute(f'UPDATE "{table}" SET medical_number = ? WHERE waitlist_id = ?', [medical_number, waitlist_id])
+
+    set_medical_number(first_id, "STALE-0001")
+    await PATIENT_SEARCH._load()
+    # Written by another worker after the index was built, so the index still points at the first patient
+    set_medical_number(first_id, "MOVED-0001")
+    set_medical_number(second_id, "STALE-0001")
+    try:
+        moved = await client.get("/waitlist/", params={"medical_number": "MOVED-0001"})
+        taken_over = await client.get("/waitlist/", params={"medical_number": "STALE-0001"})
+    finally:
+        set_medical_number(first_id, first_number)
+        set_medical_number(second_id, second_number)
+        await PATIENT_SEARCH._load()
+
+    assert [patient["waitlist_id"] for patient in moved.json()["results"]] == [first_id]
+    assert [patient["waitlist_id"] for patient in taken_over.json()["results"]] == [second_id]
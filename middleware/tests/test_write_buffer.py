@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from api.utils import write_buffer
+from api.utils.write_buffer import WriteBuffer
+
+pytestmark = pytest.mark.anyio
+
+TABLE = "`test.test.waitlist`"
+
+
+class FakeQueryClient:
+    """Records the rows of every MERGE, optionally failing or blocking until released"""
+
+    def __init__(self, error: Exception = None):
+        self.error = error
+        self.batches = []
+        self.started = asyncio.Event()
+        self.release = None
+
+    async def run_dml(self, query: str, named_params: dict = None):
+        self.batches.append(named_params["updates"][1])
+        self.started.set()
+        if self.release is not None:
+            await self.release.wait()
+        if self.error is not None:
+            raise self.error
+
+
+@pytest.fixture
+def bq_client():
+    return FakeQueryClient()
+
+
+@pytest.fixture
+def buffer(bq_client, monkeypatch):
+    buffer = WriteBuffer()
+    monkeypatch.setattr(buffer, "bq_client", bq_client)
+    monkeypatch.setattr(buffer, "_batches", {})
+    monkeypatch.setattr(write_buffer, "WRITE_BUFFER_WINDOW_SECONDS", 0.2)
+    monkeypatch.setattr(write_buffer, "WRITE_BUFFER_MAX_ROWS", 100)
+    return buffer
+
+
+def update(buffer: WriteBuffer, waitlist_id: str, status: str):
+    return asyncio.create_task(buffer.update(TABLE, ("waitlist_id", "STRING", waitlist_id),
+                                             {"grading_status": ("STRING", status)}))
+
+
+async def test_updates_within_the_window_are_one_merge_and_the_last_write_wins(buffer, bq_client):
+    await asyncio.gather(update(buffer, "w1", "PENDING"), update(buffer, "w2", "PENDING"), update(buffer, "w1", "DONE"))
+
+    assert bq_client.batches == [[
+        {"waitlist_id": "w1", "grading_status": "DONE"},
+        {"waitlist_id": "w2", "grading_status": "PENDING"},
+    ]]
+
+
+async def test_every_waiter_fails_when_the_merge_fails(buffer, bq_client):
+    bq_client.error = RuntimeError("Too many DML statements")
+
+    results = await asyncio.gather(update(buffer, "w1", "DONE"), update(buffer, "w2", "DONE"), return_exceptions=True)
+
+    assert [str(result) for result in results] == ["Too many DML statements"] * 2
+    assert len(bq_client.batches) == 1
+
+
+async def test_cancelled_flush_cancels_the_waiters(buffer, bq_client):
+    bq_client.release = asyncio.Event()
+    waiters = [update(buffer, "w1", "DONE"), update(buffer, "w2", "DONE")]
+    await asyncio.sleep(0)
+
+    flush = asyncio.create_task(buffer.flush())
+    await bq_client.started.wait()
+    flush.cancel()
+
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+    assert all(isinstance(result, asyncio.CancelledError) for result in results)
+    with pytest.raises(asyncio.CancelledError):
+        await flush
+
+
+async def test_full_batch_is_written_without_waiting_out_the_window(buffer, bq_client, monkeypatch):
+    monkeypatch.setattr(write_buffer, "WRITE_BUFFER_MAX_ROWS", 2)
+
+    await asyncio.wait_for(asyncio.gather(update(buffer, "w1", "DONE"), update(buffer, "w2", "DONE")), timeout=0.1)
+
+    assert len(bq_client.batches) == 1
+
+
+async def test_timer_of_a_full_batch_leaves_the_next_batch_alone(buffer, bq_client, monkeypatch):
+    monkeypatch.setattr(write_buffer, "WRITE_BUFFER_MAX_ROWS", 2)
+    await asyncio.gather(update(buffer, "w1", "DONE"), update(buffer, "w2", "DONE"))
+
+    # Starts a new batch halfway through the first batch's window
+    await asyncio.sleep(0.1)
+    later = update(buffer, "w3", "DONE")
+
+    # The first batch's timer has fired by now, the new batch still has its own window to wait out
+    await asyncio.sleep(0.15)
+    assert not later.done()
+    assert len(bq_client.batches) == 1
+
+    await asyncio.wait_for(later, timeout=0.2)
+    assert bq_client.batches[-1] == [{"waitlist_id": "w3", "grading_status": "DONE"}]